@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -48,6 +49,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'school_api.metrics.PerformanceMiddleware',  # Server-Timing header and /api/metrics
+    'school_api.profiling.SQLProfilingMiddleware',  # Sampled SQL profiles and slow-query log
+    'school_api.replicas.ReplicaPinningMiddleware',  # Replica reads, primary after a client's writes
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORS middleware
@@ -89,6 +93,67 @@ DATABASES = {
     }
 }
 
+# SQLite concurrency mode: the WAL journal lets readers run alongside a writer, writers wait
+# up to SQLITE_BUSY_TIMEOUT seconds for the write lock instead of failing with "database is
+# locked", and write transactions take that lock up front (IMMEDIATE) so two of them can
+# never deadlock upgrading read locks. Reads outside transactions use the query-only "read"
+# connection (school_api.db_routers). Set to False for the stock single-connection setup.
+SQLITE_CONCURRENCY_MODE = True
+SQLITE_BUSY_TIMEOUT = 20
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',  # With WAL, only a power loss can drop the last commits
+    'PRAGMA mmap_size=268435456',  # Read up to 256 MiB through memory mapping
+    'PRAGMA cache_size=-65536',  # 64 MiB page cache per connection
+    'PRAGMA temp_store=MEMORY',
+]
+
+if SQLITE_CONCURRENCY_MODE:
+    DATABASES['default']['OPTIONS'] = {
+        'timeout': SQLITE_BUSY_TIMEOUT,
+        'transaction_mode': 'IMMEDIATE',
+        'init_command': ';'.join(SQLITE_PRAGMAS),
+    }
+    # The test database lives in a file too (removed after the run): the default shared-cache
+    # in-memory one fails on lock contention at once instead of waiting for the busy timeout
+    DATABASES['default']['TEST'] = {'NAME': Path(tempfile.gettempdir()) / 'school_api_test.sqlite3'}
+    DATABASES['read'] = {
+        **DATABASES['default'],
+        'OPTIONS': {
+            'timeout': SQLITE_BUSY_TIMEOUT,
+            'init_command': ';'.join([*SQLITE_PRAGMAS, 'PRAGMA query_only=ON']),
+        },
+        # Tests read the default test database through this alias
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Read replicas: aliases holding copies of "default" that serve GET requests, except for
+# clients who wrote within the last REPLICA_PIN_SECONDS (school_api.replicas). To try it
+# locally with a second SQLite file, refreshed by `python manage.py replicate`:
+#     DATABASES['replica'] = {**DATABASES.get('read', DATABASES['default']), 'NAME': BASE_DIR / 'replica.sqlite3'}
+#     DATABASE_REPLICAS = ['replica']
+DATABASE_REPLICAS = []
+REPLICA_PIN_SECONDS = 5
+
+DATABASE_ROUTERS = ['school_api.db_routers.ReadWriteRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory is per process and only right for a single process (runserver). ETags, replica
+# pins, the roster index and the feed cache keep version counters here, so with several workers
+# use a shared backend (e.g. Redis, FileBasedCache); check school_api.W001 warns otherwise.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Cache alias and timeout (seconds) for rendered announcement feed pages
+ANNOUNCEMENT_FEED_CACHE = 'default'
+ANNOUNCEMENT_FEED_CACHE_TIMEOUT = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -137,7 +202,7 @@ AUTH_USER_MODEL = 'school_api.User'
 # Django REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'school_api.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -146,6 +211,61 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 }
 
+# QR check-in window: scans open this many minutes before a class starts and count as Late
+# once this many minutes have passed after the scheduled start
+ATTENDANCE_EARLY_CHECKIN_MINUTES = 15
+ATTENDANCE_LATE_AFTER_MINUTES = 10
+
+# Full-text search backend for ?search= (school_api.search); set to None to always use icontains
+SEARCH_BACKEND = 'school_api.search.SQLiteFTS5Backend'
+
+# Render class, student and attendance lists from values() rows instead of per-row serializers
+# (school_api.fieldsets); the output is the same
+LEAN_LIST_SERIALIZATION = True
+
+# Bearer token Prometheus may send to scrape /api/metrics; without it (or while None) only an
+# administrator's access token is accepted
+METRICS_TOKEN = None
+
+# SQL profiler (school_api.profiling): fraction of requests profiled in full, header that
+# lets administrators profile a request on demand, statements logged as slow (None disables,
+# e.g. 200 logs statements over 200 ms) and repeats from one call site reported as N+1
+# candidates. Off by default, so nothing is written to SQL_PROFILER_LOG unless enabled.
+SQL_PROFILER_SAMPLE_RATE = 0.0
+SQL_PROFILER_HEADER = 'X-SQL-Profile'
+SQL_PROFILER_SLOW_MS = None
+SQL_PROFILER_REPEAT_THRESHOLD = 5
+SQL_PROFILER_LOG = BASE_DIR / 'logs' / 'sql.log'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'sql_profile': {'format': '{asctime} {message}', 'style': '{'},
+    },
+    'handlers': {
+        'sql_profile': {
+            'class': 'school_api.profiling.RotatingLogHandler',
+            'filename': SQL_PROFILER_LOG,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'formatter': 'sql_profile',
+        },
+    },
+    'loggers': {
+        'school_api.sql': {'handlers': ['sql_profile'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# Bulk user import (school_api.imports): processes the import_users command hashes passwords
+# with (None = one per CPU) and users written per transaction. The API endpoint hashes in the
+# request's own process, about half a second per password, so it takes at most
+# USER_IMPORT_MAX_ROWS rows and USER_IMPORT_MAX_BYTES of upload.
+USER_IMPORT_HASH_WORKERS = None
+USER_IMPORT_BATCH_SIZE = 500
+USER_IMPORT_MAX_ROWS = 50
+USER_IMPORT_MAX_BYTES = 1024 * 1024
+
 # JWT settings
 from datetime import timedelta
 SIMPLE_JWT = {
@@ -161,8 +281,14 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
+    'TOKEN_OBTAIN_SERIALIZER': 'school_api.serializers.SchoolTokenObtainPairSerializer',
 }
 
+# Seconds an authenticated user is cached by CachedJWTAuthentication
+AUTH_USER_CACHE_TIMEOUT = 60
+# Trust the signed role/username claims in access tokens instead of looking the user up
+AUTH_TRUST_TOKEN_CLAIMS = False
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True  # For development only, set specific origins in production
 CORS_ALLOW_CREDENTIALS = True
@@ -0,0 +1,219 @@
+"""
+Maintenance of the ClassDailyAttendance and StudentMonthlyAttendance aggregate tables.
+
+Writes to AttendanceRecord report the (student, class, date) keys they touched; the
+affected class-day and student-month rows are then recounted from their raw records.
+Recounting only the touched keys keeps the tables exact even for upserts, where the previous
+status is not known. Keys that just received records are recounted and written back by one
+INSERT ... SELECT ... ON CONFLICT statement per table, so a check-in costs two statements on
+top of its own. Keys that may have lost their last record (deletes, moved records) are
+counted first and written with a separate upsert and delete, to drop summaries left empty.
+"""
+import datetime
+from collections import defaultdict
+
+from django.db import connections
+from django.db.models import Count, Q, Value
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import AttendanceRecord, ClassDailyAttendance, StudentMonthlyAttendance
+
+STATUS_FIELDS = {
+    'Present': 'present_count',
+    'Absent': 'absent_count',
+    'Late': 'late_count',
+    'Excused': 'excused_count',
+}
+
+_date_field = AttendanceRecord._meta.get_field('attendance_date')
+_id_field = AttendanceRecord._meta.get_field('id')
+
+
+def status_counts():
+    return {field: Count('id', filter=Q(status=status)) for status, field in STATUS_FIELDS.items()}
+
+
+def month_start(date):
+    return date.replace(day=1)
+
+
+def next_month(date):
+    return (date.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+
+def record_key(record):
+    """
+    (student_id, class_id, attendance_date) for a record, with raw strings converted
+    """
+    return (
+        _id_field.to_python(record.student_id),
+        _id_field.to_python(record.class_obj_id),
+        _date_field.to_python(record.attendance_date),
+    )
+
+
+# SQL generating a primary key for rows inserted by INSERT ... SELECT, per database vendor;
+# others recount through the ORM
+NEW_UUID_SQL = {
+    'sqlite': 'lower(hex(randomblob(16)))',
+    'postgresql': 'gen_random_uuid()',
+}
+
+
+def refresh_attendance_aggregates(records=(), keys=(), using=None):
+    """
+    Recount the aggregates touched by the given records, which exist, and/or (student, class,
+    date) keys, which may no longer have any
+    """
+    prune = set(keys)
+    written = {record_key(record) for record in records} - prune
+    for batch, prune_empty in ((written, False), (prune, True)):
+        if batch:
+            refresh_class_days({(class_id, date) for _, class_id, date in batch}, using, prune_empty)
+            refresh_student_months(
+                {(student_id, month_start(date)) for student_id, _, date in batch}, using, prune_empty
+            )
+
+
+def _upsert_counted(model, unique_fields, counted, using):
+    """
+    Write the rows of ``counted``, a grouped queryset selecting ``unique_fields`` and the status
+    counts, in one INSERT ... SELECT ... ON CONFLICT statement
+    """
+    connection = connections[using or model.objects.db]
+    fields = list(STATUS_FIELDS.values())
+    table = connection.ops.quote_name(model._meta.db_table)
+    key_columns = [connection.ops.quote_name(model._meta.get_field(name).column) for name in unique_fields]
+    count_columns = [connection.ops.quote_name(field) for field in fields + ['updated_at']]
+    select, params = counted.annotate(
+        refreshed_at=Value(timezone.now(), output_field=model._meta.get_field('updated_at'))
+    ).values_list(*unique_fields, *fields, 'refreshed_at').query.sql_with_params()
+    # WHERE true: SQLite could otherwise read ON CONFLICT as a join constraint
+    sql = (
+        f'INSERT INTO {table} ({connection.ops.quote_name("id")}, {", ".join(key_columns + count_columns)}) '
+        f'SELECT {NEW_UUID_SQL[connection.vendor]}, counted.* FROM ({select}) counted WHERE true '
+        f'ON CONFLICT ({", ".join(key_columns)}) DO UPDATE SET '
+        + ', '.join(f'{column} = excluded.{column}' for column in count_columns)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def _refresh(model, unique_fields, keys, counted, using, prune_empty):
+    """
+    Write the counted rows of ``keys``; with ``prune_empty``, also drop summaries whose keys no
+    longer have any records
+    """
+    if not prune_empty and connections[using or model.objects.db].vendor in NEW_UUID_SQL:
+        _upsert_counted(model, unique_fields, counted, using)
+        return
+    counted = {tuple(row[name] for name in unique_fields): row for row in counted}
+    _write(model, [model._meta.get_field(name).attname for name in unique_fields], keys, counted, using)
+
+
+def _write(model, unique_fields, keys, counted, using):
+    """
+    Upsert the counted rows and drop summaries whose keys no longer have any records
+    """
+    fields = list(STATUS_FIELDS.values())
+    rows = []
+    empty = []
+    for key in keys:
+        counts = counted.get(key)
+        if counts and any(counts[field] for field in fields):
+            rows.append(model(**dict(zip(unique_fields, key)), **{field: counts[field] for field in fields}))
+        else:
+            empty.append(key)
+
+    manager = model.objects.db_manager(using)
+    if rows:
+        manager.bulk_create(
+            rows, update_conflicts=True, unique_fields=unique_fields, update_fields=fields + ['updated_at']
+        )
+    if empty:
+        condition = Q()
+        for key in empty:
+            condition |= Q(**dict(zip(unique_fields, key)))
+        manager.filter(condition).delete()
+
+
+def refresh_class_days(keys, using=None, prune_empty=True):
+    dates_by_class = defaultdict(set)
+    for class_id, date in keys:
+        dates_by_class[class_id].add(date)
+    condition = Q()
+    for class_id, dates in dates_by_class.items():
+        condition |= Q(class_obj_id=class_id, attendance_date__in=dates)
+
+    counted = (
+        AttendanceRecord.objects.db_manager(using).filter(condition)
+        .values('class_obj', 'attendance_date')
+        .annotate(**status_counts())
+        .order_by()
+    )
+    _refresh(ClassDailyAttendance, ['class_obj', 'attendance_date'], keys, counted, using, prune_empty)
+
+
+def refresh_student_months(keys, using=None, prune_empty=True):
+    students_by_month = defaultdict(set)
+    for student_id, month in keys:
+        students_by_month[month].add(student_id)
+    condition = Q()
+    for month, student_ids in students_by_month.items():
+        condition |= Q(
+            student_id__in=student_ids, attendance_date__gte=month, attendance_date__lt=next_month(month)
+        )
+
+    counted = (
+        AttendanceRecord.objects.db_manager(using).filter(condition)
+        .values('student', month=TruncMonth('attendance_date'))
+        .annotate(**status_counts())
+        .order_by()
+    )
+    _refresh(StudentMonthlyAttendance, ['student', 'month'], keys, counted, using, prune_empty)
+
+
+def rebuild_attendance_aggregates(batch_size=1000):
+    """
+    Regenerate both aggregate tables from scratch. Returns (class_days, student_months).
+    """
+    ClassDailyAttendance.objects.all().delete()
+    StudentMonthlyAttendance.objects.all().delete()
+
+    class_days = (
+        AttendanceRecord.objects.values('class_obj', 'attendance_date')
+        .annotate(**status_counts())
+        .order_by()
+    )
+    created_days = _bulk_insert(ClassDailyAttendance, (
+        ClassDailyAttendance(class_obj_id=row.pop('class_obj'), **row)
+        for row in class_days.iterator(chunk_size=batch_size)
+    ), batch_size)
+
+    student_months = (
+        AttendanceRecord.objects.values('student', month=TruncMonth('attendance_date'))
+        .annotate(**status_counts())
+        .order_by()
+    )
+    created_months = _bulk_insert(StudentMonthlyAttendance, (
+        StudentMonthlyAttendance(student_id=row.pop('student'), **row)
+        for row in student_months.iterator(chunk_size=batch_size)
+    ), batch_size)
+
+    return created_days, created_months
+
+
+def _bulk_insert(model, objs, batch_size):
+    created = 0
+    batch = []
+    for obj in objs:
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch)
+        created += len(batch)
+    return created
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class SchoolApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'school_api'
+
+    def ready(self):
+        # Connect the cache invalidation signal handlers
+        from . import signals  # noqa: F401
+        # Register the system checks
+        from . import checks  # noqa: F401
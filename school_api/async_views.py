@@ -0,0 +1,185 @@
+"""
+Async read endpoints for ASGI deployments.
+
+GET /api/async/announcements/, /api/async/classes/ and /api/async/attendance/student_history/
+return the same JSON as their DRF counterparts, but run as coroutines, so a dashboard fanning
+out to all three does not hold a worker thread per request while they wait on the cache or
+the database. Querysets, role scoping, filters and ?fields= pruning come from the DRF viewsets;
+rows are read with the async ORM through the lean values() plan (school_api.fieldsets), and
+JWT users and feed pages come from the async cache API. Page-number pages are counted and
+sliced asynchronously; cursor pages and full-text ranking, which run their own queries, are
+handed to a thread. Under WSGI Django runs these views in a one-off event loop, which works
+but saves nothing.
+"""
+import functools
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ImproperlyConfigured
+from django.core.paginator import InvalidPage
+from django.http import HttpResponse
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import feed_cache
+from .authentication import CachedJWTAuthentication
+from .conditional import make_etag, etag_matches
+from .fieldsets import plan_for
+from .metrics import serializing
+from .models import Student
+from .permissions import scope_students
+from .replicas import primary_reads
+from .views import AnnouncementViewSet, AttendanceRecordViewSet, ClassViewSet
+
+
+def render(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def error_response(exc, request):
+    """
+    The response DRF's exception handler would give for ``exc``
+    """
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+    response = render(data, status=exc.status_code)
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        response['WWW-Authenticate'] = CachedJWTAuthentication().authenticate_header(request)
+    return response
+
+
+async def build_view(viewset, action, request):
+    """
+    Authenticate the request and return a viewset instance bound to it, as DRF's dispatch would
+    """
+    result = await CachedJWTAuthentication().aauthenticate(request)
+    if result is None:
+        raise exceptions.NotAuthenticated()
+    drf_request = Request(request)
+    drf_request.user, drf_request.auth = result
+    view = viewset(request=drf_request, action=action, format_kwarg=None, args=(), kwargs={})
+    view.headers = {}
+    return view
+
+
+def async_endpoint(viewset, action):
+    """
+    Turn ``handler(view, request)`` into an async GET view authenticated like ``viewset``
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def view(request):
+            try:
+                if request.method != 'GET':
+                    raise exceptions.MethodNotAllowed(request.method)
+                instance = await build_view(viewset, action, request)
+                return await handler(instance, instance.request)
+            except exceptions.APIException as exc:
+                return error_response(exc, request)
+        return view
+    return decorator
+
+
+def get_plan(view):
+    plan = plan_for(view.get_serializer())
+    if plan is None:
+        raise ImproperlyConfigured(f'{type(view).__name__} has no values() plan for its serializer')
+    return plan
+
+
+async def filtered_queryset(view):
+    queryset = view.get_queryset()
+    if view.request.query_params.get(api_settings.SEARCH_PARAM, '').strip():
+        # Full-text search looks the matching ids up synchronously
+        return await sync_to_async(view.filter_queryset)(queryset)
+    return view.filter_queryset(queryset)
+
+
+def sync_page(view, rows, plan):
+    page = view.paginator.paginate_queryset(rows, view.request, view=view)
+    with serializing(view.request):
+        data = plan.rows(page)
+    return view.paginator.get_paginated_response(data).data
+
+
+async def list_data(view):
+    """
+    The list action's response data, paginated like the viewset's paginator would
+    """
+    plan = get_plan(view)
+    ordering = [name.lstrip('-') for name in getattr(view.paginator, 'ordering', ())]
+    rows = plan.queryset(await filtered_queryset(view), *ordering)
+    paginator, request = view.paginator, view.request
+    page_size = paginator.get_page_size(request) if paginator is not None else None
+    if page_size is None:
+        with serializing(request):
+            return await plan.arows(rows)
+    if getattr(paginator, 'use_cursor', None) and paginator.use_cursor(request):
+        return await sync_to_async(sync_page)(view, rows, plan)
+
+    # Django's Paginator over a range validates the page number and yields the slice bounds
+    django_paginator = paginator.django_paginator_class(range(await rows.acount()), page_size)
+    number = request.query_params.get(paginator.page_query_param) or 1
+    if number in paginator.last_page_strings:
+        number = django_paginator.num_pages
+    try:
+        page = django_paginator.page(number)
+    except InvalidPage as exc:
+        raise exceptions.NotFound(paginator.invalid_page_message.format(page_number=number, message=str(exc)))
+    paginator.page, paginator.request, paginator.cursor_mode = page, request, False
+    with serializing(request):
+        data = await plan.arows(rows[page.object_list.start:page.object_list.stop])
+    return paginator.get_paginated_response(data).data
+
+
+@async_endpoint(AnnouncementViewSet, 'list')
+async def announcement_feed(view, request):
+    """
+    The announcement feed, served from the feed cache through the async cache API
+    """
+    bucket = feed_cache.bucket_for(request.user)
+    if bucket is None:
+        return render(await list_data(view))
+
+    etag = make_etag(request, bucket, await feed_cache.aget_generation(bucket))
+    if etag_matches(request, etag):
+        response = HttpResponse(status=304)
+    else:
+        data, generation = await feed_cache.aget_page(bucket, request)
+        if data is None:
+            # A lagging replica's page would be served until the next invalidation
+            with primary_reads():
+                data = await list_data(view)
+            await feed_cache.aset_page(bucket, request, generation, data)
+        response = render(data)
+        etag = make_etag(request, bucket, generation)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    response['Vary'] = 'Authorization'
+    return response
+
+
+@async_endpoint(ClassViewSet, 'list')
+async def class_list(view, request):
+    return render(await list_data(view))
+
+
+@async_endpoint(AttendanceRecordViewSet, 'student_history')
+async def student_history(view, request):
+    student_id = request.query_params.get('student_id')
+    if not student_id:
+        return render({"detail": "Student ID is required."}, status=400)
+    try:
+        student_id = uuid.UUID(student_id)
+    except ValueError:
+        return render({"detail": "Student ID is not a valid UUID."}, status=400)
+
+    plan = get_plan(view)
+    with serializing(request):
+        data = await plan.arows(plan.queryset(
+            view.get_queryset().filter(student_id=student_id).order_by('-attendance_date')
+        ))
+    if not data and not await scope_students(Student.objects.all(), request.user).filter(id=student_id).aexists():
+        return render({"detail": "Student not found."}, status=404)
+    return render(data)
@@ -0,0 +1,145 @@
+"""
+JWT authentication that resolves request.user without a database query on most requests.
+
+By default the fields authorization reads (id, names, role and the active/staff flags) of
+the authenticated user are cached for AUTH_USER_CACHE_TIMEOUT seconds; the password hash
+and other personal data never reach the shared cache. With
+AUTH_TRUST_TOKEN_CLAIMS enabled, the signed role and name claims added at login are
+trusted instead, so no lookup is needed at all. Saving or deleting a user evicts the cached
+copy and marks tokens issued before that moment stale. Stale tokens fall back to a real lookup
+until they expire, so role changes and deactivation take effect immediately in both modes.
+``aauthenticate`` is the same lookup for the async views, reading the cache asynchronously.
+"""
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .replicas import primary_reads
+
+User = get_user_model()
+
+KEY_PREFIX = 'school_api:auth'
+
+# What request.user carries when rebuilt from the cache
+CACHED_USER_FIELDS = ('id', 'username', 'first_name', 'last_name', 'role', 'is_active', 'is_staff', 'is_superuser')
+
+
+def user_cache_key(user_id):
+    return f'{KEY_PREFIX}:user:{user_id}'
+
+
+def stale_claims_key(user_id):
+    return f'{KEY_PREFIX}:stale:{user_id}'
+
+
+def invalidate_user(user_id):
+    """
+    Drop the cached user and stop trusting claims in tokens issued before now
+    """
+    cache.delete(user_cache_key(user_id))
+    # Access tokens minted from an older refresh token copy its claims and "iat", so the
+    # marker has to outlive refresh tokens too
+    lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME).total_seconds()
+    cache.set(stale_claims_key(user_id), time.time(), timeout=int(lifetime) + 1)
+
+
+def build_user(**fields):
+    """
+    User instance for request.user made from known field values, without a lookup; enough for
+    role and id permission checks, but never to be saved
+    """
+    user = User(**fields)
+    user._state.adding = False
+    user._state.db = 'default'
+    return user
+
+
+def user_from_claims(validated_token):
+    """
+    User carrying the identity claims
+    """
+    return build_user(
+        id=uuid.UUID(str(validated_token[api_settings.USER_ID_CLAIM])),
+        username=validated_token.get('username', ''),
+        first_name=validated_token.get('first_name', ''),
+        last_name=validated_token.get('last_name', ''),
+        role=validated_token['role'],
+        is_active=True,
+    )
+
+
+def token_user_id(validated_token):
+    try:
+        return validated_token[api_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken('Token contained no recognizable user identification')
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication with cached user resolution
+    """
+    def get_user(self, validated_token):
+        user_id = token_user_id(validated_token)
+
+        if getattr(settings, 'AUTH_TRUST_TOKEN_CLAIMS', False) and 'role' in validated_token:
+            stale_before = cache.get(stale_claims_key(user_id))
+            if stale_before is None or validated_token.get('iat', 0) > stale_before:
+                return user_from_claims(validated_token)
+
+        key = user_cache_key(user_id)
+        fields = cache.get(key)
+        if fields is not None:
+            return build_user(**fields)
+        # Raises AuthenticationFailed for missing or inactive users, which are never cached.
+        # A replica could still hold a deactivated or demoted user.
+        with primary_reads():
+            user = super().get_user(validated_token)
+        fields = {name: getattr(user, name) for name in CACHED_USER_FIELDS}
+        cache.set(key, fields, timeout=getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 60))
+        return user
+
+    async def aauthenticate(self, request):
+        """
+        Async counterpart of ``authenticate`` for a plain Django request
+        """
+        header = self.get_header(request)
+        raw_token = header and self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = token_user_id(validated_token)
+
+        if getattr(settings, 'AUTH_TRUST_TOKEN_CLAIMS', False) and 'role' in validated_token:
+            stale_before = await cache.aget(stale_claims_key(user_id))
+            if stale_before is None or validated_token.get('iat', 0) > stale_before:
+                return user_from_claims(validated_token)
+
+        fields = await cache.aget(user_cache_key(user_id))
+        if fields is not None:
+            return build_user(**fields)
+        # Misses take the synchronous path, which also repopulates the cache
+        return await sync_to_async(self.get_user)(validated_token)
+
+
+def bearer_user(request):
+    """
+    The user of the plain Django request's access token, or None without a valid one, for
+    middleware and views that run before (or without) DRF authentication
+    """
+    try:
+        authenticated = CachedJWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return authenticated[0] if authenticated else None
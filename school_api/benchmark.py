@@ -0,0 +1,568 @@
+"""
+Endpoint benchmark harness.
+
+Every router endpoint (plus JWT login/refresh) is requested ``iterations`` times against the
+current database, normally one generated with ``load_initial_data --scale``. Requests go
+through Django's test client in-process, or to a running server with ``base_url``. Results
+are plain dicts ready for JSON: latency percentiles, throughput, SQL query count and peak
+Python memory per scenario. Query counts and memory come from one extra instrumented run,
+so the tracing overhead never skews the timings. Writes run inside a transaction that is
+rolled back, so every iteration sees the same data; they are skipped against a live server.
+Scenarios answering 4xx/5xx are listed as failed in the report rather than timed as a baseline.
+
+``run_concurrency`` compares concurrent-connection capacity instead: the dashboard reads are
+sent ``concurrency`` at a time to the project's real WSGI application, served by a fixed pool
+of worker threads as a threaded WSGI server would, and to its ASGI application on one event
+loop using the async endpoints, reporting throughput, latency and peak thread count.
+"""
+import asyncio
+import contextlib
+import datetime
+import itertools
+import json
+import math
+import platform
+import re
+import threading
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+from unittest import mock
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import django
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .metrics import RequestTiming, execute_wrappers
+from .models import User, Subject, Class, Student, AttendanceRecord, Announcement
+from .schedule import day_bit
+
+Scenario = namedtuple(
+    'Scenario', ['name', 'method', 'path', 'user', 'data', 'writes', 'now'], defaults=(None, False, None)
+)
+
+Fixtures = namedtuple('Fixtures', [
+    'admin', 'teacher', 'student', 'class_obj', 'subject', 'record', 'announcement', 'search', 'password'
+])
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(ordered, p):
+    """
+    Linearly interpolated percentile of an already sorted list
+    """
+    if not ordered:
+        return None
+    rank = (len(ordered) - 1) * p / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def discover_fixtures(password='student123'):
+    """
+    Pick representative rows: a class with a roster and attendance, its teacher and a student
+    """
+    record = AttendanceRecord.objects.select_related('class_obj__teacher', 'student__user').order_by('id').first()
+    if record is None:
+        raise ValueError('The database has no attendance records; run load_initial_data first')
+    admin = User.objects.filter(role='Administrator').order_by('username').first()
+    if admin is None:
+        raise ValueError('The database has no administrator')
+    student = record.student
+    return Fixtures(
+        admin=admin,
+        teacher=record.class_obj.teacher,
+        student=student,
+        class_obj=record.class_obj,
+        subject=Subject.objects.order_by('id').first(),
+        record=record,
+        announcement=Announcement.objects.order_by('id').first(),
+        search=student.user.last_name[:3] or student.roll_number,
+        password=password,
+    )
+
+
+def class_slot(class_obj):
+    """
+    The next time ``class_obj`` is in session (today or later in the week, at its start time),
+    for scenarios that depend on the clock
+    """
+    today = timezone.localdate()
+    for offset in range(7):
+        day = today + datetime.timedelta(days=offset)
+        if class_obj.meeting_days & day_bit(day.weekday()):
+            break
+    return timezone.make_aware(datetime.datetime.combine(day, class_obj.scheduled_start_time))
+
+
+def build_scenarios(f):
+    """
+    One scenario per endpoint and notable mode. ``data`` may be a callable run (untimed)
+    inside the write transaction to create prerequisites.
+    """
+    def new_student_user(fixtures):
+        user = User.objects.create(username='bench_new_student', role='Student')
+        return {'user': str(user.id), 'roll_number': 'BENCH-0001', 'classes': [str(fixtures.class_obj.id)]}
+
+    roster = list(f.class_obj.enrolled_students.values_list('id', flat=True)[:30])
+    refresh = str(RefreshToken.for_user(f.student.user))
+    scenarios = [
+        Scenario('auth.login', 'post', '/api/auth/login/', None,
+                 {'username': f.student.user.username, 'password': f.password}),
+        Scenario('auth.refresh', 'post', '/api/auth/refresh/', None, {'refresh': refresh}),
+
+        Scenario('users.list', 'get', '/api/users/', f.admin),
+        Scenario('users.retrieve', 'get', f'/api/users/{f.teacher.id}/', f.admin),
+        Scenario('users.search', 'get', f'/api/users/?search={f.search}', f.admin),
+        Scenario('users.create', 'post', '/api/users/', None, {
+            'username': 'bench_user', 'password': 'bench-password', 'role': 'Parent',
+            'email': 'bench@example.com', 'first_name': 'Bench', 'last_name': 'User',
+        }, True),
+        Scenario('users.change_password', 'post', f'/api/users/{f.student.user.id}/change_password/',
+                 f.student.user, {'old_password': f.password, 'new_password': f.password}, True),
+        Scenario('users.bulk_import', 'post', '/api/users/bulk_import/', f.admin, {'users': [
+            {'username': f'bench_import{n}', 'password': 'bench-password', 'role': 'Student',
+             'roll_number': f'BENCH-I{n:03d}'}
+            for n in range(10)
+        ]}, True),
+
+        Scenario('subjects.list', 'get', '/api/subjects/', f.admin),
+        Scenario('subjects.retrieve', 'get', f'/api/subjects/{f.subject.id}/', f.admin),
+        Scenario('subjects.create', 'post', '/api/subjects/', f.admin, {'name': 'Benchmarking'}, True),
+
+        Scenario('classes.list', 'get', '/api/classes/', f.student.user),
+        Scenario('classes.retrieve', 'get', f'/api/classes/{f.class_obj.id}/', f.student.user),
+        Scenario('classes.search', 'get', f'/api/classes/?search={f.class_obj.name.split()[0]}', f.student.user),
+        Scenario('classes.create', 'post', '/api/classes/', f.admin, {
+            'name': 'Bench 999', 'academic_year': '2023-2024', 'scheduled_start_time': '09:00:00',
+            'scheduled_end_time': '10:30:00', 'days_of_week': 'Monday,Wednesday', 'location': 'Room 0',
+            'teacher': str(f.teacher.id), 'subject': str(f.subject.id),
+        }, True),
+        Scenario('classes.enroll_students', 'post', f'/api/classes/{f.class_obj.id}/enroll_students/', f.teacher,
+                 {'student_ids': [str(student_id) for student_id in roster]}, True),
+        Scenario('classes.bulk_enroll', 'post', '/api/classes/bulk_enroll/', f.admin, {'enrollments': [
+            {'class_obj': str(class_id), 'student_ids': [str(student_id) for student_id in roster]}
+            for class_id in Class.objects.filter(teacher=f.teacher).values_list('id', flat=True)[:8]
+        ]}, True),
+
+        Scenario('students.list', 'get', '/api/students/', f.admin),
+        Scenario('students.list_teacher', 'get', '/api/students/', f.teacher),
+        Scenario('students.retrieve', 'get', f'/api/students/{f.student.id}/', f.student.user),
+        Scenario('students.search', 'get', f'/api/students/?search={f.search}', f.admin),
+        Scenario('students.create', 'post', '/api/students/', f.admin, new_student_user, True),
+
+        Scenario('attendance.list', 'get', '/api/attendance/', f.admin),
+        Scenario('attendance.list_cursor', 'get', '/api/attendance/?pagination=cursor', f.admin),
+        Scenario('attendance.list_teacher', 'get', '/api/attendance/', f.teacher),
+        Scenario('attendance.retrieve', 'get', f'/api/attendance/{f.record.id}/', f.teacher),
+        Scenario('attendance.search', 'get', f'/api/attendance/?search={f.search}', f.admin),
+        Scenario('attendance.student_history', 'get',
+                 f'/api/attendance/student_history/?student_id={f.student.id}', f.student.user),
+        Scenario('attendance.export', 'get', f'/api/attendance/export/?class_id={f.class_obj.id}', f.teacher),
+        Scenario('attendance.create_upsert', 'post', '/api/attendance/?upsert=true', f.teacher, {
+            'student': str(f.student.id), 'class_obj': str(f.class_obj.id),
+            'attendance_date': f.record.attendance_date.isoformat(), 'attendance_time': '09:05:00',
+            'status': 'Late', 'checkin_method': 'MANUAL',
+        }, True),
+        Scenario('attendance.checkin', 'post', '/api/attendance/checkin/', f.student.user, {}, True,
+                 class_slot(f.class_obj)),
+        Scenario('attendance.bulk_mark', 'post', '/api/attendance/bulk_mark/?upsert=true', f.teacher, {
+            'class_obj': str(f.class_obj.id), 'attendance_date': f.record.attendance_date.isoformat(),
+            'records': [{'student': str(student_id), 'status': 'Present'} for student_id in roster],
+        }, True),
+
+        Scenario('announcements.list', 'get', '/api/announcements/', f.student.user),
+        Scenario('announcements.search', 'get', '/api/announcements/?search=exam', f.admin),
+        Scenario('announcements.create', 'post', '/api/announcements/', f.admin, {
+            'title': 'Benchmark', 'message': 'Benchmark announcement', 'type': 'General', 'audience': 'All',
+            'created_by': str(f.admin.id),
+        }, True),
+        Scenario('announcements.cache_stats', 'get', '/api/announcements/cache_stats/', f.admin),
+
+        Scenario('async.announcements', 'get', '/api/async/announcements/', f.student.user),
+        Scenario('async.classes', 'get', '/api/async/classes/', f.student.user),
+        Scenario('async.student_history', 'get',
+                 f'/api/async/attendance/student_history/?student_id={f.student.id}', f.student.user),
+    ]
+    if f.announcement is not None:
+        scenarios.append(
+            Scenario('announcements.retrieve', 'get', f'/api/announcements/{f.announcement.id}/', f.admin)
+        )
+    return scenarios
+
+
+def _drain(response):
+    if getattr(response, 'streaming', False):
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+class InProcessTarget:
+    """
+    Sends requests through DRF's APIClient with a JWT for the scenario's user
+    """
+    supports_writes = True
+
+    def __init__(self):
+        self.tokens = {}
+
+    def headers(self, user):
+        if user is None:
+            return {}
+        if user.pk not in self.tokens:
+            self.tokens[user.pk] = str(RefreshToken.for_user(user).access_token)
+        return {'HTTP_AUTHORIZATION': f'Bearer {self.tokens[user.pk]}'}
+
+    def prepare(self, scenario, fixtures):
+        data = scenario.data(fixtures) if callable(scenario.data) else scenario.data
+        client = APIClient()
+        method = getattr(client, scenario.method)
+        headers = self.headers(scenario.user)
+        if scenario.method == 'get':
+            return lambda: method(scenario.path, **headers)
+        return lambda: method(scenario.path, data, format='json', **headers)
+
+    def request(self, scenario, fixtures):
+        """
+        Run one request, at the scenario's ``now`` if it has one; returns (seconds, status).
+        Writes are rolled back.
+        """
+        with self.clock(scenario):
+            if not scenario.writes:
+                return self.send(self.prepare(scenario, fixtures))
+            with transaction.atomic():
+                result = self.send(self.prepare(scenario, fixtures))
+                transaction.set_rollback(True)
+            return result
+
+    def clock(self, scenario):
+        if scenario.now is None:
+            return contextlib.nullcontext()
+        return mock.patch('django.utils.timezone.now', return_value=scenario.now)
+
+    def send(self, request):
+        started = time.perf_counter()
+        response = request()
+        _drain(response)
+        return time.perf_counter() - started, response.status_code
+
+
+class LiveServerTarget(InProcessTarget):
+    """
+    Sends requests over HTTP to a running server that shares this database and SECRET_KEY
+    """
+    supports_writes = False
+
+    def __init__(self, base_url):
+        super().__init__()
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, scenario, fixtures):
+        headers = {'Content-Type': 'application/json'}
+        auth = self.headers(scenario.user)
+        if auth:
+            headers['Authorization'] = auth['HTTP_AUTHORIZATION']
+        body = None if scenario.method == 'get' else json.dumps(scenario.data).encode()
+        request = urllib.request.Request(
+            self.base_url + scenario.path, data=body, headers=headers, method=scenario.method.upper()
+        )
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as exc:
+            exc.read()
+            status = exc.code
+        return time.perf_counter() - started, status
+
+
+def run_scenario(target, scenario, fixtures, iterations, warmup):
+    for _ in range(warmup):
+        target.request(scenario, fixtures)
+
+    timings = []
+    statuses = Counter()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        elapsed, status = target.request(scenario, fixtures)
+        timings.append(elapsed)
+        statuses[status] += 1
+    wall = time.perf_counter() - started
+
+    timings.sort()
+    result = {
+        'method': scenario.method.upper(),
+        'path': scenario.path,
+        'iterations': iterations,
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'failed': any(status >= 400 for status in statuses),
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 3),
+        **{f'p{p}_ms': round(percentile(timings, p) * 1000, 3) for p in PERCENTILES},
+        'max_ms': round(timings[-1] * 1000, 3),
+        'throughput_rps': round(iterations / wall, 1) if wall else None,
+        'queries': None,
+        'peak_memory_kb': None,
+    }
+
+    if isinstance(target, LiveServerTarget):
+        return result
+    # One instrumented run for query count and peak allocations
+    tracemalloc.start()
+    try:
+        # Reads may go to the "read" alias (db_routers), so queries are counted on every connection
+        counter = RequestTiming()
+        with execute_wrappers(counter):
+            target.request(scenario, fixtures)
+        result['peak_memory_kb'] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+    result['queries'] = counter.queries
+    return result
+
+
+def run_benchmark(iterations=30, warmup=3, only=None, base_url=None, password='student123', log=None):
+    """
+    Run every (matching) scenario and return the report as a dict
+    """
+    log = log or (lambda message: None)
+    fixtures = discover_fixtures(password)
+    target = LiveServerTarget(base_url) if base_url else InProcessTarget()
+    pattern = re.compile(only) if only else None
+
+    scenarios = {}
+    skipped = []
+    for scenario in build_scenarios(fixtures):
+        if pattern and not pattern.search(scenario.name):
+            continue
+        if scenario.writes and not target.supports_writes:
+            skipped.append(scenario.name)
+            continue
+        log(f'{scenario.name}...')
+        scenarios[scenario.name] = run_scenario(target, scenario, fixtures, iterations, warmup)
+
+    return {
+        'meta': {
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'target': base_url or 'in-process',
+            'iterations': iterations,
+            'warmup': warmup,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'dataset': {
+                'users': User.objects.count(),
+                'classes': Class.objects.count(),
+                'students': Student.objects.count(),
+                'attendance_records': AttendanceRecord.objects.count(),
+                'announcements': Announcement.objects.count(),
+            },
+            'skipped': skipped,
+            'failed': [name for name, result in scenarios.items() if result['failed']],
+        },
+        'scenarios': scenarios,
+    }
+
+
+def compare(report, baseline, threshold=0.2, min_delta_ms=1.0):
+    """
+    Regressions of ``report`` against ``baseline``: p95 latency more than ``threshold``
+    (a fraction) and ``min_delta_ms`` slower, or more SQL queries than before. Failed scenarios
+    on either side timed error responses and are not compared.
+    """
+    regressions = []
+    for name, current in report['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None or previous.get('failed') or current.get('failed'):
+            continue
+        before, after = previous['p95_ms'], current['p95_ms']
+        if after > before * (1 + threshold) and after - before >= min_delta_ms:
+            regressions.append({
+                'scenario': name, 'metric': 'p95_ms', 'baseline': before, 'current': after,
+                'change': round(after / before - 1, 3) if before else None,
+            })
+        if None not in (previous.get('queries'), current['queries']) and current['queries'] > previous['queries']:
+            regressions.append({
+                'scenario': name, 'metric': 'queries', 'baseline': previous['queries'], 'current': current['queries'],
+                'change': current['queries'] - previous['queries'],
+            })
+    return regressions
+
+
+def concurrency_endpoints(fixtures):
+    """
+    (name, WSGI path, ASGI path) of the reads a dashboard fans out to
+    """
+    history = f'student_history/?student_id={fixtures.student.id}'
+    return [
+        ('announcements', '/api/announcements/', '/api/async/announcements/'),
+        ('classes', '/api/classes/', '/api/async/classes/'),
+        ('student_history', f'/api/attendance/{history}', f'/api/async/attendance/{history}'),
+    ]
+
+
+class ThreadSampler:
+    """
+    Peak number of live threads while the block runs
+    """
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = threading.active_count()
+        self.done = threading.Event()
+
+    def sample(self):
+        while not self.done.wait(self.interval):
+            self.peak = max(self.peak, threading.active_count() - 1)
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.done.set()
+        self.thread.join()
+
+
+def summarize(timings, statuses, wall, peak_threads):
+    timings.sort()
+    return {
+        'requests': len(timings),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'throughput_rps': round(len(timings) / wall, 1) if wall else None,
+        **{f'p{p}_ms': round(percentile(timings, p) * 1000, 3) for p in PERCENTILES},
+        'peak_threads': peak_threads,
+    }
+
+
+def run_wsgi(app, path, token, concurrency, requests, threads):
+    """
+    ``concurrency`` clients in a closed loop against ``threads`` WSGI worker threads
+    """
+    factory = RequestFactory()
+    counter = itertools.count()
+    timings, statuses = [], Counter()
+    lock = threading.Lock()
+
+    def handle():
+        environ = factory.get(path, HTTP_AUTHORIZATION=f'Bearer {token}').environ
+        status = []
+        result = app(environ, lambda line, headers, exc_info=None: status.append(int(line.split()[0])))
+        try:
+            b''.join(result)
+        finally:
+            # Fires request_finished, which closes this thread's database connections
+            result.close()
+        return status[0]
+
+    def client(server):
+        while next(counter) < requests:
+            started = time.perf_counter()
+            status = server.submit(handle).result()
+            elapsed = time.perf_counter() - started
+            with lock:
+                timings.append(elapsed)
+                statuses[status] += 1
+
+    with ThreadSampler() as sampler, ThreadPoolExecutor(threads) as server, ThreadPoolExecutor(concurrency) as clients:
+        started = time.perf_counter()
+        for future in [clients.submit(client, server) for _ in range(concurrency)]:
+            future.result()
+        wall = time.perf_counter() - started
+    return summarize(timings, statuses, wall, sampler.peak)
+
+
+async def asgi_request(app, path, token):
+    url = urlsplit(path)
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': url.path, 'raw_path': url.path.encode(), 'query_string': url.query.encode(),
+        'root_path': '', 'headers': [(b'host', b'testserver'), (b'authorization', f'Bearer {token}'.encode())],
+        'server': ('testserver', 80), 'client': ('127.0.0.1', 50000),
+    }
+    request_sent = False
+    status = []
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # Django listens for a disconnect until the response is sent, then cancels this
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+def run_asgi(app, path, token, concurrency, requests):
+    """
+    ``concurrency`` clients in a closed loop against the ASGI application on one event loop
+    """
+    counter = itertools.count()
+    timings, statuses = [], Counter()
+
+    async def client():
+        while next(counter) < requests:
+            started = time.perf_counter()
+            status = await asgi_request(app, path, token)
+            timings.append(time.perf_counter() - started)
+            statuses[status] += 1
+
+    async def main():
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+
+    with ThreadSampler() as sampler:
+        started = time.perf_counter()
+        asyncio.run(main())
+        wall = time.perf_counter() - started
+    return summarize(timings, statuses, wall, sampler.peak)
+
+
+def run_concurrency(levels=(1, 8, 32), requests=200, wsgi_threads=8, only=None, password='student123', log=None):
+    """
+    Throughput and latency of the dashboard reads per endpoint, transport and concurrency level
+    """
+    log = log or (lambda message: None)
+    fixtures = discover_fixtures(password)
+    token = str(RefreshToken.for_user(fixtures.student.user).access_token)
+    pattern = re.compile(only) if only else None
+    wsgi_app, asgi_app = get_wsgi_application(), get_asgi_application()
+
+    results = []
+    for name, wsgi_path, asgi_path in concurrency_endpoints(fixtures):
+        if pattern and not pattern.search(name):
+            continue
+        for concurrency in levels:
+            log(f'{name} x{concurrency}...')
+            for transport, run in (
+                ('wsgi', lambda: run_wsgi(wsgi_app, wsgi_path, token, concurrency, requests, wsgi_threads)),
+                ('asgi', lambda: run_asgi(asgi_app, asgi_path, token, concurrency, requests)),
+            ):
+                results.append({'endpoint': name, 'transport': transport, 'concurrency': concurrency, **run()})
+
+    return {
+        'meta': {
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'requests': requests,
+            'wsgi_threads': wsgi_threads,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+        },
+        'results': results,
+    }
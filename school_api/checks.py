@@ -0,0 +1,39 @@
+"""
+System checks for the project's cache-backed correctness mechanisms.
+
+ETag version counters (conditional.py), the roster index version (roster.py), replica pins
+(replicas.py) and the announcement feed generations (feed_cache.py) only work when every
+worker sees the same cache: a write handled by one worker has to move the counters the others
+read, or they keep answering 304 and serving stale pages. Process-local backends cannot do
+that, so they are flagged outside DEBUG.
+"""
+from django.conf import settings
+from django.core import checks
+
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def shared_cache_aliases():
+    return sorted({'default', getattr(settings, 'ANNOUNCEMENT_FEED_CACHE', 'default')})
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    if settings.DEBUG:
+        return []
+    errors = []
+    for alias in shared_cache_aliases():
+        backend = settings.CACHES.get(alias, {}).get('BACKEND')
+        if backend in PROCESS_LOCAL_BACKENDS:
+            errors.append(checks.Warning(
+                f'The "{alias}" cache uses {backend.rsplit(".", 1)[-1]}, which is not shared between worker '
+                f'processes.',
+                hint='ETags, replica pins, the roster index and the announcement feed need a cache every '
+                     'worker shares (e.g. Redis, Memcached or FileBasedCache) unless a single process serves '
+                     'the API.',
+                id='school_api.W001',
+            ))
+    return errors
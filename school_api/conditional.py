@@ -0,0 +1,222 @@
+"""
+Conditional GET (ETag / Last-Modified) support for the viewsets.
+
+A list's validator is its filtered queryset's row count and latest ``updated_at``; a
+detail's is the object's ``updated_at``. Either is combined with version counters of the
+related models the serializer renders (teacher names, subject names, enrollments), which
+signals.py bumps on every change. Plain GETs pay nothing extra for their validators: the
+page's count query also takes the latest ``updated_at``, and details read it off the object
+they serialize. Only requests carrying If-None-Match (or, for details, If-Modified-Since)
+compute the validator up front, one aggregate or one column lookup, and a match returns 304
+before the page is queried or serialized. Lists send no Last-Modified: deleting an older
+row does not move the latest ``updated_at``, only the count inside the ETag catches that.
+Neither do details that render related data: a date cannot carry the version counters, so a
+renamed teacher would not move it. Cursor-paged lists get no validators either, since they
+exist to avoid counting the whole table.
+"""
+import functools
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Count, Max
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+KEY_PREFIX = 'school_api:versions'
+
+
+def version_key(name):
+    return f'{KEY_PREFIX}:{name}'
+
+
+def get_versions(names):
+    """
+    Current value of each named version counter, read in one round trip
+    """
+    if not names:
+        return []
+    values = cache.get_many([version_key(name) for name in names])
+    versions = []
+    for name in names:
+        version = values.get(version_key(name))
+        if version is None:
+            # Seed missing counters from the clock so they never rewind onto an old value
+            cache.add(version_key(name), time.time_ns(), timeout=None)
+            version = cache.get(version_key(name))
+        versions.append(version)
+    return versions
+
+
+def bump_versions(*names):
+    for name in names:
+        try:
+            cache.incr(version_key(name))
+        except ValueError:
+            cache.set(version_key(name), time.time_ns(), timeout=None)
+
+
+def make_etag(request, *parts):
+    """
+    Strong ETag over the validator parts, the query string and the negotiated format
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    payload = '|'.join(str(part) for part in (
+        request.path, request.META.get('QUERY_STRING', ''), getattr(renderer, 'format', ''), *parts
+    ))
+    return quote_etag(hashlib.md5(payload.encode(), usedforsecurity=False).hexdigest())
+
+
+def etag_matches(request, etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    candidates = {candidate.strip() for candidate in header.split(',')}
+    return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+
+
+def is_conditional(request):
+    return bool(request.headers.get('If-None-Match') or request.headers.get('If-Modified-Since'))
+
+
+def not_modified_since(request, last_modified):
+    if request.headers.get('If-None-Match') or last_modified is None:
+        return False
+    since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return since is not None and int(last_modified.timestamp()) <= since
+
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Revalidate every time, and never share a user's validated copy with another user
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+def not_modified(etag, last_modified=None):
+    return set_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+
+
+class SummaryPaginator(Paginator):
+    """
+    A Paginator handed its row count, so pages reuse the list validator's aggregate
+    """
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        if count is not None:
+            # Stands in for the cached property
+            self.__dict__['count'] = count
+
+
+class ConditionalGetMixin:
+    """
+    Adds ETag validation to ``list`` and ETag/Last-Modified to ``retrieve``.
+
+    ``conditional_versions`` names the version counters of related data the serializer
+    renders; details with any are validated by ETag alone. Models without ``updated_at`` set
+    ``conditional_aggregate = False`` and are validated by their own version counter alone.
+    """
+    conditional_versions = ()
+    conditional_aggregate = True
+    list_summary = None
+    conditional_object = None
+
+    def summarize(self, queryset):
+        return queryset.order_by().aggregate(count=Count('pk'), last=Max('updated_at'))
+
+    def list_validator(self, request, summary=None):
+        # Scoped querysets can share a count and timestamp, so the user is part of the tag
+        parts = [request.user.pk, *get_versions(self.conditional_versions)]
+        if self.conditional_aggregate:
+            if summary is None:
+                summary = self.summarize(self.filter_queryset(self.get_queryset()))
+            parts += [summary['count'], summary['last'] and summary['last'].isoformat()]
+        return make_etag(request, *parts)
+
+    def detail_validator(self, request, last_modified):
+        return make_etag(
+            request, request.user.pk, *get_versions(self.conditional_versions),
+            last_modified and last_modified.isoformat()
+        )
+
+    def uses_last_modified(self):
+        return self.conditional_aggregate and not self.conditional_versions
+
+    def paginate_queryset(self, queryset):
+        paginator = self.paginator
+        if self.conditional_aggregate and paginator is not None and hasattr(paginator, 'django_paginator_class') \
+                and not self.uses_cursor(self.request):
+            # One query both counts the rows for the page links and gives the validator
+            if self.list_summary is None:
+                self.list_summary = self.summarize(queryset)
+            paginator.django_paginator_class = functools.partial(SummaryPaginator, count=self.list_summary['count'])
+        return super().paginate_queryset(queryset)
+
+    def uses_cursor(self, request):
+        use_cursor = getattr(self.paginator, 'use_cursor', None)
+        return use_cursor is not None and use_cursor(request)
+
+    def list(self, request, *args, **kwargs):
+        if self.conditional_aggregate and self.uses_cursor(request):
+            return super().list(request, *args, **kwargs)
+
+        etag = None
+        if request.headers.get('If-None-Match'):
+            if self.conditional_aggregate:
+                self.list_summary = self.summarize(self.filter_queryset(self.get_queryset()))
+            etag = self.list_validator(request, self.list_summary)
+            if etag_matches(request, etag):
+                return not_modified(etag)
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            set_validators(response, etag or self.list_validator(request, self.list_summary))
+        return response
+
+    def get_object(self):
+        self.conditional_object = super().get_object()
+        return self.conditional_object
+
+    def retrieve(self, request, *args, **kwargs):
+        if not is_conditional(request):
+            response = super().retrieve(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                last_modified = getattr(self.conditional_object, 'updated_at', None) \
+                    if self.conditional_aggregate else None
+                set_validators(
+                    response, self.detail_validator(request, last_modified),
+                    last_modified if self.uses_last_modified() else None
+                )
+            return response
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        last_modified = None
+        if self.conditional_aggregate:
+            try:
+                last_modified = (
+                    self.filter_queryset(self.get_queryset()).order_by()
+                    .filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+                    .values_list('updated_at', flat=True).first()
+                )
+            except (TypeError, ValueError, ValidationError):
+                last_modified = None
+            if last_modified is None:
+                # Missing or invisible; let the normal path produce the 404
+                return super().retrieve(request, *args, **kwargs)
+
+        etag = self.detail_validator(request, last_modified)
+        if not self.uses_last_modified():
+            # Still part of the ETag, but not a validator of its own
+            last_modified = None
+        if etag_matches(request, etag) or not_modified_since(request, last_modified):
+            return not_modified(etag, last_modified)
+        response = super().retrieve(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            set_validators(response, etag, last_modified)
+        return response
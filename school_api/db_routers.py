@@ -0,0 +1,36 @@
+"""
+Database routing for read replicas and the SQLite concurrency mode.
+
+Writes and migrations always use the primary, default. A read goes to the replica that
+ReplicaPinningMiddleware chose for the current request (school_api.replicas), if any.
+Otherwise it goes to the query-only READ_ALIAS connection of SQLITE_CONCURRENCY_MODE, so it
+never queues behind the writer's connection. Either way, reads while the default connection
+is inside a transaction stay on default, because they must see the transaction's own
+uncommitted writes. All aliases hold the same data, so objects may be related across them.
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .replicas import current_replica
+
+READ_ALIAS = 'read'
+
+
+class ReadWriteRouter:
+    def db_for_read(self, model, **hints):
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replica = current_replica.get()
+        if replica is not None:
+            return replica
+        return READ_ALIAS if READ_ALIAS in settings.DATABASES else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Explicit, or instances loaded through the read alias would be saved there
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
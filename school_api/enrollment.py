@@ -0,0 +1,81 @@
+"""
+Batched enrollment of students into classes.
+
+All requested (class, student) links are validated with one query per table, the ones that
+already exist are found with a single query on the enrollment table, and the new links are
+written with one multi-row INSERT. bulk_create on the through model does not send
+m2m_changed, so the roster index and enrollment version are updated here instead of by
+signals.py.
+"""
+import uuid
+from collections import defaultdict
+
+from .conditional import bump_versions
+from .models import Class, Student
+from .roster import invalidate_roster_index
+
+Enrollment = Student.classes.through
+
+
+def enroll(pairs, allowed_class_ids=None, batch_size=1000):
+    """
+    Link students to classes. ``pairs`` is an iterable of (class_id, student_ids).
+
+    Pairs naming an unknown class or student, or a class outside ``allowed_class_ids`` when
+    given, are invalid; links that already exist (or repeat within the request) are skipped.
+    Returns {"added": n, "skipped": n, "invalid": n}.
+    """
+    requested = defaultdict(set)
+    invalid = 0
+    repeated = 0
+    for class_id, student_ids in pairs:
+        for student_id in student_ids:
+            try:
+                key = (uuid.UUID(str(class_id)), uuid.UUID(str(student_id)))
+            except ValueError:
+                invalid += 1
+                continue
+            if key[1] in requested[key[0]]:
+                repeated += 1
+            requested[key[0]].add(key[1])
+    total = sum(len(students) for students in requested.values())
+
+    class_ids = set(Class.objects.filter(id__in=requested).values_list('id', flat=True))
+    if allowed_class_ids is not None:
+        class_ids &= set(allowed_class_ids)
+    known_students = set(
+        Student.objects.filter(
+            id__in={student_id for students in requested.values() for student_id in students}
+        ).values_list('id', flat=True)
+    )
+    wanted = {
+        (class_id, student_id)
+        for class_id, requested_students in requested.items() if class_id in class_ids
+        for student_id in requested_students if student_id in known_students
+    }
+    invalid += total - len(wanted)
+
+    existing = set()
+    if wanted:
+        existing = wanted & set(
+            Enrollment.objects.filter(
+                class_id__in={class_id for class_id, _ in wanted},
+                student_id__in={student_id for _, student_id in wanted},
+            ).values_list('class_id', 'student_id')
+        )
+
+    new_links = [
+        Enrollment(class_id=class_id, student_id=student_id)
+        for class_id, student_id in sorted(wanted - existing)
+    ]
+    if new_links:
+        # ignore_conflicts covers links created concurrently since the existence check
+        Enrollment.objects.bulk_create(new_links, batch_size=batch_size, ignore_conflicts=True)
+        invalidate_roster_index()
+        bump_versions('enrollments')
+
+    return {
+        'added': len(new_links),
+        'skipped': len(existing) + repeated,
+        'invalid': invalid,
+    }
@@ -0,0 +1,64 @@
+"""
+Streaming CSV / NDJSON encoders for large exports.
+
+Rows come from a values_list() queryset read with iterator(), which uses a server-side cursor
+where the database supports one, so memory stays flat however many rows are exported.
+"""
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+ATTENDANCE_EXPORT_FIELDS = [
+    'id', 'attendance_date', 'attendance_time', 'status', 'notes', 'checkin_method',
+    'student_id', 'student__roll_number', 'student__user__first_name', 'student__user__last_name',
+    'class_obj_id', 'class_obj__name', 'recorded_by_id', 'created_at', 'updated_at',
+]
+
+ATTENDANCE_EXPORT_HEADERS = [
+    'id', 'attendance_date', 'attendance_time', 'status', 'notes', 'checkin_method',
+    'student', 'roll_number', 'student_first_name', 'student_last_name',
+    'class_obj', 'class_name', 'recorded_by', 'created_at', 'updated_at',
+]
+
+
+class Echo:
+    """
+    File-like object whose write() hands the line back instead of storing it
+    """
+    def write(self, value):
+        return value
+
+
+def _rows(queryset, fields, chunk_size):
+    return queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+
+
+def stream_csv(queryset, fields, headers, chunk_size=2000):
+    writer = csv.writer(Echo())
+    yield writer.writerow(headers)
+    buffer = []
+    for row in _rows(queryset, fields, chunk_size):
+        buffer.append(writer.writerow(row))
+        if len(buffer) >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_ndjson(queryset, fields, headers, chunk_size=2000):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    buffer = []
+    for row in _rows(queryset, fields, chunk_size):
+        buffer.append(encoder.encode(dict(zip(headers, row))) + '\n')
+        if len(buffer) >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv', 'csv'),
+    'ndjson': (stream_ndjson, 'application/x-ndjson', 'ndjson'),
+}
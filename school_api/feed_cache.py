@@ -0,0 +1,172 @@
+"""
+Response cache for the announcement feed.
+
+Rendered list responses are cached per audience bucket (what a role is allowed to see) and
+query string. Each bucket has a generation counter stored next to the entries; the signal
+handlers in signals.py bump the counters of exactly the buckets an announcement is visible
+to when it is created, edited or deleted, which orphans their cached pages. Entries and
+counters live in the cache named by ANNOUNCEMENT_FEED_CACHE, so with a shared backend (file,
+Redis, memcached) invalidation reaches every worker; local-memory caches are per process.
+The a-prefixed functions are the async-cache versions used by the async feed view.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+KEY_PREFIX = 'school_api:announcements'
+
+ROLE_BUCKETS = {
+    'Administrator': 'staff',
+    'Teacher': 'staff',
+    'Student': 'students',
+    'Parent': 'parents',
+}
+
+AUDIENCE_BUCKETS = {
+    'All': ('staff', 'students', 'parents'),
+    'Students': ('staff', 'students'),
+    'Teachers': ('staff',),
+    'Parents': ('staff', 'parents'),
+}
+
+ALL_BUCKETS = AUDIENCE_BUCKETS['All']
+
+
+def get_cache():
+    return caches[getattr(settings, 'ANNOUNCEMENT_FEED_CACHE', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'ANNOUNCEMENT_FEED_CACHE_TIMEOUT', 300)
+
+
+def generation_key(bucket):
+    return f'{KEY_PREFIX}:generation:{bucket}'
+
+
+def page_key(bucket, request):
+    params = '&'.join(
+        f'{name}={value}' for name, values in sorted(request.query_params.lists()) for value in values
+    )
+    # The path keeps the async feed's pages (and their next/previous links) apart
+    digest = hashlib.md5(f'{request.get_host()}{request.path}?{params}'.encode(), usedforsecurity=False).hexdigest()
+    return f'{KEY_PREFIX}:page:{bucket}:{digest}'
+
+
+def bucket_for(user):
+    return ROLE_BUCKETS.get(getattr(user, 'role', None))
+
+
+def get_generation(bucket):
+    generation = get_cache().get(generation_key(bucket))
+    if generation is None:
+        get_cache().add(generation_key(bucket), time.time_ns(), timeout=None)
+        generation = get_cache().get(generation_key(bucket))
+    return generation
+
+
+def get_page(bucket, request):
+    """
+    Return (data, generation) for this bucket and query string; data is None on a miss.
+    The entry and the bucket's generation are read in one round trip. Pass the generation
+    back to set_page so a page rendered while an invalidation happened is never served.
+    """
+    cache = get_cache()
+    key = page_key(bucket, request)
+    values = cache.get_many([generation_key(bucket), key])
+    generation = values.get(generation_key(bucket))
+    if generation is None:
+        # Seed a missing (new or evicted) counter from the clock so it never rewinds onto old entries
+        cache.add(generation_key(bucket), time.time_ns(), timeout=None)
+        generation = cache.get(generation_key(bucket))
+    entry = values.get(key)
+    if entry is not None and entry[0] == generation:
+        record_lookup(hit=True)
+        return entry[1], generation
+    record_lookup(hit=False)
+    return None, generation
+
+
+def set_page(bucket, request, generation, data):
+    get_cache().set(page_key(bucket, request), (generation, data), timeout=get_timeout())
+
+
+async def aget_generation(bucket):
+    cache = get_cache()
+    generation = await cache.aget(generation_key(bucket))
+    if generation is None:
+        await cache.aadd(generation_key(bucket), time.time_ns(), timeout=None)
+        generation = await cache.aget(generation_key(bucket))
+    return generation
+
+
+async def aget_page(bucket, request):
+    cache = get_cache()
+    key = page_key(bucket, request)
+    values = await cache.aget_many([generation_key(bucket), key])
+    generation = values.get(generation_key(bucket))
+    if generation is None:
+        generation = await aget_generation(bucket)
+    entry = values.get(key)
+    if entry is not None and entry[0] == generation:
+        await arecord_lookup(hit=True)
+        return entry[1], generation
+    await arecord_lookup(hit=False)
+    return None, generation
+
+
+async def aset_page(bucket, request, generation, data):
+    await get_cache().aset(page_key(bucket, request), (generation, data), timeout=get_timeout())
+
+
+def invalidate(buckets=ALL_BUCKETS):
+    cache = get_cache()
+    for bucket in buckets:
+        try:
+            cache.incr(generation_key(bucket))
+        except ValueError:
+            cache.set(generation_key(bucket), time.time_ns(), timeout=None)
+
+
+def invalidate_audiences(*audiences):
+    buckets = set()
+    for audience in audiences:
+        buckets.update(AUDIENCE_BUCKETS.get(audience, ALL_BUCKETS))
+    invalidate(sorted(buckets))
+
+
+def record_lookup(hit):
+    cache = get_cache()
+    key = f'{KEY_PREFIX}:{"hits" if hit else "misses"}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+async def arecord_lookup(hit):
+    cache = get_cache()
+    key = f'{KEY_PREFIX}:{"hits" if hit else "misses"}'
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aadd(key, 1, timeout=None)
+
+
+def get_stats():
+    cache = get_cache()
+    values = cache.get_many([f'{KEY_PREFIX}:hits', f'{KEY_PREFIX}:misses'])
+    hits = values.get(f'{KEY_PREFIX}:hits', 0)
+    misses = values.get(f'{KEY_PREFIX}:misses', 0)
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / lookups if lookups else None,
+    }
+
+
+def reset_stats():
+    get_cache().delete_many([f'{KEY_PREFIX}:hits', f'{KEY_PREFIX}:misses'])
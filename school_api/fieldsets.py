@@ -0,0 +1,282 @@
+"""
+Sparse fieldsets and the serializer-free read path for list endpoints.
+
+``?fields=id,name`` keeps only the named top-level fields of a read and ``?omit=`` drops
+them (SparseFieldsMixin in serializers.py does the pruning). LeanListMixin then renders list
+pages without running the serializer per row: the pruned serializer is planned once into
+``values()`` columns, so plain model fields are formatted by the serializer field's own
+``to_representation``, foreign keys come back as ids, nested serializers over a foreign key
+are read through joins, and SerializerMethodFields are computed in SQL from the serializer's
+``Meta.lean_annotations``. Forward many-to-many fields cost one query per relation, like
+prefetch_related. The rows equal the serializer's output; anything the planner cannot
+express (custom to_representation, unannotated method fields, dotted sources) falls back to
+the serializer. LEAN_LIST_SERIALIZATION = False turns the path off.
+"""
+import datetime
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.db.models import F
+from rest_framework import ISO_8601, serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField, RelatedField
+from rest_framework.response import Response
+
+from .metrics import serializing
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+# Entry kinds of a ValuesPlan
+COLUMN, NESTED, MANY = range(3)
+
+
+def parse_field_names(request, param):
+    """
+    Names in a comma-separated query parameter, or None when it is absent
+    """
+    value = request.query_params.get(param)
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class SparseFieldsetMixin:
+    """
+    Passes ?fields= / ?omit= to the serializer context on reads
+    """
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request is not None and self.request.method in SAFE_METHODS:
+            context['fields'] = parse_field_names(self.request, FIELDS_PARAM)
+            context['omit'] = parse_field_names(self.request, OMIT_PARAM)
+        return context
+
+
+class Unsupported(Exception):
+    pass
+
+
+def iso_datetime(value, tz):
+    value = value.astimezone(tz).isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def iso_format(field, default):
+    output_format = getattr(field, 'format', default)
+    return isinstance(output_format, str) and output_format.lower() == ISO_8601
+
+
+def formatter(field, model_field):
+    """
+    The cheapest callable equal to ``field.to_representation`` on this column's values;
+    None when the value is already its own representation
+    """
+    field_type = type(field)
+    if field_type is serializers.UUIDField and field.uuid_format == 'hex_verbose':
+        return str
+    if field_type in (serializers.CharField, serializers.ChoiceField) \
+            and isinstance(model_field, (models.CharField, models.TextField)):
+        if field_type is serializers.CharField or all(isinstance(key, str) for key in field.choices):
+            return None
+    if field_type is serializers.DateField and iso_format(field, api_settings.DATE_FORMAT):
+        return datetime.date.isoformat
+    if field_type is serializers.TimeField and iso_format(field, api_settings.TIME_FORMAT):
+        return datetime.time.isoformat
+    if field_type is serializers.DateTimeField and iso_format(field, api_settings.DATETIME_FORMAT):
+        tz = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if tz is not None:
+            return lambda value: iso_datetime(value, tz)
+    return field.to_representation
+
+
+class ManyRelation:
+    """
+    One forward many-to-many source of a plan: the related rows of every owner on the page,
+    as pks and, when a nested serializer renders them, as planned rows
+    """
+    def __init__(self, model_field):
+        self.related_model = model_field.related_model
+        self.query_name = model_field.related_query_name()
+        self.plan = None
+
+    def fetch_queryset(self, owner_ids):
+        queryset = self.related_model._default_manager.filter(**{f'{self.query_name}__in': owner_ids})
+        if self.plan is None:
+            return queryset.values(lean_owner=F(self.query_name), lean_pk=F('pk'))
+        return self.plan.queryset(queryset, lean_owner=F(self.query_name), lean_pk=F('pk'))
+
+    def group(self, owner_ids, related_rows):
+        """
+        {owner id: ([related pks], [related rows])}
+        """
+        grouped = {owner_id: ([], []) for owner_id in owner_ids}
+        for values in related_rows:
+            pks, rows = grouped[values['lean_owner']]
+            pks.append(values['lean_pk'])
+            if self.plan is not None:
+                rows.append(self.plan.row(values))
+        return grouped
+
+    def fetch(self, owner_ids):
+        return self.group(owner_ids, self.fetch_queryset(owner_ids))
+
+    async def afetch(self, owner_ids):
+        return self.group(owner_ids, [values async for values in self.fetch_queryset(owner_ids)])
+
+
+class ValuesPlan:
+    """
+    The readable fields of a ModelSerializer as values() columns and row builders.
+    Raises Unsupported for fields it cannot read without the serializer.
+    """
+    def __init__(self, serializer, prefix='', allow_many=True):
+        if type(serializer).to_representation is not serializers.ModelSerializer.to_representation:
+            raise Unsupported(type(serializer).__name__)
+        self.model = serializer.Meta.model
+        self.prefix = prefix
+        self.paths = []
+        self.annotations = {}
+        self.entries = []
+        self.many = {}
+        annotations = getattr(serializer.Meta, 'lean_annotations', {})
+
+        for field in serializer._readable_fields:
+            name, source = field.field_name, field.source
+            if name in annotations:
+                if prefix:
+                    raise Unsupported(name)
+                key = f'lean_{name}'
+                self.annotations[key] = annotations[name]
+                self.entries.append((name, COLUMN, key, None))
+            elif isinstance(field, serializers.SerializerMethodField) or source == '*' or '.' in source:
+                raise Unsupported(name)
+            elif isinstance(field, (ManyRelatedField, serializers.ListSerializer)):
+                self.add_many(field, name, source, allow_many)
+            elif isinstance(field, PrimaryKeyRelatedField):
+                if field.pk_field is not None:
+                    raise Unsupported(name)
+                self.add_column(name, self.model_field(source).attname, None)
+            elif isinstance(field, serializers.ModelSerializer):
+                model_field = self.model_field(source)
+                if not (model_field.many_to_one or model_field.one_to_one) or not model_field.concrete or model_field.null:
+                    raise Unsupported(name)
+                nested = ValuesPlan(field, prefix=f'{prefix}{source}__', allow_many=False)
+                self.paths.extend(nested.paths)
+                self.entries.append((name, NESTED, None, nested))
+            elif isinstance(field, (RelatedField, serializers.BaseSerializer)):
+                raise Unsupported(name)
+            else:
+                model_field = self.model_field(source)
+                if model_field.is_relation:
+                    raise Unsupported(name)
+                self.add_column(name, model_field.attname, formatter(field, model_field))
+
+    def model_field(self, source):
+        try:
+            return self.model._meta.get_field(source)
+        except FieldDoesNotExist:
+            raise Unsupported(source)
+
+    def add_column(self, name, attname, formatter):
+        key = f'{self.prefix}{attname}'
+        self.paths.append(key)
+        self.entries.append((name, COLUMN, key, formatter))
+
+    def add_many(self, field, name, source, allow_many):
+        model_field = self.model_field(source)
+        if not allow_many or not model_field.many_to_many or model_field.auto_created:
+            raise Unsupported(name)
+        relation = self.many.get(source)
+        if relation is None:
+            relation = self.many[source] = ManyRelation(model_field)
+        if isinstance(field, serializers.ListSerializer):
+            if relation.plan is None:
+                relation.plan = ValuesPlan(field.child, allow_many=False)
+            self.entries.append((name, MANY, source, 1))
+        else:
+            child = field.child_relation
+            if not isinstance(child, PrimaryKeyRelatedField) or child.pk_field is not None:
+                raise Unsupported(name)
+            self.entries.append((name, MANY, source, 0))
+
+    def queryset(self, queryset, *extra_paths, **extra_annotations):
+        pk_name = self.model._meta.pk.attname
+        paths = dict.fromkeys([pk_name, *self.paths, *extra_paths])
+        return queryset.prefetch_related(None).values(*paths, **self.annotations, **extra_annotations)
+
+    def row(self, values):
+        data = {}
+        for name, kind, key, extra in self.entries:
+            if kind == COLUMN:
+                value = values[key]
+                data[name] = value if extra is None or value is None else extra(value)
+            elif kind == NESTED:
+                data[name] = extra.row(values)
+            else:
+                # Filled in by rows() once the page's relations are fetched; keeps the field order
+                data[name] = None
+        return data
+
+    def rows(self, page):
+        page = list(page)
+        data = [self.row(values) for values in page]
+        if self.many:
+            owner_ids = self.owner_ids(page)
+            self.attach(page, data, {source: relation.fetch(owner_ids) for source, relation in self.many.items()})
+        return data
+
+    async def arows(self, page):
+        """
+        ``rows`` for a values() queryset read with the async ORM
+        """
+        page = [values async for values in page]
+        data = [self.row(values) for values in page]
+        if self.many:
+            owner_ids = self.owner_ids(page)
+            fetched = {source: await relation.afetch(owner_ids) for source, relation in self.many.items()}
+            self.attach(page, data, fetched)
+        return data
+
+    def owner_ids(self, page):
+        pk_name = self.model._meta.pk.attname
+        return [values[pk_name] for values in page]
+
+    def attach(self, page, data, fetched):
+        pk_name = self.model._meta.pk.attname
+        for values, row in zip(page, data):
+            for name, kind, source, index in self.entries:
+                if kind == MANY:
+                    row[name] = fetched[source][values[pk_name]][index]
+
+
+def plan_for(serializer):
+    try:
+        return ValuesPlan(serializer)
+    except Unsupported:
+        return None
+
+
+class LeanListMixin:
+    """
+    Serves ``list`` from values() rows planned from the serializer; see the module docstring
+    """
+    def lean_list_enabled(self):
+        return getattr(settings, 'LEAN_LIST_SERIALIZATION', True)
+
+    def list(self, request, *args, **kwargs):
+        plan = plan_for(self.get_serializer()) if self.lean_list_enabled() else None
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+
+        # Keyset pagination reads its ordering columns from the rows
+        ordering = [name.lstrip('-') for name in getattr(self.paginator, 'ordering', ())]
+        rows = plan.queryset(self.filter_queryset(self.get_queryset()), *ordering)
+        page = self.paginate_queryset(rows)
+        with serializing(request):
+            data = plan.rows(rows if page is None else page)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
@@ -0,0 +1,169 @@
+"""
+Bulk import of users (and the Student rows of student users) from CSV or JSON.
+
+Rows are validated up front and the accounts are written with bulk_create in chunks of
+``batch_size``, each chunk in its own transaction. Bad rows are reported with their row
+number and never abort the rest of the import. Passwords are hashed in the calling
+process by default. The import_users command spreads them over a process pool instead
+(PBKDF2 is CPU-bound, so threads would not help); the API endpoint never starts one, and
+takes at most USER_IMPORT_MAX_ROWS rows.
+"""
+import csv
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import get_hasher
+from django.db import transaction, IntegrityError
+
+from .models import Student
+from .roster import invalidate_roster_index
+from .search import index_objects
+from .serializers import UserImportRowSerializer
+
+User = get_user_model()
+
+# Below this many passwords starting worker processes costs more than it saves
+MIN_PARALLEL_PASSWORDS = 64
+
+
+def parse_rows(content, file_format):
+    """
+    Turn CSV text or a JSON array of objects into a list of dicts
+    """
+    if file_format == 'csv':
+        return [dict(row) for row in csv.DictReader(io.StringIO(content))]
+    rows = json.loads(content)
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        raise ValueError('Expected a JSON array of objects.')
+    return rows
+
+
+def _hash_chunk(hasher, passwords):
+    return [hasher.encode(password, hasher.salt()) for password in passwords]
+
+
+def hash_passwords(passwords, workers=None):
+    """
+    Hash ``passwords`` with the default hasher, in order, spread over ``workers`` processes
+    """
+    hasher = get_hasher()
+    if workers is None:
+        workers = getattr(settings, 'USER_IMPORT_HASH_WORKERS', None) or os.cpu_count() or 1
+    if workers <= 1 or len(passwords) < MIN_PARALLEL_PASSWORDS:
+        return _hash_chunk(hasher, passwords)
+
+    # The hasher instance is sent along so workers need no Django settings of their own
+    size = -(-len(passwords) // (workers * 4))
+    chunks = [passwords[i:i + size] for i in range(0, len(passwords), size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(_hash_chunk, [hasher] * len(chunks), chunks)
+        return [encoded for chunk in results for encoded in chunk]
+
+
+def import_users(rows, batch_size=None, workers=1):
+    """
+    Create the users described by ``rows``. Returns {"created": n, "errors": [{"row": n, "errors": {...}}]}
+    with 1-based row numbers. Passwords are hashed in this process unless ``workers`` asks for
+    more (None: USER_IMPORT_HASH_WORKERS).
+    """
+    batch_size = batch_size or getattr(settings, 'USER_IMPORT_BATCH_SIZE', 500)
+    errors = []
+    valid = []
+    usernames = set()
+    roll_numbers = set()
+    for number, row in enumerate(rows, start=1):
+        serializer = UserImportRowSerializer(data=row)
+        if not serializer.is_valid():
+            errors.append({'row': number, 'errors': serializer.errors})
+            continue
+        data = serializer.validated_data
+        if data['username'] in usernames:
+            errors.append({'row': number, 'errors': {'username': ['Duplicate username in import.']}})
+            continue
+        is_student = data['role'] == 'Student'
+        if is_student and data['roll_number'] in roll_numbers:
+            errors.append({'row': number, 'errors': {'roll_number': ['Duplicate roll number in import.']}})
+            continue
+        usernames.add(data['username'])
+        if is_student:
+            roll_numbers.add(data['roll_number'])
+        valid.append((number, data))
+
+    hashes = hash_passwords([data['password'] for _, data in valid], workers=workers)
+
+    created = 0
+    student_ids = []
+    for start in range(0, len(valid), batch_size):
+        chunk = list(zip(valid[start:start + batch_size], hashes[start:start + batch_size]))
+        chunk_created, chunk_students, chunk_errors = _import_chunk(chunk)
+        created += chunk_created
+        student_ids.extend(chunk_students)
+        errors.extend(chunk_errors)
+
+    # bulk_create sends no post_save, so do what the signal handlers would have done
+    if student_ids:
+        invalidate_roster_index()
+        index_objects('student', id__in=student_ids)
+
+    errors.sort(key=lambda error: error['row'])
+    return {'created': created, 'errors': errors}
+
+
+def _build(data, password):
+    user = User(
+        username=data['username'], email=data.get('email', ''), first_name=data.get('first_name', ''),
+        last_name=data.get('last_name', ''), role=data['role'], password=password
+    )
+    student = Student(user=user, roll_number=data['roll_number']) if data['role'] == 'Student' else None
+    return user, student
+
+
+def _import_chunk(chunk):
+    """
+    Write one chunk; rows clashing with existing accounts are reported instead of written
+    """
+    errors = []
+    taken_usernames = set(
+        User.objects.filter(username__in=[data['username'] for (_, data), _ in chunk])
+        .values_list('username', flat=True)
+    )
+    taken_roll_numbers = set(
+        Student.objects.filter(roll_number__in=[data.get('roll_number') for (_, data), _ in chunk])
+        .values_list('roll_number', flat=True)
+    )
+    users = []
+    for (number, data), password in chunk:
+        if data['username'] in taken_usernames:
+            errors.append({'row': number, 'errors': {'username': ['A user with that username already exists.']}})
+            continue
+        if data['role'] == 'Student' and data['roll_number'] in taken_roll_numbers:
+            errors.append({'row': number, 'errors': {'roll_number': ['A student with that roll number already exists.']}})
+            continue
+        user, student = _build(data, password)
+        users.append((number, user, student))
+
+    try:
+        with transaction.atomic():
+            User.objects.bulk_create([user for _, user, _ in users])
+            students = Student.objects.bulk_create([student for _, _, student in users if student])
+    except IntegrityError:
+        # Something was created concurrently; fall back to one savepoint per row for this chunk
+        students = []
+        created = 0
+        for number, user, student in users:
+            try:
+                with transaction.atomic():
+                    user.save(force_insert=True)
+                    if student:
+                        student.save(force_insert=True)
+                        students.append(student)
+                created += 1
+            except IntegrityError:
+                errors.append({'row': number, 'errors': {'non_field_errors': ['Conflicts with an existing user.']}})
+        return created, [student.id for student in students], errors
+
+    return len(users), [student.id for student in students], errors
@@ -0,0 +1,65 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from school_api.benchmark import run_benchmark, compare
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks every API endpoint and reports latency percentiles, throughput, queries and memory as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=30, help='Timed requests per scenario')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per scenario first')
+        parser.add_argument('--only', help='Regular expression selecting scenarios, e.g. "^attendance"')
+        parser.add_argument('--base-url', help='Benchmark a running server instead of the in-process test client')
+        parser.add_argument('--password', default='student123', help='Password of the benchmarked student (login)')
+        parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+        parser.add_argument('--compare', metavar='BASELINE', help='Fail on regressions against this stored report')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed relative p95 slowdown in comparisons (default 0.2)')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+
+        # The test client sends Host: testserver
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            try:
+                report = run_benchmark(
+                    iterations=options['iterations'], warmup=options['warmup'], only=options['only'],
+                    base_url=options['base_url'], password=options['password'], log=self.stderr.write
+                )
+            except ValueError as exc:
+                raise CommandError(str(exc))
+
+        regressions = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'Could not read baseline {options["compare"]}: {exc}')
+            regressions = compare(report, baseline, threshold=options['threshold'])
+            report['regressions'] = regressions
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+        failed = report['meta']['failed']
+        for name in failed:
+            self.stderr.write(self.style.ERROR(f"{name}: error responses {report['scenarios'][name]['statuses']}"))
+        if regressions:
+            for regression in regressions:
+                self.stderr.write(self.style.ERROR(
+                    f"{regression['scenario']}: {regression['metric']} {regression['baseline']} -> {regression['current']}"
+                ))
+            raise CommandError(f'{len(regressions)} regressions against {options["compare"]}')
+        if failed:
+            raise CommandError(f'{len(failed)} scenarios answered with errors')
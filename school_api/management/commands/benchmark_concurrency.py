@@ -0,0 +1,44 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from school_api.benchmark import run_concurrency
+
+
+class Command(BaseCommand):
+    help = 'Compares concurrent-connection capacity of the WSGI and ASGI (async endpoint) paths as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--levels', default='1,8,32', help='Comma-separated concurrent client counts')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint, transport and level')
+        parser.add_argument('--wsgi-threads', type=int, default=8, help='Worker threads of the simulated WSGI server')
+        parser.add_argument('--only', help='Regular expression selecting endpoints, e.g. "^classes$"')
+        parser.add_argument('--password', default='student123', help='Password of the benchmarked student')
+        parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options['levels'].split(',')]
+        except ValueError:
+            raise CommandError('--levels must be comma-separated integers')
+        if min(levels) < 1 or options['requests'] < 1 or options['wsgi_threads'] < 1:
+            raise CommandError('--levels, --requests and --wsgi-threads must be positive')
+
+        # Requests are sent with Host: testserver
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            try:
+                report = run_concurrency(
+                    levels=levels, requests=options['requests'], wsgi_threads=options['wsgi_threads'],
+                    only=options['only'], password=options['password'], log=self.stderr.write
+                )
+            except ValueError as exc:
+                raise CommandError(str(exc))
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,33 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from school_api.imports import parse_rows, import_users
+
+
+class Command(BaseCommand):
+    help = 'Creates users (and student records) in bulk from a CSV or JSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV with a header row, or a JSON array of objects')
+        parser.add_argument('--format', choices=['csv', 'json'], help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, help='Users written per transaction')
+        parser.add_argument('--workers', type=int, help='Processes used to hash passwords (default USER_IMPORT_HASH_WORKERS)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('json' if path.lower().endswith('.json') else 'csv')
+        try:
+            with open(path, encoding='utf-8-sig') as f:
+                rows = parse_rows(f.read(), file_format)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Could not read {path}: {exc}')
+
+        self.stdout.write(f'Importing {len(rows)} users...')
+        result = import_users(rows, batch_size=options['batch_size'], workers=options['workers'])
+
+        for error in result['errors']:
+            self.stderr.write(f"Row {error['row']}: {json.dumps(error['errors'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result['created']} users; {len(result['errors'])} rows had errors"
+        ))
@@ -1,14 +1,33 @@
 import datetime
-from django.core.management.base import BaseCommand
+import time
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
 from school_api.models import Subject, Class, Student, AttendanceRecord, Announcement
+from school_api.synthetic import Generator, parse_scale
 
 User = get_user_model()
 
 class Command(BaseCommand):
     help = 'Loads initial data for the school management system'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            help='Generate synthetic data instead: SCHOOLSxCLASSESxSTUDENTSxDAYS, e.g. 2x20x30x180 '
+                 '(students per class, attendance for every scheduled meeting over DAYS days)'
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for --scale')
+        parser.add_argument(
+            '--end-date', type=datetime.date.fromisoformat,
+            help='Last attendance date for --scale (YYYY-MM-DD, default today); fix it for reproducible data'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows inserted per batch for --scale')
+        parser.add_argument('--prefix', default='syn', help='Username prefix for --scale data')
+
     def handle(self, *args, **kwargs):
+        if kwargs.get('scale'):
+            return self.generate(kwargs)
+
         self.stdout.write('Loading initial data...')
         
         # Create users with different roles
@@ -30,6 +49,27 @@ class Command(BaseCommand):
         self.create_announcements()
         
         self.stdout.write(self.style.SUCCESS('Successfully loaded initial data!'))
+
+    def generate(self, options):
+        try:
+            scale = parse_scale(options['scale'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(f'Generating synthetic data: {scale.schools} schools x {scale.classes} classes x '
+                          f'{scale.students} students x {scale.days} days...')
+        started = time.monotonic()
+        generator = Generator(
+            scale, seed=options['seed'], end_date=options['end_date'], batch_size=options['batch_size'],
+            prefix=options['prefix'], log=self.stdout.write
+        )
+        try:
+            counts = generator.generate()
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        summary = ', '.join(f'{count} {kind}' for kind, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Created {summary} in {time.monotonic() - started:.1f}s'))
     
     def create_users(self):
         # Create administrator
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from school_api.aggregates import rebuild_attendance_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Regenerates the daily class and monthly student attendance aggregates from attendance records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows inserted per batch')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding attendance aggregates...')
+
+        with transaction.atomic():
+            class_days, student_months = rebuild_attendance_aggregates(batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {class_days} class-day and {student_months} student-month aggregates'
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from school_api.search import get_search_backend, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index for students, classes and announcements'
+
+    def handle(self, *args, **kwargs):
+        if get_search_backend() is None:
+            self.stdout.write(self.style.WARNING('No search backend is available; ?search= uses icontains'))
+            return
+
+        self.stdout.write('Rebuilding search index...')
+
+        with transaction.atomic():
+            counts = rebuild_search_index()
+
+        for doc_type, count in counts.items():
+            self.stdout.write(f'Indexed {count} {doc_type} documents')
+        self.stdout.write(self.style.SUCCESS('Successfully rebuilt search index!'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from school_api.replicas import replica_aliases, replicate
+
+
+class Command(BaseCommand):
+    help = 'Copies the primary SQLite database into the read replicas; a local stand-in for replication'
+
+    def add_arguments(self, parser):
+        parser.add_argument('aliases', nargs='*', help='Replica aliases to refresh (default: all of DATABASE_REPLICAS)')
+
+    def handle(self, *args, **options):
+        if not replica_aliases():
+            raise CommandError('DATABASE_REPLICAS is empty; see the read replica notes in settings.py')
+        try:
+            copied = replicate(options['aliases'] or None)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        for alias in copied:
+            self.stdout.write(f'Copied default to {alias}')
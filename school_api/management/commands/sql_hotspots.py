@@ -0,0 +1,54 @@
+import json
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Summarizes the SQL profiler log: slow statements and N+1 candidates per viewset action'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', help='Log file to read (default SQL_PROFILER_LOG, rotated files included)')
+        parser.add_argument('--top', type=int, default=5, help='Statements shown per view')
+
+    def handle(self, *args, **options):
+        path = Path(options['log'] or settings.SQL_PROFILER_LOG)
+        files = sorted(path.parent.glob(f'{path.name}*')) if not options['log'] else [path]
+        if not files:
+            raise CommandError(f'No log at {path}')
+
+        views = defaultdict(lambda: {'slow': defaultdict(list), 'repeated': defaultdict(int), 'profiles': 0})
+        for file in files:
+            with open(file) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line[line.index('{'):])
+                    except ValueError:
+                        continue
+                    view = views[entry.get('view', 'unknown')]
+                    if entry.get('type') == 'slow':
+                        view['slow'][(entry['sql'], entry.get('call_site'))].append(entry['ms'])
+                    elif entry.get('type') == 'repeated':
+                        view['repeated'][(entry['sql'], entry.get('call_site'))] += 1
+                    elif entry.get('type') == 'profile':
+                        view['profiles'] += 1
+
+        # Views with the most slow time first
+        def slow_time(item):
+            return sum(sum(timings) for timings in item[1]['slow'].values())
+
+        for name, view in sorted(views.items(), key=slow_time, reverse=True):
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{name}: {view["profiles"]} profiled requests, '
+                f'{sum(len(t) for t in view["slow"].values())} slow statements ({slow_time((name, view)):.1f}ms)'
+            ))
+            slowest = sorted(view['slow'].items(), key=lambda item: sum(item[1]), reverse=True)
+            for (sql, site), timings in slowest[:options['top']]:
+                self.stdout.write(
+                    f'  slow x{len(timings)} max {max(timings):.1f}ms at {site}\n    {sql[:300]}'
+                )
+            repeated = sorted(view['repeated'].items(), key=lambda item: item[1], reverse=True)
+            for (sql, site), requests in repeated[:options['top']]:
+                self.stdout.write(f'  N+1 candidate in {requests} requests at {site}\n    {sql[:300]}')
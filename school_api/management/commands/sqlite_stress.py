@@ -0,0 +1,34 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from school_api.sqlite_stress import run_stress
+
+
+class Command(BaseCommand):
+    help = 'Runs a multi-threaded write/read workload on scratch SQLite files, stock vs configured connections, as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5.0, help='Duration of each profile run')
+        parser.add_argument('--writers', type=int, default=4, help='Writer threads')
+        parser.add_argument('--readers', type=int, default=4, help='Reader threads')
+        parser.add_argument('--only', help='Run one profile: "baseline" or "configured"')
+        parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+
+    def handle(self, *args, **options):
+        if options['seconds'] <= 0 or options['writers'] < 0 or options['readers'] < 0:
+            raise CommandError('--seconds must be positive, --writers and --readers not negative')
+        try:
+            report = run_stress(
+                seconds=options['seconds'], writers=options['writers'], readers=options['readers'],
+                only=options['only'], log=self.stderr.write
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
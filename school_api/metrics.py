@@ -0,0 +1,295 @@
+"""
+Per-request performance instrumentation.
+
+PerformanceMiddleware times every request, split into database time (via an execute wrapper
+on each connection), serialization time (serializer output and the lean list rows, timed by
+``serializing``), view time (everything else up to the response object) and render time
+(DRF content rendering). The split is sent back as a Server-Timing header and folded into
+per-route histograms, which ``metrics_view`` serves in the Prometheus text format to
+scrapers holding METRICS_TOKEN and to administrators. The histograms live in the process;
+with several workers each one exposes its own, which Prometheus aggregates when scraping
+every worker. Under ASGI the middleware runs async; the execute wrapper is then installed
+from the request's thread-sensitive worker thread, which is where Django runs its ORM
+calls.
+"""
+import bisect
+import contextlib
+import hmac
+import threading
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+# Upper bounds in seconds; the +Inf bucket is implicit
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class RouteStats:
+    __slots__ = ('buckets', 'count', 'duration', 'db', 'queries', 'serialize', 'view', 'render', 'statuses')
+
+    def __init__(self):
+        self.buckets = [0] * (len(DURATION_BUCKETS) + 1)
+        self.count = 0
+        self.duration = 0.0
+        self.db = 0.0
+        self.queries = 0
+        self.serialize = 0.0
+        self.view = 0.0
+        self.render = 0.0
+        self.statuses = {}
+
+
+class Registry:
+    """
+    Thread-safe per (route, method) request statistics
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+
+    def observe(self, route, method, status, timing):
+        index = bisect.bisect_left(DURATION_BUCKETS, timing.total)
+        with self.lock:
+            stats = self.routes.get((route, method))
+            if stats is None:
+                stats = self.routes[(route, method)] = RouteStats()
+            stats.buckets[index] += 1
+            stats.count += 1
+            stats.duration += timing.total
+            stats.db += timing.db
+            stats.queries += timing.queries
+            stats.serialize += timing.serialize
+            stats.view += timing.view
+            stats.render += timing.render
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+    def reset(self):
+        with self.lock:
+            self.routes = {}
+
+    def render(self):
+        with self.lock:
+            routes = sorted(self.routes.items())
+            lines = [
+                '# HELP school_api_request_duration_seconds Time to produce a response.',
+                '# TYPE school_api_request_duration_seconds histogram',
+            ]
+            for (route, method), stats in routes:
+                labels = f'route="{escape(route)}",method="{method}"'
+                cumulative = 0
+                for bound, count in zip(DURATION_BUCKETS + ('+Inf',), stats.buckets):
+                    cumulative += count
+                    lines.append(f'school_api_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'school_api_request_duration_seconds_sum{{{labels}}} {stats.duration:.6f}')
+                lines.append(f'school_api_request_duration_seconds_count{{{labels}}} {stats.count}')
+
+            for name, help_text, attribute in (
+                ('db_seconds', 'Time spent in database queries.', 'db'),
+                ('serialize_seconds', 'Time spent serializing response data outside the database.', 'serialize'),
+                ('view_seconds', 'Time spent in views outside the database and serializers.', 'view'),
+                ('render_seconds', 'Time spent rendering response content.', 'render'),
+                ('queries', 'Database queries executed.', 'queries'),
+            ):
+                lines.append(f'# HELP school_api_request_{name}_total {help_text}')
+                lines.append(f'# TYPE school_api_request_{name}_total counter')
+                for (route, method), stats in routes:
+                    value = getattr(stats, attribute)
+                    value = f'{value:.6f}' if isinstance(value, float) else value
+                    lines.append(f'school_api_request_{name}_total{{route="{escape(route)}",method="{method}"}} {value}')
+
+            lines.append('# HELP school_api_requests_total Responses by status code.')
+            lines.append('# TYPE school_api_requests_total counter')
+            for (route, method), stats in routes:
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append(
+                        f'school_api_requests_total{{route="{escape(route)}",method="{method}",status="{status}"}} {count}'
+                    )
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RequestTiming:
+    """
+    Timings of one request; also the database execute wrapper that collects them
+    """
+    __slots__ = ('started', 'view_done', 'total', 'db', 'queries', 'serialize', 'serialize_depth', 'view', 'render')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_done = None
+        self.db = 0.0
+        self.queries = 0
+        self.serialize = 0.0
+        self.serialize_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+
+    @contextlib.contextmanager
+    def serializing(self):
+        # Nested serializers are part of the outermost one's time; queries they run are db time
+        self.serialize_depth += 1
+        started, db = time.perf_counter(), self.db
+        try:
+            yield
+        finally:
+            self.serialize_depth -= 1
+            if not self.serialize_depth:
+                self.serialize += max(time.perf_counter() - started - (self.db - db), 0.0)
+
+    def finish(self):
+        finished = time.perf_counter()
+        self.total = finished - self.started
+        view_done = self.view_done or finished
+        self.render = finished - view_done
+        self.view = max(view_done - self.started - self.db - self.serialize, 0.0)
+
+    def header(self):
+        return (
+            f'db;dur={self.db * 1000:.2f};desc="{self.queries} queries", '
+            f'serialize;dur={self.serialize * 1000:.2f}, view;dur={self.view * 1000:.2f}, '
+            f'render;dur={self.render * 1000:.2f}, total;dur={self.total * 1000:.2f}'
+        )
+
+
+def serializing(request):
+    """
+    Context manager adding the time spent inside it to the request's serialize phase; a no-op
+    for requests PerformanceMiddleware does not time
+    """
+    timing = getattr(request, '_performance_timing', None)
+    return timing.serializing() if timing is not None else contextlib.nullcontext()
+
+
+class TimedData:
+    """
+    Serializer (or ListSerializer) whose ``data`` is timed as serialization
+    """
+    @property
+    def data(self):
+        with serializing(self.context.get('request')):
+            return super().data
+
+
+_timed_classes = {}
+
+
+def timed_serializer(serializer):
+    """
+    Switch ``serializer`` to a subclass of its class that times ``data``
+    """
+    cls = type(serializer)
+    if cls not in _timed_classes:
+        _timed_classes[cls] = type(cls.__name__, (TimedData, cls), {'__module__': cls.__module__})
+    serializer.__class__ = _timed_classes[cls]
+    return serializer
+
+
+class SerializationTimingMixin:
+    """
+    Times the viewset's serializer output as the request's serialize phase
+    """
+    def get_serializer(self, *args, **kwargs):
+        return timed_serializer(super().get_serializer(*args, **kwargs))
+
+
+def execute_wrappers(wrapper):
+    """
+    ExitStack holding ``wrapper`` on every database connection of the calling thread
+    """
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(wrapper))
+    return stack
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route
+
+
+class PerformanceMiddleware:
+    """
+    Adds a Server-Timing header to every response and records it in the metrics registry
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timing = RequestTiming()
+        request._performance_timing = timing
+        with execute_wrappers(timing):
+            response = self.get_response(request)
+        return self.finish(request, response, timing)
+
+    async def __acall__(self, request):
+        timing = RequestTiming()
+        request._performance_timing = timing
+        stack = await sync_to_async(execute_wrappers)(timing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.finish(request, response, timing)
+
+    def finish(self, request, response, timing):
+        timing.finish()
+        response['Server-Timing'] = timing.header()
+        route = route_name(request)
+        if route != 'metrics':
+            registry.observe(route, request.method, response.status_code, timing)
+        return response
+
+    def process_template_response(self, request, response):
+        # Called after the view returns and before the response (DRF's included) is rendered
+        request._performance_timing.view_done = time.perf_counter()
+        return response
+
+
+def metrics_allowed(request):
+    """
+    Whether the request sends "Authorization: Bearer <METRICS_TOKEN>" or an administrator's
+    access token
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    header = request.headers.get('Authorization', '')
+    if token and hmac.compare_digest(header.encode(), f'Bearer {token}'.encode()):
+        return True
+    # Imported here: settings.LOGGING loads this module (through profiling) before the apps
+    from .authentication import bearer_user
+    return getattr(bearer_user(request), 'role', None) == 'Administrator'
+
+
+def metrics_view(request):
+    """
+    Prometheus text exposition of the request histograms, for scrapers and administrators
+    """
+    if not metrics_allowed(request):
+        return HttpResponse(status=401)
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
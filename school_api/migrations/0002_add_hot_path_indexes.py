@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-17 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='announcement',
+            index=models.Index(fields=['audience', '-created_at'], name='announcement_audience_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='announcement',
+            index=models.Index(fields=['-created_at', '-id'], name='announcement_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['student', '-attendance_date'], name='attendance_student_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['class_obj', 'attendance_date'], name='attendance_class_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['-attendance_date', '-id'], name='attendance_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='class',
+            index=models.Index(fields=['academic_year', 'name'], name='class_year_name_idx'),
+        ),
+    ]
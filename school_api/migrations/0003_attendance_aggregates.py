@@ -0,0 +1,47 @@
+# Generated by Django 5.2.1 on 2026-10-17 17:42
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school_api', '0002_add_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassDailyAttendance',
+            fields=[
+                ('present_count', models.PositiveIntegerField(default=0)),
+                ('absent_count', models.PositiveIntegerField(default=0)),
+                ('late_count', models.PositiveIntegerField(default=0)),
+                ('excused_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('attendance_date', models.DateField()),
+                ('class_obj', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_attendance', to='school_api.class')),
+            ],
+            options={
+                'unique_together': {('class_obj', 'attendance_date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='StudentMonthlyAttendance',
+            fields=[
+                ('present_count', models.PositiveIntegerField(default=0)),
+                ('absent_count', models.PositiveIntegerField(default=0)),
+                ('late_count', models.PositiveIntegerField(default=0)),
+                ('excused_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('month', models.DateField()),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_attendance', to='school_api.student')),
+            ],
+            options={
+                'unique_together': {('student', 'month')},
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+from django.db import migrations
+
+# Frozen copies of school_api.search as of this migration, so later edits there cannot
+# change what it does
+TABLE = 'school_api_search'
+
+DOCUMENTS = {
+    'student': ('Student', ('roll_number', 'user__first_name', 'user__last_name', 'user__email')),
+    'class': ('Class', ('name', 'academic_year', 'location', 'teacher__first_name', 'teacher__last_name', 'subject__name')),
+    'announcement': ('Announcement', ('title', 'message', 'type', 'audience')),
+}
+
+
+def create_search_index(apps, schema_editor):
+    # The FTS5 index only exists on SQLite; other databases fall back to icontains search
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} "
+        f"USING fts5(doc_type UNINDEXED, object_id UNINDEXED, content, tokenize='unicode61 remove_diacritics 2')"
+    )
+    with schema_editor.connection.cursor() as cursor:
+        for doc_type, (model_name, fields) in DOCUMENTS.items():
+            queryset = apps.get_model('school_api', model_name)._default_manager.values_list('pk', *fields)
+            params = [
+                # rowid: 60 random bits of the UUID
+                (int(pk.hex[:15], 16), doc_type, pk.hex, ' '.join(str(value) for value in values if value))
+                for pk, *values in queryset.iterator(chunk_size=2000)
+            ]
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO {TABLE} (rowid, doc_type, object_id, content) VALUES (%s, %s, %s, %s)',
+                params
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school_api', '0003_attendance_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
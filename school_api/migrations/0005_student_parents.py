@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-17 17:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school_api', '0004_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='parents',
+            field=models.ManyToManyField(blank=True, limit_choices_to={'role': 'Parent'}, related_name='children', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,84 @@
+from django.db import migrations, models
+
+# Frozen copy of the weekday bits (Monday is bit 0) as of this migration; school_api.schedule
+# may change later
+DAY_BITS = {
+    'monday': 1 << 0,
+    'tuesday': 1 << 1,
+    'wednesday': 1 << 2,
+    'thursday': 1 << 3,
+    'friday': 1 << 4,
+    'saturday': 1 << 5,
+    'sunday': 1 << 6,
+}
+DAY_NAMES = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+
+def days_to_mask(apps, schema_editor):
+    Class = apps.get_model('school_api', 'Class')
+    classes = list(Class.objects.using(schema_editor.connection.alias).only('id', 'name', 'days_of_week'))
+    unparsable = []
+    for class_obj in classes:
+        names = [name.strip() for name in (class_obj.days_of_week or '').split(',') if name.strip()]
+        unknown = [name for name in names if name.lower() not in DAY_BITS]
+        if unknown:
+            unparsable.append(f'{class_obj.name} ({class_obj.id}): {", ".join(unknown)}')
+            continue
+        class_obj.meeting_days = 0
+        for name in names:
+            class_obj.meeting_days |= DAY_BITS[name.lower()]
+    # Dropping a misspelt day would silently change the schedule; fix the data and re-run
+    if unparsable:
+        raise ValueError(
+            'Unknown day names in Class.days_of_week; use full English day names:\n' + '\n'.join(unparsable)
+        )
+    Class.objects.using(schema_editor.connection.alias).bulk_update(classes, ['meeting_days'], batch_size=500)
+
+
+def mask_to_days(apps, schema_editor):
+    Class = apps.get_model('school_api', 'Class')
+    classes = list(Class.objects.using(schema_editor.connection.alias).only('id', 'meeting_days'))
+    for class_obj in classes:
+        class_obj.days_of_week = ','.join(
+            name for name in DAY_NAMES if class_obj.meeting_days & DAY_BITS[name.lower()]
+        )
+    Class.objects.using(schema_editor.connection.alias).bulk_update(classes, ['days_of_week'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school_api', '0005_student_parents'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='class',
+            name='meeting_days',
+            field=models.PositiveSmallIntegerField(default=0),
+            preserve_default=False,
+        ),
+        # A default lets the column be re-added over existing rows when migrating backwards
+        migrations.AlterField(
+            model_name='class',
+            name='days_of_week',
+            field=models.CharField(default='', max_length=100),
+        ),
+        migrations.RunPython(days_to_mask, mask_to_days),
+        migrations.RemoveField(
+            model_name='class',
+            name='days_of_week',
+        ),
+        migrations.AddIndex(
+            model_name='class',
+            index=models.Index(fields=['meeting_days', 'scheduled_start_time'], name='class_days_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='class',
+            index=models.Index(fields=['teacher', 'meeting_days'], name='class_teacher_days_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='class',
+            index=models.Index(fields=['location', 'meeting_days'], name='class_location_days_idx'),
+        ),
+    ]
@@ -3,6 +3,8 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 
+from .schedule import format_days, parse_days
+
 # User model extending Django's AbstractUser
 class User(AbstractUser):
     ROLE_CHOICES = (
@@ -45,28 +47,75 @@ class Class(models.Model):
     academic_year = models.CharField(max_length=20)
     scheduled_start_time = models.TimeField()
     scheduled_end_time = models.TimeField()
-    days_of_week = models.CharField(max_length=100)  # Stored as comma-separated values
+    meeting_days = models.PositiveSmallIntegerField()  # Weekday bitmask, Monday is bit 0; see schedule.py
     location = models.CharField(max_length=100)
     teacher = models.ForeignKey(User, on_delete=models.CASCADE, limit_choices_to={'role': 'Teacher'})
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['academic_year', 'name'], name='class_year_name_idx'),
+            # Day lookups are meeting_days IN (...); the second column serves time, teacher and room
+            models.Index(fields=['meeting_days', 'scheduled_start_time'], name='class_days_start_idx'),
+            models.Index(fields=['teacher', 'meeting_days'], name='class_teacher_days_idx'),
+            models.Index(fields=['location', 'meeting_days'], name='class_location_days_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} - {self.subject.name} ({self.academic_year})"
 
+    @property
+    def days_of_week(self):
+        """
+        The meeting days as comma-separated names, e.g. "Monday,Wednesday"
+        """
+        return format_days(self.meeting_days or 0)
+
+    @days_of_week.setter
+    def days_of_week(self, value):
+        self.meeting_days = parse_days(value)
+
 # Student model
 class Student(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     roll_number = models.CharField(max_length=20, unique=True)
     user = models.OneToOneField(User, on_delete=models.CASCADE, limit_choices_to={'role': 'Student'})
     classes = models.ManyToManyField(Class, related_name='enrolled_students')
+    parents = models.ManyToManyField(User, related_name='children', limit_choices_to={'role': 'Parent'}, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.user.first_name} {self.user.last_name} ({self.roll_number})"
 
+# AttendanceRecord queryset with upsert support on the (student, class_obj, attendance_date) key
+class AttendanceRecordQuerySet(models.QuerySet):
+    UPSERT_UNIQUE_FIELDS = ['student', 'class_obj', 'attendance_date']
+    UPSERT_UPDATE_FIELDS = ['attendance_time', 'status', 'notes', 'checkin_method', 'recorded_by', 'updated_at']
+
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create skips the model signals, so refresh the attendance aggregates here
+        from .aggregates import refresh_attendance_aggregates
+        objs = super().bulk_create(objs, *args, **kwargs)
+        refresh_attendance_aggregates(objs, using=self.db)
+        return objs
+
+    def upsert(self, records, batch_size=500):
+        """
+        Insert the records, updating status and time of any that already exist for the same
+        student, class and date. Each batch is a single INSERT ... ON CONFLICT DO UPDATE statement.
+        Primary keys of updated rows are not refreshed on the passed instances.
+        """
+        return self.bulk_create(
+            records,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=self.UPSERT_UNIQUE_FIELDS,
+            update_fields=self.UPSERT_UPDATE_FIELDS,
+        )
+
 # AttendanceRecord model
 class AttendanceRecord(models.Model):
     STATUS_CHOICES = (
@@ -93,12 +142,61 @@ class AttendanceRecord(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = AttendanceRecordQuerySet.as_manager()
+
     class Meta:
         unique_together = ('student', 'class_obj', 'attendance_date')
+        indexes = [
+            # student_history: one student's records, newest first
+            models.Index(fields=['student', '-attendance_date'], name='attendance_student_date_idx'),
+            # Per-class-per-day rosters
+            models.Index(fields=['class_obj', 'attendance_date'], name='attendance_class_date_idx'),
+            # Keyset pagination order
+            models.Index(fields=['-attendance_date', '-id'], name='attendance_date_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student} - {self.class_obj.name} - {self.attendance_date} - {self.status}"
 
+# Attendance counts per status, shared by the aggregate tables
+class AttendanceCounts(models.Model):
+    present_count = models.PositiveIntegerField(default=0)
+    absent_count = models.PositiveIntegerField(default=0)
+    late_count = models.PositiveIntegerField(default=0)
+    excused_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def total_count(self):
+        return self.present_count + self.absent_count + self.late_count + self.excused_count
+
+# Attendance totals for one class on one day, kept in sync with AttendanceRecord
+class ClassDailyAttendance(AttendanceCounts):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    class_obj = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='daily_attendance')
+    attendance_date = models.DateField()
+
+    class Meta:
+        unique_together = ('class_obj', 'attendance_date')
+
+    def __str__(self):
+        return f"{self.class_obj_id} - {self.attendance_date}"
+
+# Attendance totals for one student in one month, kept in sync with AttendanceRecord
+class StudentMonthlyAttendance(AttendanceCounts):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='monthly_attendance')
+    month = models.DateField()  # First day of the month
+
+    class Meta:
+        unique_together = ('student', 'month')
+
+    def __str__(self):
+        return f"{self.student_id} - {self.month:%Y-%m}"
+
 # Announcement model
 class Announcement(models.Model):
     TYPE_CHOICES = (
@@ -124,5 +222,13 @@ class Announcement(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Role-filtered feeds: audience__in + newest first
+            models.Index(fields=['audience', '-created_at'], name='announcement_audience_idx'),
+            # Unfiltered feed and keyset pagination order
+            models.Index(fields=['-created_at', '-id'], name='announcement_created_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.title} ({self.get_type_display()} - {self.get_audience_display()})"
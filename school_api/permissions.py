@@ -1,5 +1,7 @@
 from rest_framework import permissions
 
+from .models import Class, Student
+
 class IsAdministrator(permissions.BasePermission):
     """
     Custom permission to only allow administrators to access the view.
@@ -64,4 +66,46 @@ class IsStudentOrTeacherOrAdministrator(permissions.BasePermission):
             request.user.role == 'Student' or 
             request.user.role == 'Teacher' or 
             request.user.role == 'Administrator'
-        )
\ No newline at end of file
+        )
+
+def scope_students(queryset, user):
+    """
+    Restrict a Student queryset in SQL to the students the user may see: administrators see
+    everyone, teachers the students enrolled in their classes, students themselves and parents
+    their linked children
+    """
+    if user.role == 'Administrator':
+        return queryset
+    if user.role == 'Teacher':
+        # The enrollment table's column to Class is named "class", hence the dict
+        enrolled = Class.enrolled_students.through.objects.filter(**{'class__teacher_id': user.id}).values('student_id')
+        return queryset.filter(id__in=enrolled)
+    if user.role == 'Student':
+        return queryset.filter(user_id=user.id)
+    if user.role == 'Parent':
+        linked = Student.parents.through.objects.filter(user_id=user.id).values('student_id')
+        return queryset.filter(id__in=linked)
+    return queryset.none()
+
+def scope_attendance(queryset, user):
+    """
+    Restrict an AttendanceRecord queryset in SQL: teachers see their classes' records,
+    students their own and parents their linked children's
+    """
+    if user.role == 'Administrator':
+        return queryset
+    if user.role == 'Teacher':
+        return queryset.filter(class_obj__teacher_id=user.id)
+    if user.role == 'Student':
+        return queryset.filter(student__user_id=user.id)
+    if user.role == 'Parent':
+        linked = Student.parents.through.objects.filter(user_id=user.id).values('student_id')
+        return queryset.filter(student_id__in=linked)
+    return queryset.none()
+
+def can_record_attendance(user, class_obj):
+    """
+    Whether the user may write attendance for the class: administrators for any class,
+    teachers for the classes they teach
+    """
+    return user.role == 'Administrator' or user.id == class_obj.teacher_id
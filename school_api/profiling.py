@@ -0,0 +1,223 @@
+"""
+Sampling SQL profiler and slow-query log.
+
+SQLProfilingMiddleware watches the SQL of every request through a database execute
+wrapper. Statements slower than SQL_PROFILER_SLOW_MS are always logged. A sampled
+fraction of requests (SQL_PROFILER_SAMPLE_RATE), and requests from administrators sending
+the SQL_PROFILER_HEADER header, are profiled in full: every statement is recorded
+normalized, with its time and the project call site that issued it, and statements
+repeated SQL_PROFILER_REPEAT_THRESHOLD or more times from one call site are reported as
+N+1 candidates. Entries go to the "school_api.sql" logger as JSON lines tagged with the
+viewset and action, which settings.LOGGING writes to a rotating file; ``sql_hotspots``
+summarizes that file.
+"""
+import json
+import logging
+import logging.handlers
+import random
+import re
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+from .metrics import execute_wrappers
+
+logger = logging.getLogger('school_api.sql')
+
+PROFILE_HEADER = 'X-SQL-Profile'
+
+_IN_LIST_RE = re.compile(r'\bIN\s*\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)', re.IGNORECASE)
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACE_RE = re.compile(r'\s+')
+
+# Execute wrappers in these modules sit between the ORM and the database; they are never the call site
+_WRAPPER_FILES = {str(Path(__file__).resolve()), str(Path(__file__).resolve().with_name('metrics.py'))}
+
+
+def normalize_sql(sql):
+    """
+    Statement shape without values: literals and placeholders become ?, IN lists collapse to IN (...)
+    """
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    sql = _LITERAL_RE.sub('?', sql).replace('%s', '?')
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+def call_site():
+    """
+    "path:line in function" of the innermost project frame outside Django and the execute wrappers
+    """
+    base = str(settings.BASE_DIR)
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(base) and filename not in _WRAPPER_FILES and 'site-packages' not in filename:
+            return f'{Path(filename).relative_to(base)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+def view_label(request):
+    """
+    "ViewSet.action" for DRF viewsets, the view's name otherwise
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None:
+        return match.view_name or match.route
+    actions = getattr(match.func, 'actions', None) or {}
+    return f'{view_class.__name__}.{actions.get(request.method.lower(), request.method.lower())}'
+
+
+class QueryProfile:
+    """
+    Execute wrapper recording one request's statements: all of them when ``full``, otherwise only slow ones
+    """
+    def __init__(self, full, slow_ms, requested=False, sampled=False):
+        self.full = full
+        self.slow_ms = slow_ms
+        self.requested = requested
+        self.sampled = sampled
+        self.statements = []
+        self.count = 0
+        self.total_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            ms = (time.perf_counter() - started) * 1000
+            self.count += 1
+            self.total_ms += ms
+            if self.full or (self.slow_ms is not None and ms >= self.slow_ms):
+                self.statements.append((normalize_sql(sql), ms, call_site()))
+
+    def slow(self):
+        if self.slow_ms is None:
+            return []
+        return [statement for statement in self.statements if statement[1] >= self.slow_ms]
+
+    def repeated(self, threshold):
+        """
+        (sql, call_site, count) for statements issued ``threshold`` or more times from one place
+        """
+        counts = Counter((sql, site) for sql, _, site in self.statements)
+        return [(sql, site, count) for (sql, site), count in counts.most_common() if count >= threshold]
+
+
+class SQLProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile = self.start(request)
+        if profile is None:
+            return self.get_response(request)
+        with execute_wrappers(profile):
+            response = self.get_response(request)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        # Checking who asked for a profile may need a user lookup
+        if self.header_sent(request):
+            profile = await sync_to_async(self.start)(request)
+        else:
+            profile = self.start(request)
+        if profile is None:
+            return await self.get_response(request)
+        # ORM calls of async requests run in the request's thread-sensitive worker thread
+        stack = await sync_to_async(execute_wrappers)(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.finish(request, response, profile)
+
+    def start(self, request):
+        """
+        The QueryProfile for this request, or None when it needs no profiling at all
+        """
+        sample_rate = getattr(settings, 'SQL_PROFILER_SAMPLE_RATE', 0.0)
+        slow_ms = getattr(settings, 'SQL_PROFILER_SLOW_MS', None)
+        requested = self.header_sent(request) and self.from_administrator(request)
+        sampled = sample_rate > 0 and random.random() < sample_rate
+        if not (sampled or requested or slow_ms is not None):
+            return None
+        return QueryProfile(full=sampled or requested, slow_ms=slow_ms, requested=requested, sampled=sampled)
+
+    def header(self):
+        return getattr(settings, 'SQL_PROFILER_HEADER', PROFILE_HEADER)
+
+    def header_sent(self, request):
+        return bool(self.header() and request.headers.get(self.header()))
+
+    def from_administrator(self, request):
+        # Checked before the view runs, so other clients never switch on full profiling;
+        # imported here: settings.LOGGING loads this module before the apps
+        from .authentication import bearer_user
+        return getattr(bearer_user(request), 'role', None) == 'Administrator'
+
+    def finish(self, request, response, profile):
+        self.record(request, response, profile)
+        if profile.requested:
+            response[self.header()] = (
+                f'queries={profile.count}; time={profile.total_ms:.2f}ms; slow={len(profile.slow())}; '
+                f'repeated={len(profile.repeated(self.repeat_threshold()))}'
+            )
+        return response
+
+    def repeat_threshold(self):
+        return getattr(settings, 'SQL_PROFILER_REPEAT_THRESHOLD', 5)
+
+    def record(self, request, response, profile):
+        if not profile.statements:
+            return
+        base = {
+            'view': view_label(request),
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+        }
+        for sql, ms, site in profile.slow():
+            log(dict(base, type='slow', sql=sql, ms=round(ms, 3), call_site=site))
+        if not profile.full:
+            return
+        for sql, site, count in profile.repeated(self.repeat_threshold()):
+            log(dict(base, type='repeated', sql=sql, count=count, call_site=site))
+        log(dict(
+            base, type='profile', queries=profile.count, ms=round(profile.total_ms, 3),
+            statements=[
+                {'sql': sql, 'ms': round(ms, 3), 'call_site': site} for sql, ms, site in profile.statements
+            ],
+        ))
+
+
+class RotatingLogHandler(logging.handlers.RotatingFileHandler):
+    """
+    RotatingFileHandler that creates the log directory and the file on first write
+    """
+    def __init__(self, filename, **kwargs):
+        kwargs['delay'] = True
+        super().__init__(filename, **kwargs)
+
+    def _open(self):
+        Path(self.baseFilename).parent.mkdir(parents=True, exist_ok=True)
+        return super()._open()
+
+
+def log(entry):
+    logger.info(json.dumps(entry, separators=(',', ':')))
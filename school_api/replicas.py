@@ -0,0 +1,163 @@
+"""
+Read replicas with read-your-writes stickiness.
+
+Aliases listed in settings.DATABASE_REPLICAS hold copies of the primary ("default")
+database. ReplicaPinningMiddleware picks one of them for each GET/HEAD/OPTIONS request, and
+school_api.db_routers sends that request's reads there. Requests that change data always
+use the primary. After a client's successful write, the client is pinned to the primary for
+REPLICA_PIN_SECONDS, so a teacher who marks attendance sees the mark on the next read even
+while the replicas lag. Clients are identified by the user id of their access token, and
+pins live in the cache, which has to be shared between workers for pins to follow a client
+across them.
+
+Caches filled from a lagging replica would keep the stale data until their next
+invalidation, so such fills (the feed pages, authenticated users) wrap their reads in
+``primary_reads()``. ``replicate`` copies the primary into SQLite replicas with SQLite's
+online backup. It stands in for real replication when trying the setup locally
+(``python manage.py replicate``).
+"""
+import contextlib
+import contextvars
+import random
+import sqlite3
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+KEY_PREFIX = 'school_api:replica_pin'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# The replica alias the current request reads from, None for the primary
+current_replica = contextvars.ContextVar('school_api_current_replica', default=None)
+
+
+def replica_aliases():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+def pin_key(user_id):
+    return f'{KEY_PREFIX}:{user_id}'
+
+
+def pin_seconds():
+    return getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+
+
+@contextlib.contextmanager
+def primary_reads():
+    """
+    Read from the primary inside the block, whatever the request's replica
+    """
+    token = current_replica.set(None)
+    try:
+        yield
+    finally:
+        current_replica.reset(token)
+
+
+def token_user(request):
+    """
+    The user id of a valid bearer token on the request, None without one
+    """
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else None
+    if raw_token is None:
+        return None
+    try:
+        return authentication.get_validated_token(raw_token).get(api_settings.USER_ID_CLAIM)
+    except InvalidToken:
+        # Left for DRF to reject; the request reads nothing before that
+        return None
+
+
+class ReplicaPinningMiddleware:
+    """
+    Chooses the request's replica, or the primary for writes and pinned clients, and pins writers
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        replicas = replica_aliases()
+        if not replicas:
+            return self.get_response(request)
+
+        alias = None
+        if request.method in SAFE_METHODS:
+            user_id = token_user(request)
+            if user_id is None or cache.get(pin_key(user_id)) is None:
+                alias = random.choice(replicas)
+        token = current_replica.set(alias)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_replica.reset(token)
+        if self.wrote(request, response):
+            cache.set(pin_key(request.user.pk), True, timeout=pin_seconds())
+        return response
+
+    async def __acall__(self, request):
+        replicas = replica_aliases()
+        if not replicas:
+            return await self.get_response(request)
+
+        alias = None
+        if request.method in SAFE_METHODS:
+            user_id = token_user(request)
+            if user_id is None or await cache.aget(pin_key(user_id)) is None:
+                alias = random.choice(replicas)
+        token = current_replica.set(alias)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_replica.reset(token)
+        if self.wrote(request, response):
+            await cache.aset(pin_key(request.user.pk), True, timeout=pin_seconds())
+        return response
+
+    def wrote(self, request, response):
+        # DRF authenticates inside the view and copies the user back onto the request
+        user = getattr(request, 'user', None)
+        return (
+            request.method not in SAFE_METHODS and response.status_code < 400
+            and getattr(user, 'is_authenticated', False)
+        )
+
+
+def replicate(aliases=None):
+    """
+    Copy the primary into each SQLite replica alias (all of DATABASE_REPLICAS by default);
+    returns the aliases copied
+    """
+    aliases = replica_aliases() if aliases is None else list(aliases)
+    unknown = set(aliases) - set(replica_aliases())
+    if unknown:
+        raise ValueError(f'Not in DATABASE_REPLICAS: {", ".join(sorted(unknown))}')
+    primary = connections[DEFAULT_DB_ALIAS]
+    for alias in [DEFAULT_DB_ALIAS, *aliases]:
+        if connections[alias].vendor != 'sqlite':
+            raise ValueError(f'{alias} is not a SQLite database')
+
+    primary.ensure_connection()
+    for alias in aliases:
+        # A plain connection: the alias's own one may be query-only
+        target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+        try:
+            primary.connection.backup(target)
+        finally:
+            target.close()
+    return aliases
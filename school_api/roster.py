@@ -0,0 +1,102 @@
+"""
+Cached roster and schedule index used by the QR check-in path.
+
+The index maps students to the classes they are enrolled in together with each class's
+weekly schedule, so resolving "which class is this student in right now" needs no ORM
+queries. It is rebuilt lazily in each process whenever the shared version counter in the
+cache changes; the signal handlers in signals.py bump that counter whenever classes,
+students or enrollments change.
+"""
+import datetime
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Class, Student
+from .schedule import day_bit
+
+VERSION_KEY = 'school_api:roster-index:version'
+
+# (version, index) built by this process
+_local_index = (None, None)
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so an evicted counter never comes back at a value a process
+        # already built its index for; add() keeps whichever process got there first
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate_roster_index():
+    """
+    Mark every process's roster index as stale
+    """
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def build_roster_index():
+    classes = {
+        class_id: (days, start, end, name)
+        for class_id, days, start, end, name in Class.objects.values_list(
+            'id', 'meeting_days', 'scheduled_start_time', 'scheduled_end_time', 'name'
+        )
+    }
+    students = {}
+    users = {}
+    roll_numbers = {}
+    for student_id, user_id, roll_number in Student.objects.values_list('id', 'user_id', 'roll_number'):
+        students[student_id] = []
+        users[user_id] = student_id
+        roll_numbers[roll_number] = student_id
+    for student_id, class_id in Student.classes.through.objects.values_list('student_id', 'class_id'):
+        students[student_id].append(class_id)
+
+    return {
+        'classes': classes,
+        'students': students,
+        'users': users,
+        'roll_numbers': roll_numbers,
+    }
+
+
+def get_roster_index():
+    """
+    Return this process's roster index, rebuilding it if another process invalidated it
+    """
+    global _local_index
+    version = get_version()
+    local_version, index = _local_index
+    if index is None or local_version != version:
+        index = build_roster_index()
+        _local_index = (version, index)
+    return index
+
+
+def find_class_in_session(index, student_id, now):
+    """
+    Return (class_id, status) for the class the student should be in at ``now``, or None.
+    Check-in opens ATTENDANCE_EARLY_CHECKIN_MINUTES before the scheduled start and the
+    student is Late once ATTENDANCE_LATE_AFTER_MINUTES have passed.
+    """
+    early = datetime.timedelta(minutes=getattr(settings, 'ATTENDANCE_EARLY_CHECKIN_MINUTES', 15))
+    late_after = datetime.timedelta(minutes=getattr(settings, 'ATTENDANCE_LATE_AFTER_MINUTES', 10))
+    weekday = day_bit(now.weekday())
+    today = now.date()
+
+    for class_id in index['students'].get(student_id, ()):
+        days, start, end, _ = index['classes'][class_id]
+        if not days & weekday:
+            continue
+        start_at = datetime.datetime.combine(today, start, tzinfo=now.tzinfo)
+        end_at = datetime.datetime.combine(today, end, tzinfo=now.tzinfo)
+        if start_at - early <= now <= end_at:
+            return class_id, 'Late' if now > start_at + late_after else 'Present'
+    return None
@@ -0,0 +1,175 @@
+"""
+Weekly class schedules as weekday bitmasks, and the schedule filters of the class list.
+
+``Class.meeting_days`` stores the days a class meets as bits (Monday is bit 0), replacing
+the old comma-separated ``days_of_week`` string, which is still what the API reads and
+writes. SQLite cannot index a bitwise test, so "meets on day D" is asked as ``meeting_days
+IN (every mask with bit D set)``: 64 point lookups on an index led by ``meeting_days``.
+Within each lookup, the index's next column narrows the rows to a start time, teacher or
+location. ScheduleFilter exposes these as ?day=, ?time=, ?at=, ?teacher=, ?student= and
+?location= on the class list; ?student= only matches students the user may see.
+"""
+import uuid
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime, parse_time
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend
+
+WEEKDAY_NAMES = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+WEEKDAYS = {name.lower(): index for index, name in enumerate(WEEKDAY_NAMES)}
+ALL_DAYS = (1 << len(WEEKDAY_NAMES)) - 1
+
+
+def day_bit(weekday):
+    return 1 << weekday
+
+
+def parse_days(value):
+    """
+    Bitmask of a comma-separated list of day names (case-insensitive); unknown names raise
+    ValueError
+    """
+    mask = 0
+    for name in (value or '').split(','):
+        name = name.strip()
+        if not name:
+            continue
+        weekday = WEEKDAYS.get(name.lower())
+        if weekday is None:
+            raise ValueError(name)
+        mask |= day_bit(weekday)
+    return mask
+
+
+def format_days(mask):
+    """
+    Day names of a bitmask, comma-separated in week order
+    """
+    return ','.join(name for weekday, name in enumerate(WEEKDAY_NAMES) if mask & day_bit(weekday))
+
+
+def weekdays(mask):
+    return {weekday for weekday in range(len(WEEKDAY_NAMES)) if mask & day_bit(weekday)}
+
+
+# Every non-empty schedule containing each weekday, for index-friendly "meets on day D" lookups
+_MASKS_WITH = [
+    tuple(mask for mask in range(1, ALL_DAYS + 1) if mask & day_bit(weekday))
+    for weekday in range(len(WEEKDAY_NAMES))
+]
+
+
+def masks_with(weekday):
+    return _MASKS_WITH[weekday]
+
+
+class DaysOfWeekField(serializers.Field):
+    """
+    A meeting_days bitmask as "Monday,Wednesday"
+    """
+    default_error_messages = {
+        'invalid': 'Unknown day(s): {names}. Use full day names, e.g. "Monday,Wednesday".',
+        'empty': 'At least one day is required.',
+    }
+
+    def to_representation(self, value):
+        return format_days(value)
+
+    def to_internal_value(self, data):
+        if isinstance(data, (list, tuple)):
+            data = ','.join(str(name) for name in data)
+        elif not isinstance(data, str):
+            self.fail('invalid', names=data)
+        unknown = [name.strip() for name in data.split(',') if name.strip() and name.strip().lower() not in WEEKDAYS]
+        if unknown:
+            self.fail('invalid', names=', '.join(unknown))
+        mask = parse_days(data)
+        if not mask:
+            self.fail('empty')
+        return mask
+
+
+def parse_weekday(value):
+    weekday = WEEKDAYS.get(value.strip().lower())
+    if weekday is None and value.strip().isdigit() and int(value) < len(WEEKDAY_NAMES):
+        weekday = int(value)
+    if weekday is None:
+        raise serializers.ValidationError({"day": "Use a day name (e.g. Tuesday) or 0-6 with Monday as 0."})
+    return weekday
+
+
+def parse_clock(value):
+    try:
+        parsed = parse_time(value.strip())
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise serializers.ValidationError({"time": "Use HH:MM or HH:MM:SS."})
+    return parsed
+
+
+def parse_moment(value):
+    """
+    (weekday, time) of an ISO datetime, in the project time zone when it carries an offset
+    """
+    try:
+        moment = parse_datetime(value.strip())
+    except ValueError:
+        moment = None
+    if moment is None:
+        raise serializers.ValidationError({"at": "Use an ISO 8601 date and time, e.g. 2024-03-05T09:30."})
+    if timezone.is_aware(moment):
+        moment = timezone.localtime(moment)
+    return moment.weekday(), moment.time()
+
+
+def parse_uuid(value, param):
+    try:
+        return uuid.UUID(value.strip())
+    except ValueError:
+        raise serializers.ValidationError({param: "Not a valid UUID."})
+
+
+def in_session(queryset, weekday=None, time=None):
+    """
+    Classes meeting on ``weekday`` and/or running at ``time`` (start <= time < end)
+    """
+    if weekday is not None:
+        queryset = queryset.filter(meeting_days__in=masks_with(weekday))
+    if time is not None:
+        queryset = queryset.filter(scheduled_start_time__lte=time, scheduled_end_time__gt=time)
+    return queryset
+
+
+class ScheduleFilter(BaseFilterBackend):
+    """
+    ?day=Tuesday, ?time=09:30 and ?at=2024-03-05T09:30 (that day and time) select classes by
+    schedule; ?teacher=, ?student= and ?location= narrow them to one teacher, enrolled student
+    (one visible to the user) or room
+    """
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        weekday = time = None
+        if params.get('at'):
+            if params.get('day') or params.get('time'):
+                raise serializers.ValidationError({"at": "Combine ?at= with neither ?day= nor ?time=."})
+            weekday, time = parse_moment(params['at'])
+        if params.get('day'):
+            weekday = parse_weekday(params['day'])
+        if params.get('time'):
+            time = parse_clock(params['time'])
+        queryset = in_session(queryset, weekday, time)
+
+        if params.get('teacher'):
+            queryset = queryset.filter(teacher_id=parse_uuid(params['teacher'], 'teacher'))
+        if params.get('student'):
+            # Imported here: models.py imports this module. Students the user may not see match
+            # nothing, so their enrollments stay private
+            from .models import Student
+            from .permissions import scope_students
+            visible = scope_students(Student.objects.filter(id=parse_uuid(params['student'], 'student')), request.user)
+            queryset = queryset.filter(enrolled_students__in=visible)
+        if params.get('location'):
+            queryset = queryset.filter(location=params['location'].strip())
+        return queryset
@@ -0,0 +1,269 @@
+"""
+Pluggable full-text search for the ?search= parameter.
+
+Each searchable model has a SearchDocument describing the text it is found by. The configured
+backend (settings.SEARCH_BACKEND) keeps one entry per object, is updated from signals.py on
+save and delete, and answers prefix queries with a subquery of every matching id, or by
+joining a queryset to its index so the rows can be ordered by rank. FullTextSearchFilter
+narrows viewset querysets this way, so broad queries are neither truncated nor miscounted.
+Every word has to match, as with DRF's SearchFilter, but views searching several documents
+(attendance: its student and its class) let each word match any of them. It falls back to
+DRF's icontains SearchFilter when no backend is configured or the database does not support
+it.
+"""
+import re
+import uuid
+
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from rest_framework import filters
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class SearchDocument:
+    """
+    The text an object of ``model_name`` is found by: its ``fields`` joined with spaces
+    """
+    doc_type = None
+    model_name = None
+    fields = ()
+
+    def get_model(self, apps=None):
+        if apps is None:
+            from django.apps import apps
+        return apps.get_model('school_api', self.model_name)
+
+    def rows(self, queryset):
+        """
+        (pk, text) pairs for the objects in ``queryset``
+        """
+        for pk, *values in queryset.values_list('pk', *self.fields).iterator(chunk_size=2000):
+            yield pk, ' '.join(str(value) for value in values if value)
+
+
+class StudentDocument(SearchDocument):
+    doc_type = 'student'
+    model_name = 'Student'
+    fields = ('roll_number', 'user__first_name', 'user__last_name', 'user__email')
+
+
+class ClassDocument(SearchDocument):
+    doc_type = 'class'
+    model_name = 'Class'
+    fields = ('name', 'academic_year', 'location', 'teacher__first_name', 'teacher__last_name', 'subject__name')
+
+
+class AnnouncementDocument(SearchDocument):
+    doc_type = 'announcement'
+    model_name = 'Announcement'
+    fields = ('title', 'message', 'type', 'audience')
+
+
+DOCUMENTS = {document.doc_type: document for document in (StudentDocument(), ClassDocument(), AnnouncementDocument())}
+
+
+class SearchBackend:
+    """
+    Interface for search backends; ``matching`` selects every matching id in SQL and
+    ``ranked`` narrows a queryset to the matches, ordered best first
+    """
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+
+    def is_available(self):
+        return False
+
+    def index(self, doc_type, rows):
+        raise NotImplementedError
+
+    def remove(self, doc_type, pks):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def matching(self, doc_type, text):
+        raise NotImplementedError
+
+    def ranked(self, queryset, doc_type, text):
+        raise NotImplementedError
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """
+    FTS5 virtual table created by migration 0004 on SQLite databases.
+    Rows are addressed by a rowid derived from the object's UUID so updates and deletes
+    are primary-key lookups rather than scans of the index.
+    """
+    table = 'school_api_search'
+
+    # alias -> whether the FTS5 table exists there, checked once per process
+    _available = {}
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+    def is_available(self):
+        if self.using not in self._available:
+            self._available[self.using] = (
+                self.connection.vendor == 'sqlite'
+                and self.table in self.connection.introspection.table_names()
+            )
+        return self._available[self.using]
+
+    @staticmethod
+    def rowid(pk):
+        # 60 random bits of the UUID; collisions are negligible at school scale
+        return int(uuid.UUID(str(pk)).hex[:15], 16)
+
+    @staticmethod
+    def match_expression(text):
+        """
+        Every token must match as a prefix: 'jo smi' -> "jo"* "smi"*
+        """
+        return ' '.join(f'"{token}"*' for token in TOKEN_RE.findall(text))
+
+    def index(self, doc_type, rows):
+        params = [(self.rowid(pk), doc_type, uuid.UUID(str(pk)).hex, text) for pk, text in rows]
+        if params:
+            with self.connection.cursor() as cursor:
+                cursor.executemany(
+                    f'INSERT OR REPLACE INTO {self.table} (rowid, doc_type, object_id, content) VALUES (%s, %s, %s, %s)',
+                    params
+                )
+
+    def remove(self, doc_type, pks):
+        params = [(self.rowid(pk),) for pk in pks]
+        if params:
+            with self.connection.cursor() as cursor:
+                cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', params)
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+
+    def matching(self, doc_type, text):
+        """
+        Subquery of the ids of every match, for ``field__in``; object_id holds the UUID's hex,
+        which is how SQLite stores UUIDField
+        """
+        expression = self.match_expression(text)
+        if not expression:
+            return None
+        return RawSQL(
+            f'SELECT object_id FROM {self.table} WHERE {self.table} MATCH %s AND doc_type = %s',
+            [f'content: ({expression})', doc_type]
+        )
+
+    def ranked(self, queryset, doc_type, text):
+        """
+        ``queryset`` joined to its index entries, so it only holds matches, ordered by the
+        index's rank and then pk. SQLite reads the matches off the index and looks each row up
+        by primary key.
+        """
+        expression = self.match_expression(text)
+        if not expression:
+            return None
+        qn = self.connection.ops.quote_name
+        meta = queryset.model._meta
+        table = qn(self.table)
+        return queryset.extra(
+            tables=[self.table],
+            where=[
+                f'{table} MATCH %s', f'{table}.doc_type = %s',
+                f'{table}.object_id = {qn(meta.db_table)}.{qn(meta.pk.column)}',
+            ],
+            params=[f'content: ({expression})', doc_type],
+        ).order_by(RawSQL(f'{table}.rank', ()), 'pk')
+
+
+def get_search_backend():
+    """
+    The configured backend if it can serve this database, otherwise None
+    """
+    path = getattr(settings, 'SEARCH_BACKEND', None)
+    if not path:
+        return None
+    backend = import_string(path)()
+    return backend if backend.is_available() else None
+
+
+def index_objects(doc_type, backend=None, **lookup):
+    """
+    (Re-)index the objects of ``doc_type`` matching ``lookup``, e.g. index_objects('class', teacher_id=...)
+    """
+    backend = backend or get_search_backend()
+    if backend is None:
+        return
+    document = DOCUMENTS[doc_type]
+    queryset = document.get_model()._default_manager.filter(**lookup)
+    backend.index(doc_type, document.rows(queryset))
+
+
+def remove_objects(doc_type, pks, backend=None):
+    backend = backend or get_search_backend()
+    if backend is not None:
+        backend.remove(doc_type, pks)
+
+
+def rebuild_search_index(backend=None, apps=None):
+    """
+    Re-index every searchable object. Returns the number of entries written per doc_type.
+    """
+    backend = backend or get_search_backend()
+    if backend is None:
+        return {}
+    backend.clear()
+    counts = {}
+    for doc_type, document in DOCUMENTS.items():
+        counts[doc_type] = 0
+        batch = []
+        for row in document.rows(document.get_model(apps)._default_manager.all()):
+            batch.append(row)
+            if len(batch) >= 2000:
+                backend.index(doc_type, batch)
+                counts[doc_type] += len(batch)
+                batch = []
+        backend.index(doc_type, batch)
+        counts[doc_type] += len(batch)
+    return counts
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    ?search= backed by the search index.
+
+    Views declare ``search_documents``, mapping doc_type to the queryset field holding that
+    document's id. A view of a single document mapped to its own pk is joined to the index and,
+    without ?ordering=, ordered best first. Otherwise each word has to match one of the
+    documents, so "student1 math" finds the Math records of Student1. Without a usable
+    backend the view's ``search_fields`` are searched with icontains as before.
+    """
+    def filter_queryset(self, request, queryset, view):
+        search_documents = getattr(view, 'search_documents', None)
+        text = request.query_params.get(self.search_param, '')
+        backend = get_search_backend() if search_documents and text.strip() else None
+        if backend is None:
+            return super().filter_queryset(request, queryset, view)
+
+        if list(search_documents.values()) == ['pk']:
+            doc_type, = search_documents
+            ranked = backend.ranked(queryset, doc_type, text)
+            if ranked is None:
+                return super().filter_queryset(request, queryset, view)
+            return ranked
+
+        condition = Q()
+        for token in TOKEN_RE.findall(text):
+            any_document = Q()
+            for doc_type, field in search_documents.items():
+                any_document |= Q(**{f'{field}__in': backend.matching(doc_type, token)})
+            condition &= any_document
+        if not condition:
+            return super().filter_queryset(request, queryset, view)
+        return queryset.filter(condition)
@@ -1,10 +1,38 @@
 from rest_framework import serializers
+from rest_framework.validators import UniqueTogetherValidator
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth import get_user_model
+from django.db.models import F, Value, CharField
+from django.db.models.functions import Concat
 from .models import Subject, Class, Student, AttendanceRecord, Announcement
+from .schedule import DaysOfWeekField
 
 User = get_user_model()
 
-class UserSerializer(serializers.ModelSerializer):
+def full_name(prefix):
+    """
+    SQL for the "first last" names the get_*_name methods build, for the lean list path
+    """
+    return Concat(f'{prefix}__first_name', Value(' '), f'{prefix}__last_name', output_field=CharField())
+
+class SparseFieldsMixin:
+    """
+    Keeps only the fields named in context['fields'] and drops those in context['omit'].
+    The view passes the parsed ?fields= / ?omit= names (None when not given) on reads only.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        only, omit = self.context.get('fields'), self.context.get('omit')
+        if only is None and omit is None:
+            return
+        unknown = sorted(((only or set()) | (omit or set())) - set(self.fields))
+        if unknown:
+            raise serializers.ValidationError({"fields": f"Unknown field(s): {', '.join(unknown)}"})
+        for field_name in list(self.fields):
+            if (only is not None and field_name not in only) or (omit and field_name in omit):
+                self.fields.pop(field_name)
+
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
     
     class Meta:
@@ -19,6 +47,17 @@ class UserSerializer(serializers.ModelSerializer):
         user.save()
         return user
 
+class SchoolTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        # Identity claims let CachedJWTAuthentication skip the user lookup (AUTH_TRUST_TOKEN_CLAIMS)
+        token = super().get_token(user)
+        token['username'] = user.username
+        token['first_name'] = user.first_name
+        token['last_name'] = user.last_name
+        token['role'] = user.role
+        return token
+
 class UserUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -29,12 +68,30 @@ class ChangePasswordSerializer(serializers.Serializer):
     old_password = serializers.CharField(required=True)
     new_password = serializers.CharField(required=True)
 
-class SubjectSerializer(serializers.ModelSerializer):
+class UserImportRowSerializer(serializers.Serializer):
+    """
+    One row of a bulk user import; uniqueness is checked per chunk by the importer
+    """
+    username = serializers.CharField(max_length=150, validators=[User.username_validator])
+    email = serializers.EmailField(required=False, allow_blank=True)
+    first_name = serializers.CharField(max_length=150, required=False, allow_blank=True)
+    last_name = serializers.CharField(max_length=150, required=False, allow_blank=True)
+    role = serializers.ChoiceField(choices=User.ROLE_CHOICES, default='Student')
+    password = serializers.CharField()
+    roll_number = serializers.CharField(max_length=20, required=False, allow_blank=True)
+
+    def validate(self, data):
+        if data['role'] == 'Student' and not data.get('roll_number'):
+            raise serializers.ValidationError({"roll_number": "Students need a roll number."})
+        return data
+
+class SubjectSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Subject
         fields = ['id', 'name']
 
-class ClassSerializer(serializers.ModelSerializer):
+class ClassSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    days_of_week = DaysOfWeekField(source='meeting_days')
     teacher_name = serializers.SerializerMethodField()
     subject_name = serializers.SerializerMethodField()
     
@@ -44,6 +101,7 @@ class ClassSerializer(serializers.ModelSerializer):
                  'days_of_week', 'location', 'teacher', 'teacher_name', 'subject', 'subject_name', 
                  'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at', 'teacher_name', 'subject_name']
+        lean_annotations = {'teacher_name': full_name('teacher'), 'subject_name': F('subject__name')}
     
     def get_teacher_name(self, obj):
         return f"{obj.teacher.first_name} {obj.teacher.last_name}"
@@ -51,14 +109,30 @@ class ClassSerializer(serializers.ModelSerializer):
     def get_subject_name(self, obj):
         return obj.subject.name
 
-class StudentSerializer(serializers.ModelSerializer):
+class ExpandableFieldsMixin:
+    """
+    Drops the nested fields listed in Meta.expandable_fields unless the request asked for them.
+    The view passes the requested names as context['expand']; None keeps every field.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        expand = self.context.get('expand')
+        if expand is None:
+            return
+        for field_name in self.Meta.expandable_fields:
+            if field_name not in expand:
+                self.fields.pop(field_name, None)
+
+class StudentSerializer(SparseFieldsMixin, ExpandableFieldsMixin, serializers.ModelSerializer):
     user_details = UserSerializer(source='user', read_only=True)
     classes_details = ClassSerializer(source='classes', many=True, read_only=True)
     
     class Meta:
         model = Student
-        fields = ['id', 'roll_number', 'user', 'user_details', 'classes', 'classes_details', 'created_at', 'updated_at']
+        fields = ['id', 'roll_number', 'user', 'user_details', 'classes', 'classes_details', 'parents',
+                  'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at', 'user_details', 'classes_details']
+        expandable_fields = ['user_details', 'classes_details']
 
 class EnrollStudentsSerializer(serializers.Serializer):
     student_ids = serializers.ListField(
@@ -66,7 +140,14 @@ class EnrollStudentsSerializer(serializers.Serializer):
         required=True
     )
 
-class AttendanceRecordSerializer(serializers.ModelSerializer):
+class BulkEnrollmentItemSerializer(serializers.Serializer):
+    class_obj = serializers.UUIDField()
+    student_ids = serializers.ListField(child=serializers.UUIDField())
+
+class BulkEnrollmentSerializer(serializers.Serializer):
+    enrollments = BulkEnrollmentItemSerializer(many=True, allow_empty=False)
+
+class AttendanceRecordSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     student_name = serializers.SerializerMethodField()
     class_name = serializers.SerializerMethodField()
     recorded_by_name = serializers.SerializerMethodField()
@@ -76,7 +157,19 @@ class AttendanceRecordSerializer(serializers.ModelSerializer):
         fields = ['id', 'attendance_date', 'attendance_time', 'status', 'notes', 'checkin_method',
                  'student', 'student_name', 'class_obj', 'class_name', 'recorded_by', 'recorded_by_name',
                  'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at', 'student_name', 'class_name', 'recorded_by_name']
+        read_only_fields = ['id', 'recorded_by', 'created_at', 'updated_at', 'student_name', 'class_name', 'recorded_by_name']
+        lean_annotations = {
+            'student_name': full_name('student__user'),
+            'class_name': F('class_obj__name'),
+            'recorded_by_name': full_name('recorded_by'),
+        }
+    
+    def get_validators(self):
+        # In upsert mode a duplicate (student, class_obj, attendance_date) updates the existing row
+        validators = super().get_validators()
+        if self.context.get('upsert'):
+            validators = [v for v in validators if not isinstance(v, UniqueTogetherValidator)]
+        return validators
     
     def get_student_name(self, obj):
         return f"{obj.student.user.first_name} {obj.student.user.last_name}"
@@ -87,13 +180,40 @@ class AttendanceRecordSerializer(serializers.ModelSerializer):
     def get_recorded_by_name(self, obj):
         return f"{obj.recorded_by.first_name} {obj.recorded_by.last_name}"
 
-class AnnouncementSerializer(serializers.ModelSerializer):
+class BulkAttendanceItemSerializer(serializers.Serializer):
+    student = serializers.UUIDField()
+    status = serializers.ChoiceField(choices=AttendanceRecord.STATUS_CHOICES)
+    notes = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+class BulkAttendanceSerializer(serializers.Serializer):
+    class_obj = serializers.UUIDField()
+    attendance_date = serializers.DateField()
+    attendance_time = serializers.TimeField(required=False)
+    checkin_method = serializers.ChoiceField(choices=AttendanceRecord.CHECKIN_METHOD_CHOICES, default='MANUAL')
+    # Items are validated one by one in the view so a bad row doesn't reject the whole roster
+    records = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+
+class QRCheckinSerializer(serializers.Serializer):
+    # Students check themselves in; teachers and administrators identify the student
+    student = serializers.UUIDField(required=False)
+    roll_number = serializers.CharField(required=False)
+
+class AttendanceExportSerializer(serializers.Serializer):
+    # "format" is reserved by DRF's content negotiation, hence "output"
+    output = serializers.ChoiceField(choices=['csv', 'ndjson'], default='csv')
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    class_id = serializers.UUIDField(required=False)
+    student_id = serializers.UUIDField(required=False)
+
+class AnnouncementSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     created_by_name = serializers.SerializerMethodField()
     
     class Meta:
         model = Announcement
         fields = ['id', 'title', 'message', 'type', 'audience', 'created_by', 'created_by_name', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at', 'created_by_name']
+        lean_annotations = {'created_by_name': full_name('created_by')}
     
     def get_created_by_name(self, obj):
         return f"{obj.created_by.first_name} {obj.created_by.last_name}"
\ No newline at end of file
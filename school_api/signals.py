@@ -0,0 +1,134 @@
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from . import feed_cache
+from .aggregates import record_key, refresh_attendance_aggregates
+from .authentication import invalidate_user
+from .conditional import bump_versions
+from .models import User, Subject, Class, Student, AttendanceRecord, Announcement
+from .roster import invalidate_roster_index
+from .search import index_objects, remove_objects
+
+SEARCH_DOC_TYPES = {Student: 'student', Class: 'class', Announcement: 'announcement'}
+
+
+@receiver([post_save, post_delete], sender=Class)
+@receiver([post_save, post_delete], sender=Student)
+def invalidate_roster_on_change(sender, **kwargs):
+    invalidate_roster_index()
+
+
+@receiver(m2m_changed, sender=Student.classes.through)
+def invalidate_roster_on_enrollment(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_roster_index()
+        bump_versions('enrollments')
+
+
+@receiver(m2m_changed, sender=Student.parents.through)
+def bump_parents_version(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_versions('parents')
+
+
+@receiver([post_save, post_delete], sender=Subject)
+def bump_subjects_version(sender, **kwargs):
+    # Subjects have no updated_at; their counter is their only validator
+    bump_versions('subjects')
+
+
+@receiver([post_save, post_delete], sender=Class)
+def bump_classes_version(sender, **kwargs):
+    bump_versions('classes')
+
+
+@receiver([post_save, post_delete], sender=User)
+def bump_users_version(sender, instance, created=False, update_fields=None, **kwargs):
+    # Names rendered next to other rows only change on edits; logins only touch last_login
+    if not created and set(update_fields or ()) != {'last_login'}:
+        bump_versions('users')
+
+
+@receiver(pre_save, sender=AttendanceRecord)
+def remember_previous_attendance_key(sender, instance, using, **kwargs):
+    # An edit may move the record to another student, class or date; both aggregates need recounting
+    if not instance._state.adding:
+        instance._previous_key = (
+            sender.objects.db_manager(using)
+            .filter(pk=instance.pk)
+            .values_list('student_id', 'class_obj_id', 'attendance_date')
+            .first()
+        )
+
+
+@receiver(post_save, sender=AttendanceRecord)
+def refresh_aggregates_on_save(sender, instance, using, **kwargs):
+    previous = getattr(instance, '_previous_key', None)
+    # Only a key the record left can be left without records
+    moved = previous is not None and previous != record_key(instance)
+    refresh_attendance_aggregates([instance], keys=[previous] if moved else (), using=using)
+
+
+@receiver(post_delete, sender=AttendanceRecord)
+def refresh_aggregates_on_delete(sender, instance, using, **kwargs):
+    refresh_attendance_aggregates(keys=[record_key(instance)], using=using)
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=Class)
+@receiver(post_save, sender=Announcement)
+def index_on_save(sender, instance, **kwargs):
+    index_objects(SEARCH_DOC_TYPES[sender], pk=instance.pk)
+
+
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=Class)
+@receiver(post_delete, sender=Announcement)
+def remove_from_index_on_delete(sender, instance, **kwargs):
+    remove_objects(SEARCH_DOC_TYPES[sender], [instance.pk])
+
+
+@receiver(post_save, sender=User)
+def reindex_user_documents(sender, instance, created, **kwargs):
+    # Student and class documents include user names
+    if not created:
+        index_objects('student', user_id=instance.pk)
+        index_objects('class', teacher_id=instance.pk)
+
+
+@receiver(post_save, sender=Subject)
+def reindex_subject_classes(sender, instance, created, **kwargs):
+    if not created:
+        index_objects('class', subject_id=instance.pk)
+
+
+@receiver(pre_save, sender=Announcement)
+def remember_previous_audience(sender, instance, using, **kwargs):
+    # An edit can move an announcement between audiences; both feeds need invalidating
+    if not instance._state.adding:
+        instance._previous_audience = (
+            sender.objects.db_manager(using).filter(pk=instance.pk).values_list('audience', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Announcement)
+def invalidate_feed_on_save(sender, instance, **kwargs):
+    feed_cache.invalidate_audiences(instance.audience, getattr(instance, '_previous_audience', None) or instance.audience)
+
+
+@receiver(post_delete, sender=Announcement)
+def invalidate_feed_on_delete(sender, instance, **kwargs):
+    feed_cache.invalidate_audiences(instance.audience)
+
+
+@receiver(post_save, sender=User)
+def invalidate_feed_on_author_change(sender, instance, created, **kwargs):
+    # Cached feeds include created_by_name; only administrators and teachers post announcements
+    if not created and instance.role in ('Administrator', 'Teacher'):
+        feed_cache.invalidate()
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, created=False, **kwargs):
+    if not created:
+        invalidate_user(instance.pk)
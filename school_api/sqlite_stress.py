@@ -0,0 +1,230 @@
+"""
+Multi-threaded write/read stress test for the SQLite connection settings.
+
+``run_stress`` runs the same workload once per connection profile, each time on a fresh
+scratch database holding an attendance-like table. Writer threads loop over a
+read-then-upsert transaction, shaped like the attendance upsert. Reader threads loop over
+an aggregate query over the table. The profiles are:
+
+* ``baseline``: Django's stock SQLite connection, with a rollback journal, a 5 s timeout and
+  deferred BEGIN.
+* ``configured``: the options of settings.DATABASES. With SQLITE_CONCURRENCY_MODE these are
+  WAL, the busy timeout, synchronous=NORMAL, the mmap/cache pragmas and BEGIN IMMEDIATE,
+  with readers on the query-only "read" alias.
+
+The connections are plain sqlite3 ones, set up the way Django's backend sets them up, so the
+numbers measure the database settings rather than the ORM. The report gives, per profile,
+committed writes, "database is locked" failures, throughput and reader latency percentiles.
+"""
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+from .benchmark import PERCENTILES, percentile
+
+# Django's sqlite3 backend defaults
+BASELINE = {'timeout': 5, 'transaction_mode': None, 'init_command': ''}
+
+SCHEMA = """
+CREATE TABLE stress_attendance (
+    id INTEGER PRIMARY KEY,
+    student INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    UNIQUE (student, day)
+)
+"""
+
+UPSERT = (
+    'INSERT INTO stress_attendance (student, day, status) VALUES (?, ?, ?) '
+    'ON CONFLICT (student, day) DO UPDATE SET status = excluded.status'
+)
+
+AGGREGATE = 'SELECT status, COUNT(*), COUNT(DISTINCT student) FROM stress_attendance GROUP BY status'
+
+STATUSES = ('Present', 'Absent', 'Late')
+
+
+def init_statements(options):
+    return [statement for statement in options.get('init_command', '').split(';') if statement.strip()]
+
+
+def profiles():
+    """
+    {name: (writer options, reader options)} for the baseline and the configured connections
+    """
+    default = settings.DATABASES['default'].get('OPTIONS', {})
+    read = settings.DATABASES.get('read', settings.DATABASES['default']).get('OPTIONS', default)
+    return {'baseline': (BASELINE, BASELINE), 'configured': (default, read)}
+
+
+def connect(path, options):
+    """
+    A sqlite3 connection configured as Django's backend configures one with these OPTIONS
+    """
+    db = sqlite3.connect(path, timeout=options.get('timeout', 5), isolation_level=None, check_same_thread=False)
+    for statement in init_statements(options):
+        db.execute(statement)
+    return db
+
+
+def begin_statement(options):
+    mode = options.get('transaction_mode')
+    return f'BEGIN {mode}' if mode else 'BEGIN'
+
+
+def is_lock_error(exc):
+    return 'locked' in str(exc) or 'busy' in str(exc)
+
+
+def create_database(path, students, days):
+    db = sqlite3.connect(path, isolation_level=None)
+    try:
+        db.execute(SCHEMA)
+        db.execute('BEGIN')
+        db.executemany(
+            'INSERT INTO stress_attendance (student, day, status) VALUES (?, ?, ?)',
+            [(student, day, STATUSES[(student + day) % len(STATUSES)])
+             for student in range(students) for day in range(days // 2)]
+        )
+        db.execute('COMMIT')
+    finally:
+        db.close()
+
+
+class Counters:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.write_errors = 0
+        self.reads = 0
+        self.read_errors = 0
+        self.read_timings = []
+        self.write_timings = []
+
+
+def writer(path, options, deadline, counters, seed, students, days):
+    rng = random.Random(seed)
+    begin = begin_statement(options)
+    db = connect(path, options)
+    writes, errors, timings = 0, 0, []
+    try:
+        while time.perf_counter() < deadline:
+            student, day = rng.randrange(students), rng.randrange(days)
+            started = time.perf_counter()
+            try:
+                db.execute(begin)
+                db.execute('SELECT COUNT(*) FROM stress_attendance WHERE student = ?', (student,)).fetchone()
+                db.execute(UPSERT, (student, day, rng.choice(STATUSES)))
+                db.execute('COMMIT')
+            except sqlite3.OperationalError as exc:
+                if db.in_transaction:
+                    db.execute('ROLLBACK')
+                if not is_lock_error(exc):
+                    raise
+                errors += 1
+            else:
+                writes += 1
+                timings.append(time.perf_counter() - started)
+    finally:
+        db.close()
+    with counters.lock:
+        counters.writes += writes
+        counters.write_errors += errors
+        counters.write_timings.extend(timings)
+
+
+def reader(path, options, deadline, counters):
+    db = connect(path, options)
+    reads, errors, timings = 0, 0, []
+    try:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                db.execute(AGGREGATE).fetchall()
+            except sqlite3.OperationalError as exc:
+                if not is_lock_error(exc):
+                    raise
+                errors += 1
+            else:
+                reads += 1
+                timings.append(time.perf_counter() - started)
+    finally:
+        db.close()
+    with counters.lock:
+        counters.reads += reads
+        counters.read_errors += errors
+        counters.read_timings.extend(timings)
+
+
+def run_profile(directory, name, write_options, read_options, seconds, writers, readers, students, days):
+    path = str(Path(directory) / f'{name}.sqlite3')
+    create_database(path, students, days)
+    counters = Counters()
+    deadline = time.perf_counter() + seconds
+    threads = [
+        threading.Thread(target=writer, args=(path, write_options, deadline, counters, seed, students, days))
+        for seed in range(writers)
+    ] + [
+        threading.Thread(target=reader, args=(path, read_options, deadline, counters))
+        for _ in range(readers)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    read_timings, write_timings = sorted(counters.read_timings), sorted(counters.write_timings)
+    return {
+        'writes': counters.writes,
+        'write_errors': counters.write_errors,
+        'writes_per_s': round(counters.writes / wall, 1),
+        'reads': counters.reads,
+        'read_errors': counters.read_errors,
+        'reads_per_s': round(counters.reads / wall, 1),
+        **{f'read_p{p}_ms': round(percentile(read_timings, p) * 1000, 3) if read_timings else None
+           for p in PERCENTILES},
+        **{f'write_p{p}_ms': round(percentile(write_timings, p) * 1000, 3) if write_timings else None
+           for p in PERCENTILES},
+        'wall_s': round(wall, 3),
+    }
+
+
+def run_stress(seconds=5.0, writers=4, readers=4, students=200, days=60, only=None, log=None):
+    """
+    Run the workload under each profile (or just ``only``) and return the report as a dict
+    """
+    log = log or (lambda message: None)
+    available = profiles()
+    if only is not None and only not in available:
+        raise ValueError(f'Unknown profile {only!r}; choose from {", ".join(available)}')
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, (write_options, read_options) in available.items():
+            if only is not None and name != only:
+                continue
+            log(f'{name}...')
+            results[name] = {
+                'begin': begin_statement(write_options),
+                'pragmas': init_statements(write_options),
+                **run_profile(directory, name, write_options, read_options, seconds, writers, readers, students, days),
+            }
+    return {
+        'meta': {
+            'seconds': seconds,
+            'writers': writers,
+            'readers': readers,
+            'students': students,
+            'days': days,
+            'sqlite': sqlite3.sqlite_version,
+        },
+        'profiles': results,
+    }
@@ -0,0 +1,284 @@
+"""
+Deterministic synthetic school data for load and performance testing.
+
+``generate`` builds ``schools`` schools, each with ``classes`` classes of about ``students``
+students, and records attendance for every scheduled meeting over the ``days`` calendar
+days ending at ``end_date``. All randomness (ids included) comes from one seeded
+random.Random, so the same arguments always produce the same data. Rows are written in
+batches (attendance through AttendanceWriter's executemany) and the aggregate tables,
+search index and caches are rebuilt once at the end.
+"""
+import datetime
+import uuid
+from collections import namedtuple
+from random import Random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connections, transaction, DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+from . import feed_cache
+from .aggregates import rebuild_attendance_aggregates
+from .models import Subject, Class, Student, AttendanceRecord, Announcement
+from .roster import invalidate_roster_index
+from .schedule import weekdays
+from .search import rebuild_search_index
+
+User = get_user_model()
+
+Scale = namedtuple('Scale', ['schools', 'classes', 'students', 'days'])
+
+# Classes each student takes; the student pool of a school is sized so classes hold ~``students``
+CLASSES_PER_STUDENT = 5
+CLASSES_PER_TEACHER = 4
+CLASS_LENGTH = datetime.timedelta(minutes=90)
+
+SUBJECTS = ['Mathematics', 'Science', 'English', 'History', 'Computer Science', 'Geography', 'Art', 'Music']
+SCHEDULES = [
+    'Monday,Wednesday,Friday', 'Tuesday,Thursday', 'Monday,Wednesday', 'Tuesday,Thursday,Friday',
+    'Monday,Tuesday,Wednesday,Thursday,Friday',
+]
+START_TIMES = [datetime.time(hour, minute) for hour, minute in [(8, 0), (9, 30), (11, 0), (13, 0), (14, 30)]]
+FIRST_NAMES = [
+    'Alice', 'Bob', 'Charlie', 'Diana', 'Ethan', 'Fatima', 'George', 'Hana', 'Ivan', 'Julia', 'Kofi', 'Lena',
+    'Mateo', 'Nora', 'Omar', 'Priya', 'Quinn', 'Rosa', 'Sami', 'Tara', 'Umar', 'Vera', 'Wei', 'Yara', 'Zane',
+]
+LAST_NAMES = [
+    'Johnson', 'Brown', 'Davis', 'Smith', 'Garcia', 'Okafor', 'Nguyen', 'Kim', 'Patel', 'Rossi', 'Muller',
+    'Silva', 'Haddad', 'Novak', 'Tanaka', 'Mensah', 'Costa', 'Ivanova', 'Lopez', 'Banda',
+]
+ABSENCE_NOTES = [None, None, 'No notification received', 'Sick', 'Family emergency']
+EXCUSED_NOTES = ['Medical appointment', 'School trip', 'Religious holiday', 'Sports competition']
+
+
+def parse_scale(value):
+    """
+    'SCHOOLSxCLASSESxSTUDENTSxDAYS', e.g. '2x20x30x180'
+    """
+    try:
+        scale = Scale(*(int(part) for part in value.lower().split('x')))
+    except (TypeError, ValueError):
+        raise ValueError('Expected SCHOOLSxCLASSESxSTUDENTSxDAYS, e.g. 2x20x30x180')
+    if min(scale) < 1:
+        raise ValueError('Every part of the scale must be at least 1')
+    return scale
+
+
+class Generator:
+    """
+    Writes one synthetic data set; see the module docstring
+    """
+    def __init__(self, scale, seed=0, end_date=None, batch_size=5000, prefix='syn', log=None):
+        self.scale = scale
+        self.random = Random(seed)
+        self.end_date = end_date or datetime.date.today()
+        self.batch_size = batch_size
+        self.prefix = prefix
+        self.log = log or (lambda message: None)
+        self.counts = dict.fromkeys(['users', 'classes', 'students', 'enrollments', 'attendance', 'announcements'], 0)
+        # Hashing is deliberately slow; every synthetic account of a role shares one hash
+        self.passwords = {role: make_password(f'{role.lower()}123') for role, _ in User.ROLE_CHOICES}
+
+    def uuid(self):
+        return uuid.UUID(int=self.random.getrandbits(128), version=4)
+
+    def name(self):
+        return self.random.choice(FIRST_NAMES), self.random.choice(LAST_NAMES)
+
+    def user(self, username, role):
+        first_name, last_name = self.name()
+        return User(
+            id=self.uuid(), username=username, email=f'{username}@{self.prefix}.school.test',
+            first_name=first_name, last_name=last_name, role=role, password=self.passwords[role]
+        )
+
+    def generate(self):
+        """
+        Write everything and return the number of rows created per kind
+        """
+        if User.objects.filter(username__startswith=f'{self.prefix}01_').exists():
+            raise ValueError(f'Synthetic data with prefix "{self.prefix}" already exists')
+
+        subjects = self.subjects()
+        for school in range(1, self.scale.schools + 1):
+            self.log(f'School {school}/{self.scale.schools}...')
+            with transaction.atomic():
+                classes, rosters = self.school(school, subjects)
+            self.attendance(classes, rosters)
+
+        self.log('Rebuilding aggregates and search index...')
+        with transaction.atomic():
+            rebuild_attendance_aggregates()
+            rebuild_search_index()
+        invalidate_roster_index()
+        feed_cache.invalidate()
+        return self.counts
+
+    def subjects(self):
+        existing = {subject.name: subject for subject in Subject.objects.filter(name__in=SUBJECTS)}
+        missing = [Subject(id=self.uuid(), name=name) for name in SUBJECTS if name not in existing]
+        Subject.objects.bulk_create(missing)
+        return list(existing.values()) + missing
+
+    def school(self, school, subjects):
+        """
+        Staff, classes, students, parents, enrollments and announcements of one school
+        """
+        tag = f'{self.prefix}{school:02d}'
+        admin = self.user(f'{tag}_admin', 'Administrator')
+        teachers = [
+            self.user(f'{tag}_teacher{n}', 'Teacher')
+            for n in range(1, -(-self.scale.classes // CLASSES_PER_TEACHER) + 1)
+        ]
+
+        classes = []
+        for n in range(self.scale.classes):
+            start = self.random.choice(START_TIMES)
+            subject = subjects[n % len(subjects)]
+            classes.append(Class(
+                id=self.uuid(), name=f'{subject.name} {100 + n} ({tag})', academic_year='2023-2024',
+                scheduled_start_time=start,
+                scheduled_end_time=(datetime.datetime.combine(self.end_date, start) + CLASS_LENGTH).time(),
+                days_of_week=self.random.choice(SCHEDULES), location=f'Room {school}{n:02d}',
+                teacher=teachers[n // CLASSES_PER_TEACHER], subject=subject,
+            ))
+
+        taken = min(CLASSES_PER_STUDENT, self.scale.classes)
+        pool = -(-self.scale.students * self.scale.classes // taken)
+        student_users = [self.user(f'{tag}_student{n}', 'Student') for n in range(1, pool + 1)]
+        parent_users = [self.user(f'{tag}_parent{n}', 'Parent') for n in range(1, -(-pool // 2) + 1)]
+        students = [
+            Student(id=self.uuid(), user=user, roll_number=f'{tag}-{n:06d}')
+            for n, user in enumerate(student_users, start=1)
+        ]
+
+        # Round-robin over the classes keeps every roster the same size
+        rosters = {class_obj.id: [] for class_obj in classes}
+        enrollments = []
+        for n, student in enumerate(students):
+            for k in range(taken):
+                class_obj = classes[(n * taken + k) % len(classes)]
+                rosters[class_obj.id].append(student.id)
+                enrollments.append(Student.classes.through(student_id=student.id, class_id=class_obj.id))
+        parent_links = [
+            Student.parents.through(student_id=student.id, user_id=parent_users[n // 2].id)
+            for n, student in enumerate(students)
+        ]
+
+        users = [admin] + teachers + student_users + parent_users
+        User.objects.bulk_create(users, batch_size=self.batch_size)
+        Class.objects.bulk_create(classes, batch_size=self.batch_size)
+        Student.objects.bulk_create(students, batch_size=self.batch_size)
+        Student.classes.through.objects.bulk_create(enrollments, batch_size=self.batch_size)
+        Student.parents.through.objects.bulk_create(parent_links, batch_size=self.batch_size)
+        Announcement.objects.bulk_create([
+            Announcement(
+                id=self.uuid(), title=f'{title} ({tag})', message=message, type=type, audience=audience,
+                created_by=admin,
+            )
+            for title, message, type, audience in [
+                ('Welcome back', 'Welcome to the new academic year!', 'General', 'All'),
+                ('Exam timetable', 'The exam timetable has been published.', 'Event', 'Students'),
+                ('Staff meeting', 'Staff meeting on Friday at 3 PM.', 'General', 'Teachers'),
+                ('Parent evening', 'Parent-teacher meetings are next Thursday.', 'Event', 'Parents'),
+            ]
+        ])
+
+        self.counts['users'] += len(users)
+        self.counts['classes'] += len(classes)
+        self.counts['students'] += len(students)
+        self.counts['enrollments'] += len(enrollments)
+        self.counts['announcements'] += 4
+        return classes, rosters
+
+    def attendance(self, classes, rosters):
+        """
+        One record per enrolled student per scheduled meeting, written in batches
+        """
+        # Each student has a steady attendance habit so aggregates vary realistically
+        reliability = {
+            student_id: self.random.betavariate(18, 1.5)
+            for roster in rosters.values() for student_id in roster
+        }
+        dates = [self.end_date - datetime.timedelta(days=n) for n in range(self.scale.days - 1, -1, -1)]
+        writer = AttendanceWriter()
+        batch = []
+        for class_obj in classes:
+            meets = weekdays(class_obj.meeting_days)
+            start = datetime.datetime.combine(self.end_date, class_obj.scheduled_start_time)
+            for date in dates:
+                if date.weekday() not in meets:
+                    continue
+                for student_id in rosters[class_obj.id]:
+                    batch.append(writer.row(self.record(class_obj, student_id, date, start, reliability[student_id])))
+                if len(batch) >= self.batch_size:
+                    self.counts['attendance'] += writer.write(batch)
+                    batch = []
+        self.counts['attendance'] += writer.write(batch)
+
+    def record(self, class_obj, student_id, date, start, reliability):
+        roll = self.random.random()
+        notes = None
+        minutes = self.random.randint(-10, 5)
+        method = 'QR_STATIC' if self.random.random() < 0.8 else 'MANUAL'
+        if roll < reliability:
+            status = 'Present'
+        elif roll < reliability + (1 - reliability) * 0.4:
+            status = 'Late'
+            minutes = self.random.randint(11, 40)
+        elif roll < reliability + (1 - reliability) * 0.8:
+            status, method = 'Absent', 'MANUAL'
+            notes = self.random.choice(ABSENCE_NOTES)
+        else:
+            status, method = 'Excused', 'MANUAL'
+            notes = self.random.choice(EXCUSED_NOTES)
+        return {
+            'id': self.uuid(), 'student_id': student_id, 'class_obj_id': class_obj.id, 'attendance_date': date,
+            'attendance_time': (start + datetime.timedelta(minutes=minutes)).time(), 'status': status,
+            'notes': notes, 'checkin_method': method, 'recorded_by_id': class_obj.teacher_id,
+        }
+
+
+class AttendanceWriter:
+    """
+    Multi-million row inserts of AttendanceRecord through executemany.
+
+    bulk_create spends most of its time building model instances and compiling one INSERT
+    per few dozen rows; here values are converted for the database once per distinct value
+    (ids, dates and times repeat constantly) and every batch is a single executemany. It also
+    skips the aggregate refresh of AttendanceRecordQuerySet.bulk_create, so callers must
+    rebuild the aggregates afterwards.
+    """
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.connection = connections[using]
+        self.fields = AttendanceRecord._meta.concrete_fields
+        now = timezone.now()
+        self.defaults = {'created_at': now, 'updated_at': now}
+        self.prepared = {}
+        quote = self.connection.ops.quote_name
+        self.sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(AttendanceRecord._meta.db_table),
+            ', '.join(quote(field.column) for field in self.fields),
+            ', '.join(['%s'] * len(self.fields)),
+        )
+
+    def prepare(self, field, value):
+        key = (field.attname, value)
+        if key not in self.prepared:
+            self.prepared[key] = field.get_db_prep_save(value, self.connection)
+        return self.prepared[key]
+
+    def row(self, values):
+        values = {**self.defaults, **values}
+        return tuple(
+            field.get_db_prep_save(values['id'], self.connection) if field.primary_key
+            else self.prepare(field, values[field.attname])
+            for field in self.fields
+        )
+
+    def write(self, rows):
+        if rows:
+            with transaction.atomic(using=self.connection.alias), self.connection.cursor() as cursor:
+                cursor.executemany(self.sql, rows)
+        return len(rows)
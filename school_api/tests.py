@@ -1,3 +1,2087 @@
-from django.test import TestCase
+import base64
+import csv
+import datetime
+import io
+import json
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.contrib.auth.hashers import check_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command, CommandError
+from django.db import connection, connections, transaction, OperationalError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import feed_cache, metrics
+from .authentication import user_cache_key
+from .db_routers import ReadWriteRouter
+from .replicas import current_replica, pin_key, primary_reads, replicate
+from .checks import check_shared_cache
+from .benchmark import run_benchmark, run_concurrency, compare, percentile
+from .imports import hash_passwords, import_users
+from .profiling import QueryProfile, normalize_sql
+from .sqlite_stress import run_stress
+from .synthetic import Generator, Scale, parse_scale
+from .models import (
+    Subject, Class, Student, AttendanceRecord, Announcement, ClassDailyAttendance, StudentMonthlyAttendance
+)
+from .roster import get_roster_index, find_class_in_session
+from .schedule import format_days, parse_days
+from .serializers import AttendanceRecordSerializer
+from .views import AttendanceRecordViewSet, AnnouncementViewSet, ClassViewSet
+
+User = get_user_model()
+
+
+# Tests that read the SQL profiler's log capture it; nothing is written to SQL_PROFILER_LOG
+# even where local settings turn the profiler on
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    SQL_PROFILER_SAMPLE_RATE=0.0, SQL_PROFILER_SLOW_MS=None,
+)
+class SchoolApiTestCase(TestCase):
+    """
+    Shared fixtures: an administrator, a teacher with one class and a few enrolled students
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            username='admin', password='admin123', role='Administrator',
+            first_name='Admin', last_name='User'
+        )
+        cls.teacher = User.objects.create_user(
+            username='teacher1', password='teacher123', role='Teacher',
+            first_name='John', last_name='Smith'
+        )
+        cls.subject = Subject.objects.create(name='Mathematics')
+        cls.class_obj = cls.make_class('Math 101')
+        cls.students = [cls.make_student(f'student{i}', f'S{i:03d}') for i in range(1, 4)]
+        cls.class_obj.enrolled_students.add(*cls.students)
+
+    @classmethod
+    def make_class(cls, name, **kwargs):
+        data = {
+            'name': name,
+            'academic_year': '2023-2024',
+            'scheduled_start_time': datetime.time(9, 0),
+            'scheduled_end_time': datetime.time(10, 30),
+            'days_of_week': 'Monday,Wednesday,Friday',
+            'location': 'Room 101',
+            'teacher': cls.teacher,
+            'subject': cls.subject,
+        }
+        data.update(kwargs)
+        return Class.objects.create(**data)
+
+    @classmethod
+    def make_student(cls, username, roll_number):
+        user = User.objects.create_user(
+            username=username, password='student123', role='Student',
+            first_name=username.capitalize(), last_name='Test'
+        )
+        return Student.objects.create(user=user, roll_number=roll_number)
+
+    @classmethod
+    def make_attendance(cls, student, class_obj=None, days_ago=0, **kwargs):
+        data = {
+            'student': student,
+            'class_obj': class_obj or cls.class_obj,
+            'attendance_date': datetime.date(2024, 3, 1) - datetime.timedelta(days=days_ago),
+            'attendance_time': datetime.time(9, 0),
+            'status': 'Present',
+            'checkin_method': 'MANUAL',
+            'recorded_by': cls.teacher,
+        }
+        data.update(kwargs)
+        return AttendanceRecord.objects.create(**data)
+
+    def setUp(self):
+        cache.clear()
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client
+
+    def count_queries(self, client, url, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(ctx.captured_queries)
+
+
+class AttendanceQueryCountTests(SchoolApiTestCase):
+    """
+    The attendance endpoints must run a fixed number of queries regardless of row count
+    """
+
+    def test_list_query_count_is_constant(self):
+        client = self.client_for(self.admin)
+        self.make_attendance(self.students[0])
+        baseline = self.count_queries(client, '/api/attendance/')
+
+        for student in self.students[1:]:
+            self.make_attendance(student)
+        for days_ago in range(1, 5):
+            self.make_attendance(self.students[0], days_ago=days_ago)
+
+        self.assertEqual(self.count_queries(client, '/api/attendance/'), baseline)
+        self.assertLessEqual(baseline, 2)
+
+    def test_retrieve_query_count(self):
+        record = self.make_attendance(self.students[0])
+        client = self.client_for(self.admin)
+        with self.assertNumQueries(1):
+            response = client.get(f'/api/attendance/{record.id}/')
+        self.assertEqual(response.data['student_name'], 'Student1 Test')
+        self.assertEqual(response.data['class_name'], 'Math 101')
+        self.assertEqual(response.data['recorded_by_name'], 'John Smith')
+
+    def test_student_history_query_count_is_constant(self):
+        client = self.client_for(self.admin)
+        student = self.students[0]
+        self.make_attendance(student)
+        baseline = self.count_queries(client, '/api/attendance/student_history/', student_id=student.id)
+
+        for days_ago in range(1, 10):
+            self.make_attendance(student, days_ago=days_ago)
+
+        self.assertEqual(
+            self.count_queries(client, '/api/attendance/student_history/', student_id=student.id),
+            baseline
+        )
+        self.assertLessEqual(baseline, 2)
+
+
+class StudentQueryCountTests(SchoolApiTestCase):
+    """
+    Student list and detail batch their nested lookups and honour ?expand=
+    """
+
+    def enroll_in_new_classes(self, count):
+        teacher = User.objects.create_user(username=f'teacher_x{count}', password='x', role='Teacher')
+        subject = Subject.objects.create(name=f'Subject {count}')
+        classes = [self.make_class(f'Extra {count}-{i}', teacher=teacher, subject=subject) for i in range(count)]
+        for student in self.students:
+            student.classes.add(*classes)
+
+    def test_list_query_count_is_constant(self):
+        client = self.client_for(self.admin)
+        baseline = self.count_queries(client, '/api/students/')
+
+        self.enroll_in_new_classes(6)
+        self.make_student('student9', 'S009').classes.add(self.class_obj)
+
+        self.assertEqual(self.count_queries(client, '/api/students/'), baseline)
+        # count, students with users, classes with teachers and subjects, parents
+        self.assertLessEqual(baseline, 4)
+
+    def test_retrieve_query_count_is_constant(self):
+        client = self.client_for(self.admin)
+        url = f'/api/students/{self.students[0].id}/'
+        baseline = self.count_queries(client, url)
+        self.enroll_in_new_classes(8)
+        self.assertEqual(self.count_queries(client, url), baseline)
+
+    def test_expand_skips_nested_classes(self):
+        client = self.client_for(self.admin)
+        response = client.get('/api/students/', {'expand': 'user_details'})
+        row = response.data['results'][0]
+        self.assertIn('user_details', row)
+        self.assertNotIn('classes_details', row)
+        self.assertEqual(row['classes'], [self.class_obj.id])
+
+        response = client.get('/api/students/')
+        row = response.data['results'][0]
+        self.assertEqual(row['classes_details'][0]['teacher_name'], 'John Smith')
+
+
+class BulkMarkAttendanceTests(SchoolApiTestCase):
+    """
+    bulk_mark records a whole roster in one request and reports per-item results
+    """
+
+    url = '/api/attendance/bulk_mark/'
+
+    def payload(self, records, **kwargs):
+        data = {
+            'class_obj': str(self.class_obj.id),
+            'attendance_date': '2024-03-04',
+            'attendance_time': '09:05:00',
+            'records': records,
+        }
+        data.update(kwargs)
+        return data
+
+    def test_marks_whole_roster(self):
+        client = self.client_for(self.teacher)
+        records = [{'student': str(s.id), 'status': 'Present'} for s in self.students]
+        records[1]['status'] = 'Late'
+        records[1]['notes'] = 'Bus delay'
+
+        response = client.post(self.url, self.payload(records), format='json')
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(response.data['invalid'], 0)
+        late = AttendanceRecord.objects.get(student=self.students[1])
+        self.assertEqual((late.status, late.notes, late.recorded_by), ('Late', 'Bus delay', self.teacher))
+
+    def test_query_count_does_not_grow_with_roster(self):
+        client = self.client_for(self.teacher)
+        extra = [self.make_student(f'bulk{i}', f'B{i:03d}') for i in range(10)]
+        self.class_obj.enrolled_students.add(*extra)
+        small = [{'student': str(self.students[0].id), 'status': 'Present'}]
+        large = [{'student': str(s.id), 'status': 'Present'} for s in self.students[1:] + extra]
+
+        with CaptureQueriesContext(connection) as small_ctx:
+            client.post(self.url, self.payload(small), format='json')
+        with CaptureQueriesContext(connection) as large_ctx:
+            client.post(self.url, self.payload(large), format='json')
+
+        self.assertEqual(len(large_ctx.captured_queries), len(small_ctx.captured_queries))
+        self.assertEqual(AttendanceRecord.objects.count(), 13)
+
+    def test_reports_invalid_items_without_rejecting_the_rest(self):
+        client = self.client_for(self.teacher)
+        outsider = self.make_student('outsider', 'X001')
+        self.make_attendance(self.students[2], attendance_date=datetime.date(2024, 3, 4))
+        records = [
+            {'student': str(self.students[0].id), 'status': 'Present'},
+            {'student': str(self.students[0].id), 'status': 'Absent'},
+            {'student': str(outsider.id), 'status': 'Present'},
+            {'student': str(self.students[1].id), 'status': 'Sleeping'},
+            {'student': str(self.students[2].id), 'status': 'Present'},
+        ]
+
+        response = client.post(self.url, self.payload(records), format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['result'] for r in response.data['results']],
+                         ['created', 'invalid', 'invalid', 'invalid', 'invalid'])
+        self.assertEqual(AttendanceRecord.objects.count(), 2)
+
+    def test_other_teacher_is_forbidden(self):
+        other = User.objects.create_user(username='teacher2', password='x', role='Teacher')
+        client = self.client_for(other)
+        records = [{'student': str(self.students[0].id), 'status': 'Present'}]
+        response = client.post(self.url, self.payload(records), format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+    def test_concurrent_duplicate_is_a_conflict(self):
+        client = self.client_for(self.teacher)
+        records = [{'student': str(s.id), 'status': 'Present'} for s in self.students]
+        bulk_create = AttendanceRecord.objects.bulk_create
+
+        def racing_bulk_create(objs, **kwargs):
+            # Another request records a student after this one checked the existing rows
+            self.make_attendance(self.students[1], attendance_date=datetime.date(2024, 3, 4), status='Late')
+            return bulk_create(objs, **kwargs)
+
+        with mock.patch.object(AttendanceRecord.objects, 'bulk_create', side_effect=racing_bulk_create):
+            response = client.post(self.url, self.payload(records), format='json')
+
+        self.assertEqual(response.status_code, 409)
+        # The stand-in for the other request shares this one's rolled-back transaction
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+
+class AttendanceUpsertTests(SchoolApiTestCase):
+    """
+    ?upsert=true turns duplicate check-ins into updates of the existing row
+    """
+
+    def payload(self, status='Present', time='09:00:00'):
+        return {
+            'student': str(self.students[0].id),
+            'class_obj': str(self.class_obj.id),
+            'attendance_date': '2024-03-04',
+            'attendance_time': time,
+            'status': status,
+            'checkin_method': 'QR_STATIC',
+        }
+
+    def test_duplicate_create_without_upsert_is_rejected(self):
+        client = self.client_for(self.teacher)
+        self.assertEqual(client.post('/api/attendance/', self.payload(), format='json').status_code, 201)
+        self.assertEqual(client.post('/api/attendance/', self.payload(), format='json').status_code, 400)
+
+    def test_duplicate_create_with_upsert_updates(self):
+        client = self.client_for(self.teacher)
+        first = client.post('/api/attendance/?upsert=true', self.payload(), format='json')
+        self.assertEqual(first.status_code, 201, first.data)
+
+        with CaptureQueriesContext(connection) as ctx:
+            second = client.post('/api/attendance/?upsert=true', self.payload('Late', '09:20:00'), format='json')
+        self.assertEqual(second.status_code, 200, second.data)
+        self.assertEqual(second.data['id'], first.data['id'])
+        self.assertEqual((second.data['status'], second.data['attendance_time']), ('Late', '09:20:00'))
+        writes = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "school_api_attendancerecord"')]
+        self.assertEqual(len(writes), 1)
+        self.assertIn('ON CONFLICT', writes[0])
+        self.assertEqual(AttendanceRecord.objects.count(), 1)
+
+    def test_upsert_into_another_teachers_class_is_forbidden(self):
+        existing = self.make_attendance(self.students[0], attendance_date=datetime.date(2024, 3, 4), status='Absent')
+        other = User.objects.create_user(username='teacher2', password='x', role='Teacher')
+        response = self.client_for(other).post('/api/attendance/?upsert=true', self.payload(), format='json')
+
+        self.assertEqual(response.status_code, 403)
+        existing.refresh_from_db()
+        self.assertEqual((existing.status, existing.recorded_by_id), ('Absent', self.teacher.id))
+
+    def test_bulk_mark_with_upsert_updates_existing(self):
+        existing = self.make_attendance(self.students[0], attendance_date=datetime.date(2024, 3, 4), status='Absent')
+        client = self.client_for(self.teacher)
+        records = [{'student': str(s.id), 'status': 'Present'} for s in self.students]
+        response = client.post('/api/attendance/bulk_mark/?upsert=true', {
+            'class_obj': str(self.class_obj.id),
+            'attendance_date': '2024-03-04',
+            'records': records,
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual((response.data['created'], response.data['updated']), (2, 1))
+        self.assertEqual(response.data['results'][0]['id'], existing.id)
+        existing.refresh_from_db()
+        self.assertEqual(existing.status, 'Present')
+        self.assertEqual(AttendanceRecord.objects.count(), 3)
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    SQL_PROFILER_SAMPLE_RATE=0.0, SQL_PROFILER_SLOW_MS=None,
+)
+class AttendanceUpsertConcurrencyTests(TransactionTestCase):
+    """
+    Parallel duplicate check-ins for the same student, class and day leave exactly one row
+    """
+    databases = {'default', 'read'}
+
+    def test_parallel_duplicate_checkins(self):
+        teacher = User.objects.create_user(username='teacher1', password='x', role='Teacher')
+        user = User.objects.create_user(username='student1', password='x', role='Student')
+        student = Student.objects.create(user=user, roll_number='S001')
+        class_obj = Class.objects.create(
+            name='Math 101', academic_year='2023-2024', scheduled_start_time='09:00',
+            scheduled_end_time='10:30', days_of_week='Monday', location='Room 101',
+            teacher=teacher, subject=Subject.objects.create(name='Mathematics')
+        )
+        payload = {
+            'student': str(student.id),
+            'class_obj': str(class_obj.id),
+            'attendance_date': '2024-03-04',
+            'attendance_time': '09:00:00',
+            'status': 'Present',
+            'checkin_method': 'QR_STATIC',
+        }
+
+        def check_in(_):
+            client = APIClient()
+            client.force_authenticate(user=teacher)
+            try:
+                return client.post('/api/attendance/?upsert=true', payload, format='json').status_code
+            finally:
+                connections.close_all()
+
+        # Lock contention surfaces as OperationalError ("database is locked") and fails the test
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            statuses = list(executor.map(check_in, range(16)))
+
+        self.assertEqual(sorted(statuses), [200] * 15 + [201])
+        self.assertEqual(AttendanceRecord.objects.count(), 1)
+
+
+class QRCheckinTests(SchoolApiTestCase):
+    """
+    The QR_STATIC check-in path resolves class and status from the cached roster index
+    """
+
+    url = '/api/attendance/checkin/'
+
+    def at(self, hour, minute):
+        # 2024-03-04 is a Monday
+        return mock.patch('django.utils.timezone.localtime', return_value=datetime.datetime(
+            2024, 3, 4, hour, minute, tzinfo=datetime.timezone.utc
+        ))
+
+    def test_find_class_in_session(self):
+        index = get_roster_index()
+        student_id = self.students[0].id
+        monday = datetime.datetime(2024, 3, 4, tzinfo=datetime.timezone.utc)
+        self.assertEqual(find_class_in_session(index, student_id, monday.replace(hour=8, minute=50)),
+                         (self.class_obj.id, 'Present'))
+        self.assertEqual(find_class_in_session(index, student_id, monday.replace(hour=9, minute=25)),
+                         (self.class_obj.id, 'Late'))
+        self.assertIsNone(find_class_in_session(index, student_id, monday.replace(hour=11)))
+        self.assertIsNone(find_class_in_session(index, student_id, monday.replace(day=5, hour=9)))
+
+    def test_student_checks_in_without_roster_queries(self):
+        client = self.client_for(self.students[0].user)
+        get_roster_index()
+        with self.at(9, 2), CaptureQueriesContext(connection) as ctx:
+            response = client.post(self.url, {}, format='json')
+
+        # One upsert plus one recount statement per aggregate table; the roster comes from the
+        # cached index
+        tables = ('"school_api_student"', '"school_api_class"', '"school_api_student_classes"')
+        self.assertFalse([q for q in ctx.captured_queries if any(t in q['sql'] for t in tables)])
+        self.assertEqual(len(ctx.captured_queries), 3)
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['status'], 'Present')
+        record = AttendanceRecord.objects.get()
+        self.assertEqual((record.student, record.class_obj, record.checkin_method),
+                         (self.students[0], self.class_obj, 'QR_STATIC'))
+
+    def test_repeat_scan_updates_existing_record(self):
+        client = self.client_for(self.teacher)
+        with self.at(9, 2):
+            client.post(self.url, {'roll_number': 'S002'}, format='json')
+        with self.at(9, 30):
+            response = client.post(self.url, {'roll_number': 'S002'}, format='json')
+        self.assertEqual(response.data['status'], 'Late')
+        self.assertEqual(AttendanceRecord.objects.get().status, 'Late')
+
+    def test_student_cannot_check_in_someone_else(self):
+        client = self.client_for(self.students[0].user)
+        with self.at(9, 2):
+            response = client.post(self.url, {'student': str(self.students[1].id)}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_teacher_cannot_check_in_to_another_teachers_class(self):
+        other = User.objects.create_user(
+            username='teacher2', password='teacher123', role='Teacher', first_name='Jane', last_name='Doe'
+        )
+        with self.at(9, 2):
+            response = self.client_for(other).post(self.url, {'roll_number': 'S002'}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+        with self.at(9, 2):
+            response = self.client_for(self.admin).post(self.url, {'roll_number': 'S002'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_no_class_in_session(self):
+        client = self.client_for(self.students[0].user)
+        with self.at(12, 0):
+            response = client.post(self.url, {}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+    def test_enrollment_invalidates_index(self):
+        newcomer = self.make_student('newcomer', 'S100')
+        client = self.client_for(newcomer.user)
+        get_roster_index()
+        with self.at(9, 2):
+            self.assertEqual(client.post(self.url, {}, format='json').status_code, 400)
+
+        self.class_obj.enrolled_students.add(newcomer)
+        with self.at(9, 2):
+            self.assertEqual(client.post(self.url, {}, format='json').status_code, 200)
+
+
+class CursorPaginationTests(SchoolApiTestCase):
+    """
+    ?pagination=cursor pages attendance and announcements by keyset without COUNT(*)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Several records share each date so the id tiebreaker matters
+        for days_ago in range(8):
+            for student in cls.students:
+                cls.make_attendance(student, days_ago=days_ago)
+        for i in range(15):
+            Announcement.objects.create(
+                title=f'Notice {i}', message='...', type='General', audience='All', created_by=cls.admin
+            )
+
+    def walk(self, client, url, **params):
+        pages = []
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(url, {'pagination': 'cursor', **params})
+            pages.append(response.data)
+            while response.data['next']:
+                response = client.get(response.data['next'])
+                pages.append(response.data)
+        return pages, ctx.captured_queries
+
+    def test_attendance_pages_are_complete_and_ordered(self):
+        client = self.client_for(self.admin)
+        pages, queries = self.walk(client, '/api/attendance/')
+
+        ids = [row['id'] for page in pages for row in page['results']]
+        self.assertEqual(len(ids), 24)
+        self.assertEqual(len(set(ids)), 24)
+        expected = AttendanceRecord.objects.order_by('-attendance_date', '-id').values_list('id', flat=True)
+        self.assertEqual(ids, [str(pk) for pk in expected])
+        self.assertEqual(len(queries), len(pages))
+        self.assertFalse(any('COUNT(' in q['sql'] for q in queries))
+        self.assertNotIn('count', pages[0])
+        self.assertIsNone(pages[0]['previous'])
+
+    def test_previous_link_returns_the_prior_page(self):
+        client = self.client_for(self.admin)
+        first = client.get('/api/attendance/', {'pagination': 'cursor'}).data
+        second = client.get(first['next']).data
+        back = client.get(second['previous']).data
+        self.assertEqual([r['id'] for r in back['results']], [r['id'] for r in first['results']])
+        self.assertIsNone(back['previous'])
+        self.assertEqual(back['next'], first['next'])
+
+    def test_announcements_with_count(self):
+        client = self.client_for(self.students[0].user)
+        pages, _ = self.walk(client, '/api/announcements/', count='true')
+        self.assertEqual(pages[0]['count'], 15)
+        titles = [row['title'] for page in pages for row in page['results']]
+        self.assertEqual(sorted(titles), sorted(f'Notice {i}' for i in range(15)))
+
+    def test_page_number_pagination_is_still_the_default(self):
+        client = self.client_for(self.admin)
+        response = client.get('/api/attendance/', {'page': 2})
+        self.assertEqual(response.data['count'], 24)
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_invalid_cursor(self):
+        client = self.client_for(self.admin)
+        self.assertEqual(client.get('/api/attendance/', {'cursor': 'garbage'}).status_code, 404)
+
+    def test_malformed_cursor_positions(self):
+        client = self.client_for(self.admin)
+        for cursor in (
+            {"p": ["abc", "zzz"], "r": 0},
+            {"p": [{}, {}], "r": 0},
+            {"p": ["2024-01-01", "not-a-uuid"], "r": 0},
+            {"p": [None, None], "r": 1},
+        ):
+            with self.subTest(cursor=cursor):
+                encoded = base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+                response = client.get('/api/attendance/', {'cursor': encoded})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.data['detail'], 'Invalid cursor')
+
+
+class QueryPlanTests(SchoolApiTestCase):
+    """
+    The hot endpoint querysets must be served from an index rather than a full table scan
+    """
+
+    def endpoint_queryset(self, viewset_class, user, action='list', **params):
+        request = Request(APIRequestFactory().get('/', params))
+        request.user = user
+        view = viewset_class(request=request, action=action, format_kwarg=None, kwargs={})
+        return view.filter_queryset(view.get_queryset())
+
+    def full_table_scans(self, queryset):
+        """
+        Tables the query plan reads without an index (SQLite "SCAN t", PostgreSQL "Seq Scan on t")
+        """
+        if connection.vendor == 'sqlite':
+            # Plan rows look like "2 0 0 SCAN school_api_class"; "SCAN t USING INDEX i" is an index walk
+            pattern = re.compile(r'^(?:\d+ \d+ \d+ )?SCAN (\S+)(?!.* USING )')
+        else:
+            pattern = re.compile(r'Seq Scan on (\S+)')
+        return [match.group(1) for match in map(pattern.search, queryset.explain().splitlines()) if match]
+
+    def assertNoFullTableScan(self, queryset):
+        scans = self.full_table_scans(queryset)
+        self.assertEqual(scans, [], f'Full table scan in plan:\n{queryset.explain()}')
+
+    def test_student_history(self):
+        student = self.students[0]
+        queryset = self.endpoint_queryset(AttendanceRecordViewSet, self.admin, 'student_history')
+        self.assertNoFullTableScan(queryset.filter(student=student).order_by('-attendance_date'))
+
+    def test_class_roster_for_a_day(self):
+        queryset = self.endpoint_queryset(AttendanceRecordViewSet, self.admin)
+        self.assertNoFullTableScan(
+            queryset.filter(class_obj=self.class_obj, attendance_date=datetime.date(2024, 3, 1))
+        )
+
+    def test_attendance_cursor_page(self):
+        queryset = self.endpoint_queryset(AttendanceRecordViewSet, self.admin)
+        self.assertNoFullTableScan(queryset.order_by('-attendance_date', '-id')[:11])
+
+    def test_announcement_feeds(self):
+        for user in (self.students[0].user, self.admin):
+            queryset = self.endpoint_queryset(AnnouncementViewSet, user)
+            self.assertNoFullTableScan(queryset[:10])
+
+    def test_class_by_academic_year(self):
+        queryset = self.endpoint_queryset(ClassViewSet, self.admin, academic_year='2023-2024')
+        self.assertNoFullTableScan(queryset)
+
+    def test_classes_in_session(self):
+        queryset = self.endpoint_queryset(ClassViewSet, self.admin, at='2024-03-04T09:30')
+        self.assertNoFullTableScan(queryset)
+        self.assertIn('class_days_start_idx', queryset.explain())
+
+    def test_classes_on_a_day(self):
+        student = self.students[0]
+        for params in ({'teacher': self.teacher.pk}, {'student': student.pk}, {'location': 'Room 101'}, {}):
+            with self.subTest(**params):
+                self.assertNoFullTableScan(self.endpoint_queryset(ClassViewSet, self.admin, day='Tuesday', **params))
+
+    def test_detects_full_table_scan(self):
+        self.assertEqual(self.full_table_scans(Class.objects.filter(name='Math 101')), ['school_api_class'])
+
+
+class ScheduleTests(SchoolApiTestCase):
+    """
+    Meeting days are stored as a bitmask but read and written as day names, and the class
+    list filters by day, time, teacher, student and room
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_teacher = User.objects.create_user(username='teacher2', password='x', role='Teacher')
+        cls.history = cls.make_class(
+            'History 101', days_of_week='Tuesday,Thursday', scheduled_start_time=datetime.time(11, 0),
+            scheduled_end_time=datetime.time(12, 0), location='Room 202', teacher=cls.other_teacher
+        )
+        cls.history.enrolled_students.add(cls.students[0])
+
+    def names(self, **params):
+        return self.names_for(self.admin, **params)
+
+    def names_for(self, user, **params):
+        response = self.client_for(user).get('/api/classes/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return sorted(row['name'] for row in response.data['results'])
+
+    def test_days_round_trip(self):
+        self.assertEqual(self.class_obj.meeting_days, 0b10101)
+        response = self.client_for(self.admin).post('/api/classes/', {
+            'name': 'Art 101', 'academic_year': '2023-2024', 'scheduled_start_time': '14:00',
+            'scheduled_end_time': '15:00', 'days_of_week': 'friday, Monday', 'location': 'Studio',
+            'teacher': str(self.teacher.id), 'subject': str(self.subject.id),
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['days_of_week'], 'Monday,Friday')
+        self.assertEqual(Class.objects.get(name='Art 101').meeting_days, 0b10001)
+
+        response = self.client_for(self.admin).patch(
+            f'/api/classes/{self.class_obj.id}/', {'days_of_week': 'Monday,Funday'}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Funday', str(response.data['days_of_week']))
+
+        response = self.client_for(self.admin).get('/api/classes/', {'fields': 'name,days_of_week'})
+        self.assertIn({"name": "History 101", "days_of_week": "Tuesday,Thursday"}, response.data['results'])
+
+    def test_in_session_filters(self):
+        self.assertEqual(self.names(at='2024-03-04T09:30'), ['Math 101'])
+        self.assertEqual(self.names(at='2024-03-05T11:15'), ['History 101'])
+        self.assertEqual(self.names(at='2024-03-05T09:30'), [])
+        # Start times are inclusive, end times exclusive
+        self.assertEqual(self.names(day='Wednesday', time='09:00'), ['Math 101'])
+        self.assertEqual(self.names(day='wednesday', time='10:30'), [])
+        self.assertEqual(self.names(time='11:30'), ['History 101'])
+
+    def test_day_filters(self):
+        self.assertEqual(self.names(day='Tuesday'), ['History 101'])
+        self.assertEqual(self.names(day='0'), ['Math 101'])
+        self.assertEqual(self.names(day='Thursday', teacher=self.teacher.id), [])
+        self.assertEqual(self.names(day='Thursday', student=self.students[0].id), ['History 101'])
+        self.assertEqual(self.names(day='Friday', student=self.students[0].id), ['Math 101'])
+        self.assertEqual(self.names(day='Friday', location='Room 202'), [])
+        self.assertEqual(self.names(location='Room 202'), ['History 101'])
+
+    def test_student_filter_respects_student_visibility(self):
+        # students[2] is neither students[1] nor enrolled with teacher2
+        for user in (self.students[1].user, self.other_teacher):
+            self.assertEqual(self.names_for(user, student=self.students[2].id), [])
+        for user in (self.students[0].user, self.other_teacher):
+            self.assertEqual(self.names_for(user, student=self.students[0].id), ['History 101', 'Math 101'])
+
+    def test_invalid_filters(self):
+        client = self.client_for(self.admin)
+        for params, field in (
+            ({'day': 'Funday'}, 'day'), ({'time': '25:00'}, 'time'), ({'at': 'soon'}, 'at'),
+            ({'at': '2024-03-04T09:30', 'day': 'Monday'}, 'at'), ({'teacher': 'nope'}, 'teacher'),
+        ):
+            with self.subTest(**params):
+                response = client.get('/api/classes/', params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(field, response.data)
+
+    def test_roster_index_uses_meeting_days(self):
+        index = get_roster_index()
+        monday = datetime.datetime(2024, 3, 4, 9, 5, tzinfo=datetime.timezone.utc)
+        tuesday = datetime.datetime(2024, 3, 5, 11, 5, tzinfo=datetime.timezone.utc)
+        self.assertEqual(find_class_in_session(index, self.students[0].id, monday), (self.class_obj.id, 'Present'))
+        self.assertEqual(find_class_in_session(index, self.students[0].id, tuesday), (self.history.id, 'Present'))
+        self.assertIsNone(find_class_in_session(index, self.students[1].id, tuesday))
+
+    def test_day_parsing(self):
+        self.assertEqual(parse_days(' monday,Tuesday ,, '), 0b11)
+        with self.assertRaises(ValueError):
+            parse_days('Funday')
+        self.assertEqual(format_days(0b1000001), 'Monday,Sunday')
+
+
+class AttendanceAggregateTests(SchoolApiTestCase):
+    """
+    The class-day and student-month aggregates follow every kind of attendance write
+    """
+
+    def assertClassDay(self, date, **counts):
+        summary = ClassDailyAttendance.objects.get(class_obj=self.class_obj, attendance_date=date)
+        self.assertEqual({f: getattr(summary, f) for f in counts}, counts)
+
+    def test_create_update_and_delete(self):
+        date = datetime.date(2024, 3, 1)
+        record = self.make_attendance(self.students[0])
+        self.make_attendance(self.students[1], status='Late')
+        self.assertClassDay(date, present_count=1, late_count=1)
+
+        record.status = 'Absent'
+        record.save()
+        self.assertClassDay(date, present_count=0, absent_count=1, late_count=1)
+
+        # Moving a record to another date recounts both days
+        record.attendance_date = datetime.date(2024, 2, 28)
+        record.save()
+        self.assertClassDay(date, absent_count=0, late_count=1)
+        self.assertClassDay(datetime.date(2024, 2, 28), absent_count=1)
+        monthly = {s.month: s.total_count for s in StudentMonthlyAttendance.objects.filter(student=self.students[0])}
+        self.assertEqual(monthly, {datetime.date(2024, 2, 1): 1})
+
+        record.delete()
+        self.assertFalse(ClassDailyAttendance.objects.filter(attendance_date=datetime.date(2024, 2, 28)).exists())
+
+    def test_bulk_mark_and_upsert(self):
+        client = self.client_for(self.teacher)
+        payload = {
+            'class_obj': str(self.class_obj.id),
+            'attendance_date': '2024-03-04',
+            'records': [{'student': str(s.id), 'status': 'Present'} for s in self.students],
+        }
+        client.post('/api/attendance/bulk_mark/', payload, format='json')
+        self.assertClassDay(datetime.date(2024, 3, 4), present_count=3)
+
+        payload['records'][0]['status'] = 'Excused'
+        client.post('/api/attendance/bulk_mark/?upsert=true', payload, format='json')
+        self.assertClassDay(datetime.date(2024, 3, 4), present_count=2, excused_count=1)
+        monthly = StudentMonthlyAttendance.objects.get(student=self.students[0], month=datetime.date(2024, 3, 1))
+        self.assertEqual((monthly.present_count, monthly.excused_count), (0, 1))
+
+    def test_rescan_recounts_with_bounded_queries(self):
+        client = self.client_for(self.students[0].user)
+        get_roster_index()
+        monday = datetime.date(2024, 3, 4)
+        for (hour, minute), status in (((9, 2), 'Present'), ((9, 30), 'Late')):
+            with mock.patch('django.utils.timezone.localtime', return_value=datetime.datetime(
+                2024, 3, 4, hour, minute, tzinfo=datetime.timezone.utc
+            )), self.assertNumQueries(3):
+                self.assertEqual(client.post('/api/attendance/checkin/', {}, format='json').data['status'], status)
+        self.assertClassDay(monday, present_count=0, late_count=1)
+        monthly = StudentMonthlyAttendance.objects.get(student=self.students[0], month=datetime.date(2024, 3, 1))
+        self.assertEqual((monthly.present_count, monthly.late_count), (0, 1))
+
+    def test_rebuild_command(self):
+        for days_ago in range(40):
+            self.make_attendance(self.students[0], days_ago=days_ago, status='Late' if days_ago % 4 else 'Present')
+        ClassDailyAttendance.objects.update(present_count=99)
+        StudentMonthlyAttendance.objects.all().delete()
+
+        call_command('rebuild_attendance_aggregates', stdout=io.StringIO())
+
+        self.assertEqual(ClassDailyAttendance.objects.count(), 40)
+        self.assertEqual(sum(s.present_count for s in ClassDailyAttendance.objects.all()), 10)
+        months = StudentMonthlyAttendance.objects.filter(student=self.students[0]).order_by('month')
+        self.assertEqual([m.month for m in months], [datetime.date(2024, 1, 1), datetime.date(2024, 2, 1),
+                                                     datetime.date(2024, 3, 1)])
+        self.assertEqual(sum(m.total_count for m in months), 40)
+
+
+class AttendanceExportTests(SchoolApiTestCase):
+    """
+    The export action streams filtered attendance as CSV or NDJSON
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for days_ago in range(5):
+            for student in cls.students:
+                cls.make_attendance(student, days_ago=days_ago)
+
+    def export(self, **params):
+        client = self.client_for(self.teacher)
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get('/api/attendance/export/', params)
+            body = b''.join(response.streaming_content).decode() if response.streaming else None
+        return response, body, ctx.captured_queries
+
+    def test_csv(self):
+        response, body, queries = self.export(date_from='2024-02-28', student_id=str(self.students[0].id))
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual([r['attendance_date'] for r in rows], ['2024-02-28', '2024-02-29', '2024-03-01'])
+        self.assertEqual((rows[0]['roll_number'], rows[0]['class_name']), ('S001', 'Math 101'))
+        self.assertEqual(len(queries), 1)
+
+    def test_ndjson(self):
+        response, body, _ = self.export(output='ndjson', date_to='2024-02-26')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['status'], 'Present')
+        self.assertEqual(rows[0]['class_obj'], str(self.class_obj.id))
+
+    def test_invalid_parameters(self):
+        response, _, _ = self.export(output='xml')
+        self.assertEqual(response.status_code, 400)
+        response, _, _ = self.export(date_from='yesterday')
+        self.assertEqual(response.status_code, 400)
+
+
+class FullTextSearchTests(SchoolApiTestCase):
+    """
+    ?search= is served from the FTS5 index, kept in sync with saves and deletes
+    """
+
+    def search(self, url, text, user=None):
+        response = self.client_for(user or self.admin).get(url, {'search': text})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data['results']
+
+    def test_prefix_token_search(self):
+        results = self.search('/api/students/', 'stud s002')
+        self.assertEqual([r['roll_number'] for r in results], ['S002'])
+        self.assertEqual(len(self.search('/api/classes/', 'mat 2023')), 1)
+        self.assertEqual(self.search('/api/classes/', 'physics'), [])
+
+    def test_results_are_ranked(self):
+        for title, message in [('Bus schedule', 'Buses leave at four'),
+                               ('Exam timetable', 'The exam timetable for the exam week'),
+                               ('Library', 'Bring books back before the exam')]:
+            Announcement.objects.create(title=title, message=message, type='General', audience='All',
+                                        created_by=self.admin)
+        results = self.search('/api/announcements/', 'exam')
+        self.assertEqual([r['title'] for r in results], ['Exam timetable', 'Library'])
+
+    def test_index_follows_saves_and_deletes(self):
+        user = self.students[0].user
+        user.first_name = 'Zelda'
+        user.save()
+        self.assertEqual([r['roll_number'] for r in self.search('/api/students/', 'zel')], ['S001'])
+
+        self.students[0].delete()
+        self.assertEqual(self.search('/api/students/', 'zel'), [])
+
+    def test_attendance_search_matches_student_or_class(self):
+        self.make_attendance(self.students[0])
+        other_class = self.make_class('Art 101')
+        self.make_attendance(self.students[1], class_obj=other_class)
+        self.assertEqual(len(self.search('/api/attendance/', 'student1')), 1)
+        self.assertEqual([r['class_name'] for r in self.search('/api/attendance/', 'art')], ['Art 101'])
+
+    def test_attendance_search_words_may_match_different_documents(self):
+        self.make_attendance(self.students[0])
+        self.make_attendance(self.students[1])
+        other_class = self.make_class('Art 101', subject=Subject.objects.create(name='Art'))
+        self.make_attendance(self.students[0], class_obj=other_class)
+        results = self.search('/api/attendance/', 'student1 math')
+        self.assertEqual([(r['student'], r['class_name']) for r in results], [(self.students[0].id, 'Math 101')])
+        self.assertEqual(self.search('/api/attendance/', 'student2 art'), [])
+
+    def test_every_match_is_counted_and_ranked(self):
+        for i in range(3):
+            Announcement.objects.create(title=f'Exam {i}', message='exam ' * (i + 1), type='General',
+                                        audience='All', created_by=self.admin)
+        response = self.client_for(self.admin).get('/api/announcements/', {'search': 'exam'})
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual([r['title'] for r in response.data['results']], ['Exam 2', 'Exam 1', 'Exam 0'])
+        ordered = self.client_for(self.admin).get('/api/announcements/', {'search': 'exam', 'ordering': 'title'})
+        self.assertEqual([r['title'] for r in ordered.data['results']], ['Exam 0', 'Exam 1', 'Exam 2'])
+
+    @override_settings(SEARCH_BACKEND=None)
+    def test_falls_back_to_icontains(self):
+        results = self.search('/api/students/', 'tudent2')
+        self.assertEqual([r['roll_number'] for r in results], ['S002'])
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM school_api_search')
+        self.assertEqual(self.search('/api/students/', 'student'), [])
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(len(self.search('/api/students/', 'student')), 3)
+
+
+class AnnouncementFeedCacheTests(SchoolApiTestCase):
+    """
+    Feed pages are cached per audience bucket and invalidated by announcement writes
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.parent = User.objects.create_user(username='parent1', password='x', role='Parent')
+        self.post('Welcome', 'All')
+
+    def post(self, title, audience):
+        return Announcement.objects.create(title=title, message='...', type='General', audience=audience,
+                                           created_by=self.admin)
+
+    def feed(self, user):
+        response = self.client_for(user).get('/api/announcements/')
+        self.assertEqual(response.status_code, 200)
+        return [row['title'] for row in response.data['results']]
+
+    def test_hits_skip_the_database(self):
+        student = self.students[0].user
+        self.assertEqual(self.feed(student), ['Welcome'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.feed(student), ['Welcome'])
+        self.assertEqual(feed_cache.get_stats(), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+    def test_writes_invalidate_only_affected_buckets(self):
+        student = self.students[0].user
+        self.feed(student)
+        self.feed(self.parent)
+
+        notice = self.post('Parents evening', 'Parents')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.feed(student), ['Welcome'])
+        self.assertEqual(self.feed(self.parent), ['Parents evening', 'Welcome'])
+
+        # Moving the announcement to students invalidates both buckets
+        notice.audience = 'Students'
+        notice.save()
+        self.assertEqual(self.feed(self.parent), ['Welcome'])
+        self.assertEqual(self.feed(student), ['Parents evening', 'Welcome'])
+
+        notice.delete()
+        self.assertEqual(self.feed(student), ['Welcome'])
+
+    def test_pages_and_roles_are_cached_separately(self):
+        self.post('Staff meeting', 'Teachers')
+        self.assertEqual(self.feed(self.teacher), ['Staff meeting', 'Welcome'])
+        self.assertEqual(self.feed(self.students[0].user), ['Welcome'])
+        response = self.client_for(self.teacher).get('/api/announcements/', {'search': 'staff'})
+        self.assertEqual([row['title'] for row in response.data['results']], ['Staff meeting'])
+
+    def test_cache_stats_requires_administrator(self):
+        self.assertEqual(self.client_for(self.teacher).get('/api/announcements/cache_stats/').status_code, 403)
+        response = self.client_for(self.admin).get('/api/announcements/cache_stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('hit_ratio', response.data)
+
+
+class CachedJWTAuthenticationTests(SchoolApiTestCase):
+    """
+    JWT requests resolve the user from the cache or token claims, not the database
+    """
+
+    def login(self, username='teacher1', password='teacher123'):
+        response = APIClient().post('/api/auth/login/', {'username': username, 'password': password})
+        self.assertEqual(response.status_code, 200, response.data)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        return client
+
+    def user_queries(self, client, url='/api/subjects/'):
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(url)
+        return response, [q for q in ctx.captured_queries if '"school_api_user"' in q['sql']]
+
+    def test_user_is_cached_between_requests(self):
+        client = self.login()
+        _, queries = self.user_queries(client)
+        self.assertEqual(len(queries), 1)
+        response, queries = self.user_queries(client)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+
+    def test_cache_holds_no_password_hash(self):
+        self.user_queries(self.login())
+        cached = cache.get(user_cache_key(self.teacher.id))
+        self.assertEqual(cached['role'], 'Teacher')
+        self.assertNotIn('password', cached)
+        self.assertNotIn(self.teacher.password, repr(cached))
+
+    def test_deactivation_takes_effect_immediately(self):
+        client = self.login()
+        self.user_queries(client)
+        self.teacher.is_active = False
+        self.teacher.save()
+        response, _ = self.user_queries(client)
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(AUTH_TRUST_TOKEN_CLAIMS=True)
+    def test_trusted_claims_skip_lookup_until_user_changes(self):
+        client = self.login()
+        response, queries = self.user_queries(client, '/api/announcements/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+
+        announcement = {'title': 'Trip', 'message': '...', 'type': 'Event', 'audience': 'All',
+                        'created_by': str(self.teacher.id)}
+        response = client.post('/api/announcements/', announcement)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created_by_name'], 'John Smith')
+
+        # Demoting the teacher makes the token's role claim stale
+        self.teacher.role = 'Student'
+        self.teacher.save()
+        self.assertEqual(client.post('/api/announcements/', announcement).status_code, 403)
+
+
+class RowLevelScopingTests(SchoolApiTestCase):
+    """
+    Attendance and student visibility is filtered in SQL by role
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_teacher = User.objects.create_user(username='teacher2', password='x', role='Teacher')
+        cls.other_class = cls.make_class('Science 101', teacher=cls.other_teacher)
+        cls.outsider = cls.make_student('outsider', 'X001')
+        cls.other_class.enrolled_students.add(cls.outsider, cls.students[0])
+        cls.parent = User.objects.create_user(username='parent1', password='x', role='Parent')
+        cls.students[1].parents.add(cls.parent)
+        for student in cls.students:
+            cls.make_attendance(student)
+        cls.make_attendance(cls.outsider, class_obj=cls.other_class)
+        cls.make_attendance(cls.students[0], class_obj=cls.other_class)
+
+    def visible(self, user, url):
+        response = self.client_for(user).get(url)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data['results']
+
+    def test_attendance_list_by_role(self):
+        self.assertEqual(len(self.visible(self.admin, '/api/attendance/')), 5)
+        self.assertEqual({r['class_name'] for r in self.visible(self.teacher, '/api/attendance/')}, {'Math 101'})
+        self.assertEqual(len(self.visible(self.other_teacher, '/api/attendance/')), 2)
+        own = self.visible(self.students[0].user, '/api/attendance/')
+        self.assertEqual({r['student'] for r in own}, {self.students[0].id})
+        self.assertEqual(len(own), 2)
+        child = self.visible(self.parent, '/api/attendance/')
+        self.assertEqual([r['student'] for r in child], [self.students[1].id])
+
+    def test_list_never_loads_foreign_rows(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client_for(self.students[0].user).get('/api/attendance/')
+        select = [q['sql'] for q in ctx.captured_queries if 'school_api_attendancerecord' in q['sql']][-1]
+        self.assertIn('"school_api_student"."user_id" =', select.replace('\n', ' '))
+
+    def test_retrieve_outside_scope_is_not_found(self):
+        record = AttendanceRecord.objects.get(student=self.outsider)
+        self.assertEqual(self.client_for(self.teacher).get(f'/api/attendance/{record.id}/').status_code, 404)
+        self.assertEqual(self.client_for(self.other_teacher).get(f'/api/attendance/{record.id}/').status_code, 200)
+
+    def test_student_history(self):
+        url = '/api/attendance/student_history/'
+        client = self.client_for(self.students[1].user)
+        with self.assertNumQueries(1):
+            self.assertEqual(client.get(url, {'student_id': self.students[1].id}).status_code, 200)
+        with self.assertNumQueries(2):
+            self.assertEqual(client.get(url, {'student_id': self.students[0].id}).status_code, 404)
+        self.assertEqual(client.get(url, {'student_id': 'nope'}).status_code, 400)
+
+        # A teacher only sees the records from their own classes
+        history = self.client_for(self.other_teacher).get(url, {'student_id': self.students[0].id}).data
+        self.assertEqual([r['class_name'] for r in history], ['Science 101'])
+        self.assertEqual(self.client_for(self.parent).get(url, {'student_id': self.students[1].id}).status_code, 200)
+
+    def test_create_in_another_teachers_class_is_forbidden(self):
+        response = self.client_for(self.teacher).post('/api/attendance/', {
+            'student': str(self.outsider.id), 'class_obj': str(self.other_class.id), 'attendance_date': '2024-03-04',
+            'attendance_time': '09:00:00', 'status': 'Present', 'checkin_method': 'MANUAL',
+        }, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(AttendanceRecord.objects.filter(attendance_date=datetime.date(2024, 3, 4)).exists())
+
+    def test_update_cannot_move_records_between_teachers(self):
+        own = AttendanceRecord.objects.get(student=self.students[0], class_obj=self.class_obj)
+        response = self.client_for(self.teacher).patch(
+            f'/api/attendance/{own.id}/', {'class_obj': str(self.other_class.id), 'attendance_date': '2024-03-04'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 403)
+        own.refresh_from_db()
+        self.assertEqual(own.class_obj, self.class_obj)
+
+        response = self.client_for(self.teacher).patch(f'/api/attendance/{own.id}/', {'status': 'Late'}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        response = self.client_for(self.admin).patch(
+            f'/api/attendance/{own.id}/', {'class_obj': str(self.other_class.id), 'attendance_date': '2024-03-04'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def test_student_visibility(self):
+        self.assertEqual(len(self.visible(self.admin, '/api/students/')), 4)
+        self.assertEqual({r['roll_number'] for r in self.visible(self.teacher, '/api/students/')},
+                         {'S001', 'S002', 'S003'})
+        self.assertEqual({r['roll_number'] for r in self.visible(self.other_teacher, '/api/students/')},
+                         {'S001', 'X001'})
+        self.assertEqual([r['roll_number'] for r in self.visible(self.students[2].user, '/api/students/')], ['S003'])
+        self.assertEqual([r['roll_number'] for r in self.visible(self.parent, '/api/students/')], ['S002'])
+        self.assertEqual(
+            self.client_for(self.students[2].user).get(f'/api/students/{self.outsider.id}/').status_code, 404
+        )
+
+
+class EnrollmentTests(SchoolApiTestCase):
+    """
+    Enrollment writes every new link with one INSERT, however many students and classes
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.newcomers = [cls.make_student(f'new{i}', f'N{i:03d}') for i in range(20)]
+        cls.other_classes = [cls.make_class(f'Elective {i}') for i in range(3)]
+
+    def enrollment_inserts(self, ctx):
+        return [q for q in ctx.captured_queries if re.match(r'INSERT .*INTO "school_api_student_classes"', q['sql'])]
+
+    def test_enroll_students_uses_one_insert(self):
+        ids = [str(s.id) for s in self.newcomers + self.students]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client_for(self.teacher).post(
+                f'/api/classes/{self.class_obj.id}/enroll_students/', {'student_ids': ids}, format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual((response.data['added'], response.data['skipped']), (20, 3))
+        self.assertEqual(len(self.enrollment_inserts(ctx)), 1)
+        # class lookup, savepoint, classes, students, existing links, insert, release
+        self.assertLessEqual(len(ctx.captured_queries), 7)
+        self.assertEqual(self.class_obj.enrolled_students.count(), 23)
+
+    def test_enroll_students_rejects_unknown_ids(self):
+        response = self.client_for(self.admin).post(
+            f'/api/classes/{self.class_obj.id}/enroll_students/',
+            {'student_ids': [str(self.newcomers[0].id), '00000000-0000-0000-0000-000000000000']}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.class_obj.enrolled_students.filter(id=self.newcomers[0].id).exists())
+
+    def test_enrollment_invalidates_roster_index(self):
+        get_roster_index()
+        self.client_for(self.admin).post(
+            f'/api/classes/{self.class_obj.id}/enroll_students/',
+            {'student_ids': [str(self.newcomers[0].id)]}, format='json'
+        )
+        self.assertEqual(get_roster_index()['students'][self.newcomers[0].id], [self.class_obj.id])
+
+    def test_bulk_enroll_across_classes(self):
+        payload = {'enrollments': [
+            {'class_obj': str(class_obj.id), 'student_ids': [str(s.id) for s in self.newcomers]}
+            for class_obj in self.other_classes
+        ] + [
+            # Already enrolled, repeated and unknown ids
+            {'class_obj': str(self.class_obj.id), 'student_ids': [str(self.students[0].id)] * 2},
+            {'class_obj': '00000000-0000-0000-0000-000000000000', 'student_ids': [str(self.newcomers[0].id)]},
+        ]}
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client_for(self.admin).post('/api/classes/bulk_enroll/', payload, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data, {'added': 60, 'skipped': 2, 'invalid': 1})
+        self.assertEqual(len(self.enrollment_inserts(ctx)), 1)
+        for class_obj in self.other_classes:
+            self.assertEqual(class_obj.enrolled_students.count(), 20)
+
+    def test_teacher_bulk_enroll_is_limited_to_own_classes(self):
+        other_teacher = User.objects.create_user(username='teacher2', password='x', role='Teacher')
+        foreign = self.make_class('Art 101', teacher=other_teacher)
+        payload = {'enrollments': [
+            {'class_obj': str(self.class_obj.id), 'student_ids': [str(self.newcomers[0].id)]},
+            {'class_obj': str(foreign.id), 'student_ids': [str(self.newcomers[0].id)]},
+        ]}
+        response = self.client_for(self.teacher).post('/api/classes/bulk_enroll/', payload, format='json')
+        self.assertEqual(response.data, {'added': 1, 'skipped': 0, 'invalid': 1})
+        self.assertFalse(foreign.enrolled_students.exists())
+        response = self.client_for(self.students[0].user).post('/api/classes/bulk_enroll/', payload, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class BulkUserImportTests(SchoolApiTestCase):
+    """
+    Users are imported in batches; only the management command hashes across processes
+    """
+
+    def rows(self, count, start=0):
+        return [
+            {'username': f'pupil{i}', 'password': f'secret{i}', 'first_name': 'Pupil', 'last_name': str(i),
+             'role': 'Student', 'roll_number': f'P{i:04d}'}
+            for i in range(start, start + count)
+        ]
+
+    def test_hash_passwords_across_processes(self):
+        passwords = [f'pw{i}' for i in range(100)]
+        hashes = hash_passwords(passwords, workers=2)
+        self.assertEqual(len(hashes), 100)
+        self.assertTrue(all(check_password(p, h) for p, h in zip(passwords, hashes)))
+        self.assertEqual(len(set(hashes)), 100)
+
+    def test_import_in_batches(self):
+        with CaptureQueriesContext(connection) as ctx:
+            result = import_users(self.rows(25), batch_size=10, workers=1)
+        self.assertEqual(result, {'created': 25, 'errors': []})
+        user_inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "school_api_user"')]
+        self.assertEqual(len(user_inserts), 3)
+        student = Student.objects.select_related('user').get(roll_number='P0007')
+        self.assertTrue(student.user.check_password('secret7'))
+        self.assertEqual(student.user.role, 'Student')
+
+    def test_bad_rows_are_reported_without_aborting(self):
+        rows = self.rows(3) + [
+            {'username': 'pupil0', 'password': 'x', 'roll_number': 'Z1'},  # repeated in the file
+            {'username': 'student1', 'password': 'x', 'roll_number': 'Z2'},  # already exists
+            {'username': 'nopass', 'roll_number': 'Z3'},
+            {'username': 'noroll', 'password': 'x'},
+            {'username': 'rollclash', 'password': 'x', 'roll_number': 'S001'},
+            {'username': 'parent9', 'password': 'x', 'role': 'Parent'},
+        ]
+        result = import_users(rows, workers=1)
+        self.assertEqual(result['created'], 4)
+        self.assertEqual([error['row'] for error in result['errors']], [4, 5, 6, 7, 8])
+        self.assertIn('password', result['errors'][2]['errors'])
+        self.assertIn('roll_number', result['errors'][3]['errors'])
+        self.assertFalse(Student.objects.filter(user__username='parent9').exists())
+
+    def test_imported_students_are_searchable(self):
+        import_users(self.rows(2), workers=1)
+        response = self.client_for(self.admin).get('/api/students/', {'search': 'P0001'})
+        self.assertEqual([row['roll_number'] for row in response.data['results']], ['P0001'])
+
+    def test_endpoint_accepts_json_and_csv(self):
+        client = self.client_for(self.admin)
+        response = client.post('/api/users/bulk_import/', {'users': self.rows(2)}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['created'], 2)
+
+        content = 'username,password,role,roll_number\npupil5,secret,Student,P0005\npupil6,,Student,P0006\n'
+        upload = SimpleUploadedFile('users.csv', content.encode(), content_type='text/csv')
+        response = client.post('/api/users/bulk_import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['errors'][0]['row'], 2)
+
+        self.assertEqual(self.client_for(self.teacher).post(
+            '/api/users/bulk_import/', {'users': self.rows(1, 10)}, format='json'
+        ).status_code, 403)
+
+    @override_settings(USER_IMPORT_MAX_ROWS=2, USER_IMPORT_MAX_BYTES=100)
+    def test_endpoint_limits_imports_and_hashes_in_process(self):
+        client = self.client_for(self.admin)
+        with mock.patch('school_api.imports.MIN_PARALLEL_PASSWORDS', 0), \
+                mock.patch('school_api.imports.ProcessPoolExecutor') as pool:
+            response = client.post('/api/users/bulk_import/', {'users': self.rows(2)}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        pool.assert_not_called()
+
+        response = client.post('/api/users/bulk_import/', {'users': self.rows(3, 10)}, format='json')
+        self.assertEqual(response.status_code, 413)
+        upload = SimpleUploadedFile('users.csv', b'username,password\n' + b'x' * 100, content_type='text/csv')
+        response = client.post('/api/users/bulk_import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(User.objects.filter(username__startswith='pupil').count(), 2)
+
+    def test_management_command(self):
+        path = self.tmp_path('users.json')
+        with open(path, 'w') as f:
+            json.dump(self.rows(3), f)
+        out = io.StringIO()
+        call_command('import_users', path, '--workers', '1', stdout=out)
+        self.assertIn('Created 3 users', out.getvalue())
+        self.assertEqual(Student.objects.filter(roll_number__startswith='P').count(), 3)
+
+    def tmp_path(self, name):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return f'{directory.name}/{name}'
+
+
+class SyntheticDataTests(SchoolApiTestCase):
+    """
+    load_initial_data --scale generates consistent, reproducible data sets
+    """
+    scale = Scale(schools=2, classes=6, students=4, days=14)
+
+    def generate(self, seed=7):
+        return Generator(self.scale, seed=seed, end_date=datetime.date(2024, 3, 1), batch_size=50).generate()
+
+    def snapshot(self):
+        return (
+            sorted(AttendanceRecord.objects.values_list('id', 'status', 'attendance_date')),
+            sorted(User.objects.filter(username__startswith='syn').values_list('id', 'username', 'first_name')),
+        )
+
+    def test_generated_volumes(self):
+        counts = self.generate()
+        # Each school: 6 classes of ~4 students, 5 classes per student -> 5 students, 3 parents, 2 teachers, 1 admin
+        self.assertEqual(counts['students'], 10)
+        self.assertEqual(counts['users'], 2 * (1 + 2 + 5 + 3))
+        self.assertEqual(counts['enrollments'], 50)
+        self.assertEqual(AttendanceRecord.objects.filter(student__roll_number__startswith='syn').count(),
+                         counts['attendance'])
+        self.assertGreater(counts['attendance'], 0)
+        # Only scheduled meetings get records
+        for record in AttendanceRecord.objects.select_related('class_obj')[:50]:
+            self.assertIn(record.attendance_date.strftime('%A'), record.class_obj.days_of_week)
+
+    def test_aggregates_and_search_are_rebuilt(self):
+        counts = self.generate()
+        totals = ClassDailyAttendance.objects.values_list(
+            'present_count', 'absent_count', 'late_count', 'excused_count'
+        )
+        self.assertEqual(sum(map(sum, totals)), counts['attendance'])
+        response = self.client_for(self.admin).get('/api/students/', {'search': 'syn01-000001'})
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_same_seed_same_data(self):
+        with transaction.atomic():
+            self.generate()
+            first = self.snapshot()
+            transaction.set_rollback(True)
+        self.generate()
+        self.assertEqual(self.snapshot(), first)
+        self.assertTrue(first[0])
+
+    def test_refuses_to_generate_twice(self):
+        self.generate()
+        with self.assertRaises(ValueError):
+            self.generate(seed=8)
+
+    def test_parse_scale(self):
+        self.assertEqual(parse_scale('2x20x30x180'), Scale(2, 20, 30, 180))
+        for value in ['2x20x30', '0x1x1x1', 'axbxcxd']:
+            with self.assertRaises(ValueError):
+                parse_scale(value)
+
+
+class BenchmarkTests(SchoolApiTestCase):
+    """
+    The benchmark harness reports per-scenario statistics and flags regressions
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.make_attendance(cls.students[0])
+
+    def test_report(self):
+        report = run_benchmark(iterations=3, warmup=0, only=r'^(attendance\.list|students\.create|auth\.refresh)$')
+        self.assertEqual(set(report['scenarios']), {'attendance.list', 'students.create', 'auth.refresh'})
+        listing = report['scenarios']['attendance.list']
+        self.assertEqual(listing['statuses'], {'200': 3})
+        self.assertLessEqual(listing['p50_ms'], listing['p95_ms'])
+        self.assertLessEqual(listing['p95_ms'], listing['p99_ms'])
+        self.assertGreater(listing['queries'], 0)
+        self.assertGreater(listing['peak_memory_kb'], 0)
+        self.assertEqual(report['meta']['dataset']['attendance_records'], 1)
+        json.dumps(report)
+
+        # Writes are rolled back after every iteration
+        self.assertEqual(report['scenarios']['students.create']['statuses'], {'201': 3})
+        self.assertFalse(Student.objects.filter(roll_number='BENCH-0001').exists())
+
+        # Every scenario measures a successful response, writes and the clock-pinned check-in included
+        report = run_benchmark(iterations=1, warmup=0)
+        self.assertEqual(report['meta']['failed'], [])
+        for name, result in report['scenarios'].items():
+            self.assertTrue(all(status.startswith('2') for status in result['statuses']), (name, result['statuses']))
+
+    def test_compare_flags_regressions(self):
+        baseline = {'scenarios': {
+            'a': {'p95_ms': 10.0, 'queries': 2},
+            'b': {'p95_ms': 10.0, 'queries': 2},
+            'c': {'p95_ms': 0.5, 'queries': 2},
+            'd': {'p95_ms': 10.0, 'queries': 2},
+        }}
+        report = {'scenarios': {
+            'a': {'p95_ms': 11.0, 'queries': 2},
+            'b': {'p95_ms': 15.0, 'queries': 3},
+            'c': {'p95_ms': 0.9, 'queries': 2},
+            'd': {'p95_ms': 50.0, 'queries': 9, 'failed': True},
+            'new': {'p95_ms': 99.0, 'queries': 9},
+        }}
+        regressions = compare(report, baseline, threshold=0.2)
+        self.assertEqual([(r['scenario'], r['metric']) for r in regressions], [('b', 'p95_ms'), ('b', 'queries')])
+
+    def test_command_compares_with_baseline(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = f'{directory.name}/baseline.json'
+        args = ['benchmark', '--iterations', '1', '--warmup', '0', '--only', r'^subjects\.list$']
+        call_command(*args, '--output', path, stderr=io.StringIO())
+        with open(path) as f:
+            baseline = json.load(f)
+        self.assertIn('subjects.list', baseline['scenarios'])
+
+        baseline['scenarios']['subjects.list']['queries'] = 0
+        with open(path, 'w') as f:
+            json.dump(baseline, f)
+        with self.assertRaises(CommandError):
+            call_command(*args, '--compare', path, stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_percentile(self):
+        self.assertEqual(percentile([1, 2, 3, 4, 5], 50), 3)
+        self.assertEqual(percentile([1, 2], 95), 1.95)
+        self.assertIsNone(percentile([], 50))
+
+
+class PerformanceMetricsTests(SchoolApiTestCase):
+    """
+    Every response carries Server-Timing and is counted in the /api/metrics histograms
+    """
+
+    def setUp(self):
+        super().setUp()
+        metrics.registry.reset()
+
+    def admin_bearer(self):
+        return f'Bearer {RefreshToken.for_user(self.admin).access_token}'
+
+    def server_timing(self, response):
+        return dict(
+            (part.split(';')[0].strip(), part) for part in response['Server-Timing'].split(',')
+        )
+
+    def test_server_timing_header(self):
+        self.make_attendance(self.students[0])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client_for(self.admin).get('/api/attendance/')
+        timing = self.server_timing(response)
+        self.assertEqual(set(timing), {'db', 'serialize', 'view', 'render', 'total'})
+        self.assertIn(f'desc="{len(ctx.captured_queries)} queries"', timing['db'])
+        total = float(re.search(r'dur=([\d.]+)', timing['total']).group(1))
+        parts = sum(
+            float(re.search(r'dur=([\d.]+)', timing[name]).group(1)) for name in ('db', 'serialize', 'view', 'render')
+        )
+        self.assertAlmostEqual(parts, total, delta=0.05)
+
+    @override_settings(LEAN_LIST_SERIALIZATION=False)
+    def test_serializer_time_is_its_own_phase(self):
+        for days_ago in range(20):
+            self.make_attendance(self.students[0], days_ago=days_ago)
+        response = self.client_for(self.admin).get('/api/attendance/')
+        timing = self.server_timing(response)
+        self.assertGreater(float(re.search(r'dur=([\d.]+)', timing['serialize']).group(1)), 0)
+        body = self.client.get('/api/metrics', HTTP_AUTHORIZATION=self.admin_bearer()).content.decode()
+        self.assertRegex(
+            body, r'school_api_request_serialize_seconds_total\{route="attendancerecord-list",method="GET"\} 0\.\d*[1-9]'
+        )
+
+    def test_metrics_exposition(self):
+        client = self.client_for(self.admin)
+        for _ in range(3):
+            client.get('/api/attendance/')
+        client.get(f'/api/students/{self.students[0].id}/')
+        self.client_for(self.students[0].user).get('/api/users/')
+
+        response = self.client.get('/api/metrics', HTTP_AUTHORIZATION=self.admin_bearer())
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('school_api_request_duration_seconds_count{route="attendancerecord-list",method="GET"} 3', body)
+        self.assertIn('school_api_request_duration_seconds_bucket{route="attendancerecord-list",method="GET",le="+Inf"} 3',
+                      body)
+        self.assertIn('school_api_request_duration_seconds_count{route="student-detail",method="GET"} 1', body)
+        self.assertIn('school_api_requests_total{route="user-list",method="GET",status="403"} 1', body)
+        self.assertRegex(body, r'school_api_request_queries_total\{route="attendancerecord-list",method="GET"\} [1-9]')
+        # Scrapes are not recorded
+        self.assertNotIn('route="metrics"', body)
+
+    def test_metrics_require_an_administrator_by_default(self):
+        self.assertEqual(self.client.get('/api/metrics').status_code, 401)
+        teacher = f'Bearer {RefreshToken.for_user(self.teacher).access_token}'
+        self.assertEqual(self.client.get('/api/metrics', HTTP_AUTHORIZATION=teacher).status_code, 401)
+        self.assertEqual(self.client.get('/api/metrics', HTTP_AUTHORIZATION='Bearer forged').status_code, 401)
+        self.assertEqual(self.client.get('/api/metrics', HTTP_AUTHORIZATION=self.admin_bearer()).status_code, 200)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get('/api/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/api/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        response = self.client.get('/api/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(SQL_PROFILER_SAMPLE_RATE=0.0, SQL_PROFILER_SLOW_MS=None, SQL_PROFILER_REPEAT_THRESHOLD=3)
+class SQLProfilerTests(SchoolApiTestCase):
+    """
+    Sampled requests are profiled in full; slow statements and repeats are logged per view action
+    """
+
+    def entries(self, logs):
+        return [json.loads(line[line.index('{'):]) for line in logs.output]
+
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql('SELECT * FROM "t" WHERE "a" IN (%s, %s, %s) AND "b" = \'x\'  AND  "c" > 10 LIMIT 21'),
+            'SELECT * FROM "t" WHERE "a" IN (...) AND "b" = ? AND "c" > ? LIMIT ?'
+        )
+
+    def test_repeated_statements_are_n_plus_one_candidates(self):
+        profile = QueryProfile(full=True, slow_ms=None)
+        with connection.execute_wrapper(profile):
+            for student in self.students:
+                Student.objects.get(pk=student.pk).user
+        repeated = profile.repeated(3)
+        self.assertEqual(len(repeated), 2)
+        sql, site, count = repeated[0]
+        self.assertEqual(count, 3)
+        self.assertTrue(site.startswith('school_api/tests.py:'), site)
+
+    @override_settings(SQL_PROFILER_SAMPLE_RATE=1.0)
+    def test_sampled_request_is_profiled(self):
+        self.make_attendance(self.students[0])
+        with self.assertLogs('school_api.sql', 'INFO') as logs:
+            self.client_for(self.teacher).get('/api/attendance/')
+        profile = [entry for entry in self.entries(logs) if entry['type'] == 'profile'][0]
+        self.assertEqual(profile['view'], 'AttendanceRecordViewSet.list')
+        self.assertEqual(profile['queries'], len(profile['statements']))
+        sites = {statement['call_site'] for statement in profile['statements']}
+        self.assertIn('school_api/pagination.py', ' '.join(filter(None, sites)))
+        self.assertFalse(any(site and 'metrics.py' in site for site in sites), sites)
+
+    @override_settings(SQL_PROFILER_SLOW_MS=0)
+    def test_slow_statements_are_logged_by_action(self):
+        with self.assertLogs('school_api.sql', 'INFO') as logs:
+            self.client_for(self.teacher).post(
+                f'/api/classes/{self.class_obj.id}/enroll_students/',
+                {'student_ids': [str(self.students[0].id)]}, format='json'
+            )
+        entries = self.entries(logs)
+        self.assertTrue(entries)
+        self.assertEqual({entry['type'] for entry in entries}, {'slow'})
+        self.assertEqual({entry['view'] for entry in entries}, {'ClassViewSet.enroll_students'})
+
+    def get_profiled(self, user):
+        # The header is checked against the access token before DRF authenticates
+        token = RefreshToken.for_user(user).access_token
+        return self.client.get('/api/students/', HTTP_X_SQL_PROFILE='1', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_header_profiles_only_for_administrators(self):
+        with self.assertLogs('school_api.sql', 'INFO') as logs:
+            response = self.get_profiled(self.admin)
+        self.assertEqual([entry['type'] for entry in self.entries(logs)], ['profile'])
+        self.assertRegex(response['X-SQL-Profile'], r'^queries=\d+; time=[\d.]+ms; slow=0; repeated=0$')
+
+        with mock.patch('school_api.profiling.QueryProfile', wraps=QueryProfile) as profile, \
+                self.assertNoLogs('school_api.sql', 'INFO'):
+            response = self.get_profiled(self.students[0].user)
+        self.assertNotIn('X-SQL-Profile', response)
+        # Never profiled in full in the first place
+        self.assertFalse(any(call.kwargs.get('full') for call in profile.call_args_list))
+
+    def test_hotspots_command(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = f'{directory.name}/sql.log'
+        lines = [
+            {'type': 'slow', 'view': 'AttendanceRecordViewSet.list', 'sql': 'SELECT 1', 'ms': 250.0, 'call_site': 'a:1'},
+            {'type': 'slow', 'view': 'AttendanceRecordViewSet.list', 'sql': 'SELECT 1', 'ms': 300.0, 'call_site': 'a:1'},
+            {'type': 'repeated', 'view': 'StudentViewSet.list', 'sql': 'SELECT 2', 'count': 9, 'call_site': 'b:2'},
+            {'type': 'profile', 'view': 'StudentViewSet.list', 'queries': 12, 'ms': 5.0, 'statements': []},
+        ]
+        with open(path, 'w') as f:
+            f.writelines(f'2024-03-01 09:00:00,000 {json.dumps(line)}\n' for line in lines)
+        out = io.StringIO()
+        call_command('sql_hotspots', '--log', path, stdout=out)
+        output = out.getvalue()
+        self.assertLess(output.index('AttendanceRecordViewSet.list'), output.index('StudentViewSet.list'))
+        self.assertIn('slow x2 max 300.0ms at a:1', output)
+        self.assertIn('N+1 candidate in 1 requests at b:2', output)
+
+
+class ConditionalGetTests(SchoolApiTestCase):
+    """
+    Lists and details carry validators and answer matching revalidations with 304
+    """
+
+    def revalidate(self, client, url, etag, **params):
+        return client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+
+    def test_list_revalidation_skips_the_page_query(self):
+        client = self.client_for(self.admin)
+        self.make_attendance(self.students[0])
+        response = client.get('/api/attendance/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        etag = response['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.revalidate(client, '/api/attendance/', etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.revalidate(client, '/api/attendance/', etag, status='Absent').status_code, 200)
+
+    def test_writes_change_the_list_etag(self):
+        client = self.client_for(self.admin)
+        record = self.make_attendance(self.students[0])
+        older = self.make_attendance(self.students[1])
+        etag = client.get('/api/attendance/')['ETag']
+
+        record.status = 'Late'
+        record.save()
+        response = self.revalidate(client, '/api/attendance/', etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        # Deleting a row that is not the latest is caught by the count
+        AttendanceRecord.objects.filter(pk=older.pk).update(updated_at=record.updated_at - datetime.timedelta(days=1))
+        etag = client.get('/api/attendance/')['ETag']
+        older.delete()
+        self.assertEqual(self.revalidate(client, '/api/attendance/', etag).status_code, 200)
+
+    def test_related_changes_change_the_etag(self):
+        client = self.client_for(self.admin)
+        etag = client.get('/api/classes/')['ETag']
+        self.teacher.first_name = 'Jane'
+        self.teacher.save()
+        response = self.revalidate(client, '/api/classes/', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['teacher_name'], 'Jane Smith')
+
+        etag = client.get('/api/students/')['ETag']
+        self.students[0].classes.add(self.make_class('Math 102'))
+        self.assertEqual(self.revalidate(client, '/api/students/', etag).status_code, 200)
+
+    def test_logins_do_not_change_the_etag(self):
+        client = self.client_for(self.admin)
+        etag = client.get('/api/classes/')['ETag']
+        APIClient().post('/api/token/', {'username': 'teacher1', 'password': 'teacher123'})
+        self.assertEqual(self.revalidate(client, '/api/classes/', etag).status_code, 304)
+
+    def test_subjects_are_validated_by_their_version(self):
+        client = self.client_for(self.admin)
+        etag = client.get('/api/subjects/')['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.revalidate(client, '/api/subjects/', etag).status_code, 304)
+        Subject.objects.create(name='Physics')
+        self.assertEqual(self.revalidate(client, '/api/subjects/', etag).status_code, 200)
+
+    def test_process_local_cache_is_flagged_outside_debug(self):
+        self.assertEqual([error.id for error in check_shared_cache(None)], ['school_api.W001'])
+        with override_settings(DEBUG=True):
+            self.assertEqual(check_shared_cache(None), [])
+        shared = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp/school_api'}
+        with override_settings(CACHES={'default': shared}):
+            self.assertEqual(check_shared_cache(None), [])
+
+    def test_detail_last_modified(self):
+        client = self.client_for(self.admin)
+        url = f'/api/users/{self.teacher.id}/'
+        response = client.get(url)
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(1):
+            response = client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(client.get(f'/api/students/{Subject.objects.get().id}/').status_code, 404)
+
+    def test_details_with_related_data_have_no_last_modified(self):
+        client = self.client_for(self.admin)
+        url = f'/api/classes/{self.class_obj.id}/'
+        response = client.get(url)
+        self.assertIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+
+        self.teacher.first_name = 'Jane'
+        self.teacher.save()
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['teacher_name'], 'Jane Smith')
+
+    def test_enrollments_change_the_class_etag(self):
+        client = self.client_for(self.admin)
+        older, latest = self.make_class('Math 102'), self.make_class('Math 103')
+        student = self.make_student('student9', 'S009')
+        student.classes.add(self.class_obj, latest)
+        etag = client.get('/api/classes/', {'student': student.id})['ETag']
+
+        # Same count and latest update as before, different classes
+        student.classes.remove(self.class_obj)
+        student.classes.add(older)
+        response = self.revalidate(client, '/api/classes/', etag, student=student.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({row['name'] for row in response.data['results']}, {'Math 102', 'Math 103'})
+
+    def test_scoped_lists_get_their_own_etags(self):
+        self.make_attendance(self.students[0])
+        self.make_attendance(self.students[1])
+        etag = self.client_for(self.students[0].user).get('/api/attendance/')['ETag']
+        response = self.revalidate(self.client_for(self.students[1].user), '/api/attendance/', etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_cursor_pages_have_no_validators(self):
+        response = self.client_for(self.admin).get('/api/attendance/', {'pagination': 'cursor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+    def test_announcement_feed_revalidates_without_queries(self):
+        student = self.client_for(self.students[0].user)
+        Announcement.objects.create(title='Welcome', message='...', type='General', audience='All',
+                                    created_by=self.admin)
+        etag = student.get('/api/announcements/')['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.revalidate(student, '/api/announcements/', etag).status_code, 304)
+
+        Announcement.objects.create(title='Staff meeting', message='...', type='General', audience='Teachers',
+                                    created_by=self.admin)
+        self.assertEqual(self.revalidate(student, '/api/announcements/', etag).status_code, 304)
+        Announcement.objects.create(title='Trip', message='...', type='General', audience='Students',
+                                    created_by=self.admin)
+        self.assertEqual(self.revalidate(student, '/api/announcements/', etag).status_code, 200)
+
+
+class SparseFieldsetTests(SchoolApiTestCase):
+    """
+    ?fields= / ?omit= prune reads, and lean list pages match the serializer's output
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        parent = User.objects.create_user(username='parent1', password='x', role='Parent')
+        cls.students[0].parents.add(parent)
+        cls.make_class('Art 101', subject=Subject.objects.create(name='Art')).enrolled_students.add(cls.students[0])
+        for days_ago in range(3):
+            cls.make_attendance(cls.students[0], days_ago=days_ago, notes=None if days_ago else 'late bus')
+
+    def get(self, url, **params):
+        response = self.client_for(self.admin).get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return json.loads(response.content)
+
+    def test_lean_lists_match_the_serializer(self):
+        cases = [
+            ('/api/classes/', {}),
+            ('/api/classes/', {'fields': 'id,teacher_name'}),
+            ('/api/students/', {}),
+            ('/api/students/', {'expand': 'user_details'}),
+            ('/api/students/', {'omit': 'classes_details,created_at'}),
+            ('/api/students/', {'search': 'student1'}),
+            ('/api/attendance/', {}),
+            ('/api/attendance/', {'pagination': 'cursor'}),
+            ('/api/attendance/', {'fields': 'student_name,status', 'ordering': 'status'}),
+        ]
+        for url, params in cases:
+            with self.subTest(url=url, **params):
+                lean = self.get(url, **params)
+                with override_settings(LEAN_LIST_SERIALIZATION=False):
+                    self.assertEqual(lean, self.get(url, **params))
+
+    def test_fields_and_omit(self):
+        rows = self.get('/api/attendance/', fields='id,status')['results']
+        self.assertEqual([set(row) for row in rows], [{'id', 'status'}] * 3)
+        rows = self.get('/api/subjects/', omit='id')['results']
+        self.assertEqual(sorted(row['name'] for row in rows), ['Art', 'Mathematics'])
+        detail = self.get(f'/api/students/{self.students[0].id}/', fields='roll_number,classes')
+        self.assertEqual(detail['roll_number'], 'S001')
+        self.assertEqual(len(detail['classes']), 2)
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client_for(self.admin).get('/api/classes/', {'fields': 'id,nope'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('nope', response.data['fields'])
+
+    def test_writes_ignore_fields(self):
+        response = self.client_for(self.admin).post(
+            '/api/subjects/?fields=id', {'name': 'Physics'}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['name'], 'Physics')
+
+    def test_lean_student_list_batches_relations(self):
+        client = self.client_for(self.admin)
+        # count, page, classes with teachers and subjects, parents
+        with self.assertNumQueries(4):
+            client.get('/api/students/')
+        with self.assertNumQueries(2):
+            client.get('/api/students/', {'fields': 'id,roll_number'})
+
+    def test_lean_rows_skip_the_serializer(self):
+        with mock.patch.object(AttendanceRecordSerializer, 'get_student_name') as get_student_name:
+            rows = self.get('/api/attendance/')['results']
+        get_student_name.assert_not_called()
+        self.assertEqual({row['student_name'] for row in rows}, {'Student1 Test'})
+
+
+class AsyncEndpointTests(SchoolApiTestCase):
+    """
+    The async read endpoints return what their DRF counterparts return
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for days_ago in range(3):
+            cls.make_attendance(cls.students[0], days_ago=days_ago)
+        for i in range(12):
+            cls.make_class(f'Extra {i:02d}')
+        for title, audience in (('Welcome', 'All'), ('Staff meeting', 'Teachers')):
+            Announcement.objects.create(title=title, message='...', type='General', audience=audience,
+                                        created_by=cls.admin)
+
+    def auth(self, user):
+        return {'AUTHORIZATION': f'Bearer {RefreshToken.for_user(user).access_token}'}
+
+    async def get(self, url, user, **params):
+        return await self.async_client.get(url, params, headers=self.auth(user))
+
+    async def assertSameResults(self, sync_url, async_url, user, **params):
+        expected = await self.get(sync_url, user, **params)
+        response = await self.get(async_url, user, **params)
+        self.assertEqual(response.status_code, expected.status_code)
+        expected, actual = json.loads(expected.content), json.loads(response.content)
+        if isinstance(expected, dict) and 'results' in expected:
+            # Links point at each endpoint's own path
+            self.assertEqual(actual['results'], expected['results'])
+            self.assertEqual(actual.get('count'), expected.get('count'))
+            self.assertEqual(actual['next'] is None, expected['next'] is None)
+        else:
+            self.assertEqual(actual, expected)
+        return response
+
+    async def test_class_list(self):
+        user = self.students[0].user
+        await self.assertSameResults('/api/classes/', '/api/async/classes/', user)
+        response = await self.assertSameResults('/api/classes/', '/api/async/classes/', user, page=2)
+        self.assertEqual(json.loads(response.content)['previous'], 'http://testserver/api/async/classes/')
+        await self.assertSameResults('/api/classes/', '/api/async/classes/', user, fields='id,teacher_name')
+        await self.assertSameResults('/api/classes/', '/api/async/classes/', user, search='extra', ordering='name')
+        self.assertEqual((await self.get('/api/async/classes/', user, page=9)).status_code, 404)
+        self.assertEqual((await self.get('/api/async/classes/', user, fields='nope')).status_code, 400)
+
+    async def test_student_history(self):
+        student = self.students[0]
+        for user in (student.user, self.teacher, self.students[1].user):
+            await self.assertSameResults(
+                '/api/attendance/student_history/', '/api/async/attendance/student_history/', user,
+                student_id=str(student.id)
+            )
+        response = await self.get('/api/async/attendance/student_history/', self.admin)
+        self.assertEqual(response.status_code, 400)
+
+    async def test_announcement_feed(self):
+        for user in (self.students[0].user, self.teacher):
+            await self.assertSameResults('/api/announcements/', '/api/async/announcements/', user)
+        student = self.students[0].user
+        first = await self.get('/api/async/announcements/', student)
+        self.assertEqual(await sync_to_async(feed_cache.get_stats)(), {'hits': 1, 'misses': 4, 'hit_ratio': 0.2})
+        response = await self.async_client.get(
+            '/api/async/announcements/', headers={**self.auth(student), 'If-None-Match': first['ETag']}
+        )
+        self.assertEqual(response.status_code, 304)
+        await self.assertSameResults('/api/announcements/', '/api/async/announcements/', student,
+                                     pagination='cursor')
+
+    async def test_authentication_and_methods(self):
+        response = await self.async_client.get('/api/async/classes/')
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('WWW-Authenticate', response)
+        response = await self.async_client.get('/api/async/classes/', headers={'AUTHORIZATION': 'Bearer nope'})
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.post('/api/async/classes/', headers=self.auth(self.admin))
+        self.assertEqual(response.status_code, 405)
+
+    async def test_async_requests_are_timed(self):
+        response = await self.get('/api/async/classes/', self.admin)
+        match = re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', response['Server-Timing'])
+        # User lookup (not cached yet), count, page
+        self.assertEqual(match.group(1), '3')
+
+
+class SQLiteConcurrencyTests(SchoolApiTestCase):
+    """
+    Reads outside transactions use the query-only alias, and the configured connections
+    survive a threaded write/read workload without lock errors
+    """
+
+    def test_reads_outside_transactions_use_read_alias(self):
+        router = ReadWriteRouter()
+        default = connections['default']
+        with mock.patch.object(default, 'in_atomic_block', False):
+            self.assertEqual(router.db_for_read(Subject), 'read')
+        # Test cases run inside a transaction, whose own writes must stay visible
+        self.assertEqual(router.db_for_read(Subject), 'default')
+        self.assertEqual(Subject.objects.all().db, 'default')
+        self.assertEqual(router.db_for_write(Subject, instance=Subject(name='Art')), 'default')
+        self.assertFalse(router.allow_migrate('read', 'school_api'))
+
+    def test_stress_report(self):
+        report = run_stress(seconds=0.3, writers=3, readers=2, students=20, days=10)
+        self.assertEqual(set(report['profiles']), {'baseline', 'configured'})
+        configured = report['profiles']['configured']
+        self.assertEqual(configured['begin'], 'BEGIN IMMEDIATE')
+        self.assertIn('PRAGMA journal_mode=WAL', configured['pragmas'])
+        self.assertEqual(configured['write_errors'], 0)
+        self.assertEqual(configured['read_errors'], 0)
+        self.assertGreater(configured['writes'], 0)
+        self.assertGreater(configured['reads'], 0)
+        json.dumps(report)
+
+    def test_command_rejects_unknown_profile(self):
+        with self.assertRaises(CommandError):
+            call_command('sqlite_stress', '--seconds', '0.1', '--only', 'fast', stderr=io.StringIO())
+
+
+class ReadAliasTests(TransactionTestCase):
+    """
+    Outside transactions reads see committed writes through the read alias, which refuses writes
+    """
+    databases = {'default', 'read'}
+
+    def test_read_alias_is_query_only(self):
+        Subject.objects.create(name='Mathematics')
+        self.assertEqual(Subject.objects.get().name, 'Mathematics')
+        with self.assertRaises(OperationalError):
+            Subject.objects.using('read').create(name='Physics')
+
+
+@override_settings(
+    DATABASE_REPLICAS=['replica'], REPLICA_PIN_SECONDS=30,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    SQL_PROFILER_SAMPLE_RATE=0.0, SQL_PROFILER_SLOW_MS=None,
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    GETs read from a replica kept in step by ``replicate``, and a client reads from the
+    primary for a while after it writes
+    """
+    databases = {'default', 'read'}
+
+    @classmethod
+    def setUpClass(cls):
+        # A second SQLite file. The test runner only knows the configured aliases, so the
+        # replica joins the allowed databases once it exists.
+        cls.directory = tempfile.TemporaryDirectory()
+        connections.settings['replica'] = {
+            **connections.settings['default'], 'NAME': f'{cls.directory.name}/replica.sqlite3',
+        }
+        cls.databases = {*cls.databases, 'replica'}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        cls.directory.cleanup()
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='admin', password='x', role='Administrator')
+        self.teacher = User.objects.create_user(username='teacher1', password='x', role='Teacher')
+        self.student = Student.objects.create(
+            user=User.objects.create_user(username='student1', password='x', role='Student'), roll_number='S001'
+        )
+        self.class_obj = Class.objects.create(
+            name='Math 101', academic_year='2023-2024', scheduled_start_time='09:00',
+            scheduled_end_time='10:30', days_of_week='Monday', location='Room 101',
+            teacher=self.teacher, subject=Subject.objects.create(name='Mathematics')
+        )
+        self.class_obj.enrolled_students.add(self.student)
+        replicate()
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        return client
+
+    def count(self, user):
+        response = self.client_for(user).get('/api/attendance/')
+        self.assertEqual(response.status_code, 200)
+        return response.data['count']
+
+    def test_router(self):
+        router = ReadWriteRouter()
+        token = current_replica.set('replica')
+        try:
+            self.assertEqual(router.db_for_read(Subject), 'replica')
+            self.assertEqual(router.db_for_write(Subject), 'default')
+            with primary_reads():
+                self.assertEqual(router.db_for_read(Subject), 'read')
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Subject), 'default')
+        finally:
+            current_replica.reset(token)
+        self.assertEqual(router.db_for_read(Subject), 'read')
+
+    def test_writer_reads_own_writes_until_replicated(self):
+        response = self.client_for(self.teacher).post('/api/attendance/', {
+            'student': str(self.student.id),
+            'class_obj': str(self.class_obj.id),
+            'attendance_date': '2024-03-04',
+            'attendance_time': '09:00:00',
+            'status': 'Present',
+            'checkin_method': 'MANUAL',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+
+        # The teacher is pinned to the primary; everyone else reads the lagging replica
+        self.assertEqual(self.count(self.teacher), 1)
+        self.assertEqual(self.count(self.admin), 0)
+
+        replicate()
+        self.assertEqual(self.count(self.admin), 1)
+
+        # Once the pin expires the teacher reads the replica too
+        cache.delete(pin_key(self.teacher.pk))
+        AttendanceRecord.objects.create(
+            student=self.student, class_obj=self.class_obj, attendance_date=datetime.date(2024, 3, 5),
+            attendance_time=datetime.time(9, 0), status='Present', recorded_by=self.teacher
+        )
+        self.assertEqual(self.count(self.teacher), 1)
+
+    def test_failed_writes_do_not_pin(self):
+        response = self.client_for(self.teacher).post('/api/attendance/', {}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIsNone(cache.get(pin_key(self.teacher.pk)))
+
+    def test_replicate_command(self):
+        out = io.StringIO()
+        call_command('replicate', stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Copied default to replica')
+        with self.assertRaises(CommandError):
+            call_command('replicate', 'elsewhere')
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], SQL_PROFILER_SAMPLE_RATE=0.0, SQL_PROFILER_SLOW_MS=None)
+class ConcurrencyBenchmarkTests(TransactionTestCase):
+    """
+    The WSGI/ASGI capacity benchmark drives both applications with concurrent clients
+    """
+    databases = {'default', 'read'}
+
+    def test_report(self):
+        Generator(Scale(1, 2, 4, 2), seed=1, end_date=datetime.date(2024, 3, 1), log=lambda message: None).generate()
+        User.objects.create_user(username='admin', password='x', role='Administrator')
+        cache.clear()
+
+        report = run_concurrency(levels=(1, 3), requests=6, wsgi_threads=2, only='^(classes|student_history)$')
+        rows = {(row['endpoint'], row['transport'], row['concurrency']): row for row in report['results']}
+        self.assertEqual(len(rows), 8)
+        for row in rows.values():
+            self.assertEqual(row['statuses'], {'200': 6})
+            self.assertLessEqual(row['p50_ms'], row['p95_ms'])
+            self.assertGreater(row['throughput_rps'], 0)
+        json.dumps(report)
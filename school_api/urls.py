@@ -2,6 +2,8 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from . import async_views
+from .metrics import metrics_view
 from .views import (
     UserViewSet, SubjectViewSet, ClassViewSet, StudentViewSet,
     AttendanceRecordViewSet, AnnouncementViewSet
@@ -20,6 +22,15 @@ urlpatterns = [
     path('auth/login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     
+    # Prometheus metrics
+    path('metrics', metrics_view, name='metrics'),
+
+    # Async read endpoints for ASGI deployments
+    path('async/announcements/', async_views.announcement_feed, name='async-announcement-list'),
+    path('async/classes/', async_views.class_list, name='async-class-list'),
+    path('async/attendance/student_history/', async_views.student_history,
+         name='async-attendance-student-history'),
+
     # API endpoints
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,25 +1,47 @@
-from rest_framework import viewsets, status, filters
+import uuid
+
+from rest_framework import viewsets, status, filters, serializers
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.views import TokenObtainPairView
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 
 from .models import Subject, Class, Student, AttendanceRecord, Announcement
 from .serializers import (
     UserSerializer, UserUpdateSerializer, ChangePasswordSerializer,
-    SubjectSerializer, ClassSerializer, StudentSerializer, EnrollStudentsSerializer,
-    AttendanceRecordSerializer, AnnouncementSerializer
+    SubjectSerializer, ClassSerializer, StudentSerializer, EnrollStudentsSerializer, BulkEnrollmentSerializer,
+    AttendanceRecordSerializer, BulkAttendanceSerializer, BulkAttendanceItemSerializer,
+    QRCheckinSerializer, AttendanceExportSerializer, AnnouncementSerializer
 )
 from .permissions import (
     IsAdministrator, IsTeacher, IsStudent, IsParent,
-    IsOwnerOrAdministrator, IsTeacherOrAdministrator, IsStudentOrTeacherOrAdministrator
+    IsOwnerOrAdministrator, IsTeacherOrAdministrator, IsStudentOrTeacherOrAdministrator,
+    scope_students, scope_attendance, can_record_attendance
 )
+from . import feed_cache
+from .conditional import ConditionalGetMixin, make_etag, etag_matches, not_modified, set_validators
+from .enrollment import enroll
+from .fieldsets import SparseFieldsetMixin, LeanListMixin
+from .imports import parse_rows, import_users
+from .metrics import SerializationTimingMixin
+from .exports import EXPORT_FORMATS, ATTENDANCE_EXPORT_FIELDS, ATTENDANCE_EXPORT_HEADERS
+from .pagination import AttendanceRecordPagination, AnnouncementPagination
+from .roster import get_roster_index, find_class_in_session
+from .replicas import primary_reads
+from .schedule import ScheduleFilter
+from .search import FullTextSearchFilter
 
 User = get_user_model()
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(SerializationTimingMixin, ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     API endpoint for users
     """
@@ -74,11 +96,52 @@ class UserViewSet(viewsets.ModelViewSet):
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class SubjectViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'])
+    def bulk_import(self, request):
+        """
+        Create many users at once from an uploaded CSV/JSON ``file`` or a JSON ``users`` list.
+        Passwords are hashed in this process, so imports are capped; larger ones belong to the
+        import_users command.
+        """
+        max_bytes = getattr(settings, 'USER_IMPORT_MAX_BYTES', 1024 * 1024)
+        max_rows = getattr(settings, 'USER_IMPORT_MAX_ROWS', 50)
+        upload = request.FILES.get('file')
+        if upload is not None:
+            if upload.size > max_bytes:
+                return Response(
+                    {"file": f"Uploads are limited to {max_bytes} bytes; use the import_users command for more."},
+                    status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+                )
+            file_format = 'json' if upload.name.lower().endswith('.json') else 'csv'
+            try:
+                rows = parse_rows(upload.read().decode('utf-8-sig'), file_format)
+            except (ValueError, UnicodeDecodeError) as exc:
+                return Response({"file": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            rows = request.data.get('users')
+            if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+                return Response(
+                    {"users": "Expected a list of users or an uploaded file."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        if len(rows) > max_rows:
+            return Response(
+                {"detail": f"At most {max_rows} users can be imported per request; use the import_users command for more."},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+
+        result = import_users(rows)
+        response_status = status.HTTP_201_CREATED if result['created'] else status.HTTP_400_BAD_REQUEST
+        return Response(result, status=response_status)
+
+class SubjectViewSet(SerializationTimingMixin, ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     API endpoint for subjects
     """
     queryset = Subject.objects.all()
+    conditional_aggregate = False
+    conditional_versions = ('subjects',)
     serializer_class = SubjectSerializer
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['name']
@@ -92,27 +155,41 @@ class SubjectViewSet(viewsets.ModelViewSet):
             # Only administrators can create, update, or delete subjects
             return [IsAdministrator()]
 
-class ClassViewSet(viewsets.ModelViewSet):
+class ClassViewSet(SerializationTimingMixin, ConditionalGetMixin, SparseFieldsetMixin, LeanListMixin, viewsets.ModelViewSet):
     """
     API endpoint for classes
     """
-    queryset = Class.objects.all()
+    queryset = Class.objects.select_related('teacher', 'subject')
+    # Teacher and subject names, and enrollments: ?student= results change when a student joins
+    # or leaves a class without touching the class rows
+    conditional_versions = ('users', 'subjects', 'enrollments')
     serializer_class = ClassSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [FullTextSearchFilter, ScheduleFilter, filters.OrderingFilter]
     search_fields = ['name', 'academic_year', 'location', 'teacher__first_name', 'teacher__last_name', 'subject__name']
+    search_documents = {'class': 'pk'}
     ordering_fields = ['name', 'academic_year', 'scheduled_start_time', 'scheduled_end_time', 'location', 'created_at']
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
             # Anyone authenticated can view classes
             return [IsAuthenticated()]
-        elif self.action == 'enroll_students':
+        elif self.action in ['enroll_students', 'bulk_enroll']:
             # Only teachers of the class or administrators can enroll students
             return [IsTeacherOrAdministrator()]
         else:
             # Only administrators can create, update, or delete classes
             return [IsAdministrator()]
 
+    def get_queryset(self):
+        """
+        Optionally filter by exact academic year (?academic_year=2023-2024)
+        """
+        queryset = super().get_queryset()
+        academic_year = self.request.query_params.get('academic_year')
+        if academic_year:
+            queryset = queryset.filter(academic_year=academic_year)
+        return queryset
+
     def perform_create(self, serializer):
         # Ensure the teacher has the Teacher role
         teacher = serializer.validated_data.get('teacher')
@@ -134,41 +211,92 @@ class ClassViewSet(viewsets.ModelViewSet):
         serializer = EnrollStudentsSerializer(data=request.data)
         if serializer.is_valid():
             student_ids = serializer.validated_data['student_ids']
-            students = Student.objects.filter(id__in=student_ids)
 
-            # Check if all student IDs are valid
-            if len(students) != len(student_ids):
-                return Response(
-                    {"student_ids": "Some student IDs are invalid."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+            # Enroll students with one batched insert, skipping existing enrollments
+            with transaction.atomic():
+                result = enroll([(class_obj.id, student_ids)])
 
-            # Enroll students
-            for student in students:
-                class_obj.enrolled_students.add(student)
+                # Check if all student IDs are valid
+                if result['invalid']:
+                    transaction.set_rollback(True)
+                    return Response(
+                        {"student_ids": "Some student IDs are invalid."},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
 
-            return Response({"status": "students enrolled"}, status=status.HTTP_200_OK)
+            return Response({"status": "students enrolled", **result}, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class StudentViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'])
+    def bulk_enroll(self, request):
+        """
+        Enroll students in many classes in one transaction; teachers may only enroll into their own classes
+        """
+        serializer = BulkEnrollmentSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        allowed_class_ids = None
+        if request.user.role != 'Administrator':
+            allowed_class_ids = Class.objects.filter(teacher=request.user).values_list('id', flat=True)
+
+        with transaction.atomic():
+            result = enroll(
+                ((item['class_obj'], item['student_ids']) for item in serializer.validated_data['enrollments']),
+                allowed_class_ids=allowed_class_ids
+            )
+        return Response(result, status=status.HTTP_200_OK)
+
+class StudentViewSet(SerializationTimingMixin, ConditionalGetMixin, SparseFieldsetMixin, LeanListMixin, viewsets.ModelViewSet):
     """
     API endpoint for students
     """
     queryset = Student.objects.all()
+    conditional_versions = ('users', 'classes', 'subjects', 'enrollments', 'parents')
     serializer_class = StudentSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [FullTextSearchFilter, filters.OrderingFilter]
     search_fields = ['roll_number', 'user__first_name', 'user__last_name', 'user__email']
+    search_documents = {'student': 'pk'}
     ordering_fields = ['roll_number', 'user__first_name', 'user__last_name', 'created_at']
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
-            # Teachers, administrators, and the student themselves can view student details
-            return [IsStudentOrTeacherOrAdministrator()]
+            # Any authenticated user; get_queryset limits which students they see
+            return [IsAuthenticated()]
         else:
             # Only administrators can create, update, or delete students
             return [IsAdministrator()]
 
+    def get_expand(self):
+        """
+        Nested fields requested via ?expand=user_details,classes_details (None when not given)
+        """
+        expand = self.request.query_params.get('expand')
+        if expand is None:
+            return None
+        return {name.strip() for name in expand.split(',') if name.strip()}
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expand'] = self.get_expand()
+        return context
+
+    def get_queryset(self):
+        """
+        Batch-load users and classes; teachers and subjects only when classes_details is rendered
+        """
+        queryset = scope_students(Student.objects.select_related('user'), self.request.user)
+        expand = self.get_expand()
+        if expand is None or 'classes_details' in expand:
+            classes = Class.objects.select_related('teacher', 'subject')
+        else:
+            classes = Class.objects.only('id')
+        return queryset.prefetch_related(
+            Prefetch('classes', queryset=classes),
+            Prefetch('parents', queryset=User.objects.only('id')),
+        )
+
     def perform_create(self, serializer):
         # Ensure the user has the Student role
         user = serializer.validated_data.get('user')
@@ -176,28 +304,90 @@ class StudentViewSet(viewsets.ModelViewSet):
             raise serializers.ValidationError({"user": "Selected user is not a student."})
         serializer.save()
 
-class AttendanceRecordViewSet(viewsets.ModelViewSet):
+class AttendanceRecordViewSet(SerializationTimingMixin, ConditionalGetMixin, SparseFieldsetMixin, LeanListMixin, viewsets.ModelViewSet):
     """
     API endpoint for attendance records
     """
-    queryset = AttendanceRecord.objects.all()
+    # Join the related rows the serializer reads so each page costs a single query
+    queryset = AttendanceRecord.objects.select_related('student__user', 'class_obj', 'recorded_by')
+    conditional_versions = ('users', 'classes')
     serializer_class = AttendanceRecordSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = AttendanceRecordPagination
+    filter_backends = [FullTextSearchFilter, filters.OrderingFilter]
     search_fields = ['student__roll_number', 'student__user__first_name', 'student__user__last_name', 'class_obj__name']
+    search_documents = {'student': 'student_id', 'class': 'class_obj_id'}
     ordering_fields = ['attendance_date', 'attendance_time', 'status', 'created_at']
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve']:
-            # Anyone authenticated can view attendance records
+        if self.action in ['list', 'retrieve', 'student_history']:
+            # Anyone authenticated; get_queryset limits which records they see
             return [IsAuthenticated()]
+        elif self.action == 'checkin':
+            # Students check themselves in; teachers and administrators can check in anyone
+            return [IsStudentOrTeacherOrAdministrator()]
         else:
             # Only teachers or administrators can create, update, or delete attendance records
             return [IsTeacherOrAdministrator()]
 
+    def get_queryset(self):
+        """
+        Records visible to the requesting user, filtered in SQL
+        """
+        return scope_attendance(super().get_queryset(), self.request.user)
+
+    def is_upsert(self):
+        """
+        ?upsert=true turns duplicate (student, class_obj, attendance_date) writes into updates
+        """
+        return self.request.query_params.get('upsert', '').lower() in ('1', 'true', 'yes')
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['upsert'] = self.is_upsert()
+        return context
+
+    def create(self, request, *args, **kwargs):
+        if not self.is_upsert():
+            return super().create(request, *args, **kwargs)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # An upsert may overwrite a record the user cannot see, so check before writing
+        if not can_record_attendance(request.user, serializer.validated_data['class_obj']):
+            return Response(
+                {"detail": "You do not have permission to record attendance for this class."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        record = AttendanceRecord(recorded_by=request.user, **serializer.validated_data)
+        AttendanceRecord.objects.upsert([record])
+
+        # The row keeps its original id when the insert turned into an update; the permission
+        # check above stands in for the role scope
+        instance = self.queryset.get(
+            student=record.student, class_obj=record.class_obj, attendance_date=record.attendance_date
+        )
+        created = instance.id == record.id
+        return Response(
+            self.get_serializer(instance).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+    def check_class(self, class_obj):
+        if not can_record_attendance(self.request.user, class_obj):
+            raise PermissionDenied("You do not have permission to record attendance for this class.")
+
     def perform_create(self, serializer):
+        self.check_class(serializer.validated_data['class_obj'])
         # Set the recorded_by field to the current user
         serializer.save(recorded_by=self.request.user)
 
+    def perform_update(self, serializer):
+        # Moving a record needs both the class it leaves and the class it joins
+        self.check_class(serializer.instance.class_obj)
+        if 'class_obj' in serializer.validated_data:
+            self.check_class(serializer.validated_data['class_obj'])
+        serializer.save()
+
     @action(detail=False, methods=['get'])
     def student_history(self, request):
         student_id = request.query_params.get('student_id')
@@ -207,35 +397,238 @@ class AttendanceRecordViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        student = get_object_or_404(Student, id=student_id)
-
-        # Check if the user is the student, a teacher of one of their classes, or an administrator
-        if (request.user.role != 'Administrator' and 
-            request.user.role != 'Teacher' and 
-            (request.user.role != 'Student' or request.user != student.user)):
+        try:
+            student_id = uuid.UUID(student_id)
+        except ValueError:
             return Response(
-                {"detail": "You do not have permission to view this student's attendance history."},
-                status=status.HTTP_403_FORBIDDEN
+                {"detail": "Student ID is not a valid UUID."},
+                status=status.HTTP_400_BAD_REQUEST
             )
 
-        attendance_records = AttendanceRecord.objects.filter(student=student).order_by('-attendance_date')
+        # The scoped queryset only returns records the user may see
+        attendance_records = list(
+            self.get_queryset().filter(student_id=student_id).order_by('-attendance_date')
+        )
+
+        # An empty history needs one more indexed lookup to tell "no records yet" from "not visible"
+        if not attendance_records and not scope_students(Student.objects.all(), request.user).filter(id=student_id).exists():
+            return Response({"detail": "Student not found."}, status=status.HTTP_404_NOT_FOUND)
+
         serializer = self.get_serializer(attendance_records, many=True)
         return Response(serializer.data)
 
-class AnnouncementViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'])
+    def checkin(self, request):
+        """
+        QR_STATIC check-in: resolve the student, the class in session and Present/Late from the
+        cached roster index, then record the scan with a single upsert
+        """
+        serializer = QRCheckinSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        index = get_roster_index()
+        if request.user.role == 'Student':
+            student_id = index['users'].get(request.user.id)
+            requested = serializer.validated_data.get('student')
+            if requested is not None and requested != student_id:
+                return Response(
+                    {"detail": "Students can only check themselves in."},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+        elif 'student' in serializer.validated_data:
+            student_id = serializer.validated_data['student']
+        elif 'roll_number' in serializer.validated_data:
+            student_id = index['roll_numbers'].get(serializer.validated_data['roll_number'])
+        else:
+            return Response(
+                {"detail": "Either student or roll_number is required."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if student_id not in index['students']:
+            return Response({"detail": "Student not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        now = timezone.localtime()
+        in_session = find_class_in_session(index, student_id, now)
+        if in_session is None:
+            return Response(
+                {"detail": "No class is in session for this student."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        class_id, attendance_status = in_session
+        # Students check themselves in; staff scanning for them must be allowed to mark the class
+        if request.user.role != 'Student' and not can_record_attendance(
+            request.user, Class.objects.only('teacher_id').get(id=class_id)
+        ):
+            return Response(
+                {"detail": "You do not have permission to record attendance for this class."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        record = AttendanceRecord(
+            student_id=student_id,
+            class_obj_id=class_id,
+            attendance_date=now.date(),
+            attendance_time=now.time(),
+            status=attendance_status,
+            checkin_method='QR_STATIC',
+            recorded_by_id=request.user.id,
+        )
+        AttendanceRecord.objects.upsert([record])
+
+        return Response({
+            "student": student_id,
+            "class_obj": class_id,
+            "class_name": index['classes'][class_id][3],
+            "attendance_date": record.attendance_date,
+            "attendance_time": record.attendance_time,
+            "status": attendance_status,
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream attendance as CSV or NDJSON (?output=), filtered by date range, class and student
+        """
+        serializer = AttendanceExportSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        params = serializer.validated_data
+        queryset = scope_attendance(AttendanceRecord.objects.all(), request.user)
+        if 'date_from' in params:
+            queryset = queryset.filter(attendance_date__gte=params['date_from'])
+        if 'date_to' in params:
+            queryset = queryset.filter(attendance_date__lte=params['date_to'])
+        if 'class_id' in params:
+            queryset = queryset.filter(class_obj_id=params['class_id'])
+        if 'student_id' in params:
+            queryset = queryset.filter(student_id=params['student_id'])
+        queryset = queryset.order_by('attendance_date', 'id')
+
+        stream, content_type, extension = EXPORT_FORMATS[params['output']]
+        response = StreamingHttpResponse(
+            stream(queryset, ATTENDANCE_EXPORT_FIELDS, ATTENDANCE_EXPORT_HEADERS),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = f'attachment; filename="attendance.{extension}"'
+        return response
+
+    @action(detail=False, methods=['post'])
+    def bulk_mark(self, request):
+        """
+        Record attendance for a whole class roster in one request and one transaction
+        """
+        serializer = BulkAttendanceSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        class_obj = get_object_or_404(Class, id=data['class_obj'])
+
+        # Check if the user is the teacher of this class or an administrator
+        if not can_record_attendance(request.user, class_obj):
+            return Response(
+                {"detail": "You do not have permission to record attendance for this class."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        upsert = self.is_upsert()
+        attendance_date = data['attendance_date']
+        attendance_time = data.get('attendance_time') or timezone.localtime().time()
+        try:
+            with transaction.atomic():
+                # Read what is already recorded inside the transaction that writes, so the checks below
+                # see the rows the insert will run into
+                roster = set(class_obj.enrolled_students.values_list('id', flat=True))
+                already_recorded = dict(
+                    AttendanceRecord.objects.filter(class_obj=class_obj, attendance_date=attendance_date)
+                    .values_list('student_id', 'id')
+                )
+
+                results = []
+                records = []
+                seen = set()
+                for item in data['records']:
+                    item_serializer = BulkAttendanceItemSerializer(data=item)
+                    if not item_serializer.is_valid():
+                        results.append({"student": item.get('student'), "result": "invalid",
+                                        "errors": item_serializer.errors})
+                        continue
+
+                    student_id = item_serializer.validated_data['student']
+                    if student_id not in roster:
+                        error = "Student is not enrolled in this class."
+                    elif student_id in seen:
+                        error = "Student appears more than once in this request."
+                    elif student_id in already_recorded and not upsert:
+                        error = "Attendance has already been recorded for this student on this date."
+                    else:
+                        error = None
+
+                    if error:
+                        results.append({"student": student_id, "result": "invalid", "errors": {"student": [error]}})
+                        continue
+
+                    seen.add(student_id)
+                    record = AttendanceRecord(
+                        student_id=student_id,
+                        class_obj=class_obj,
+                        attendance_date=attendance_date,
+                        attendance_time=attendance_time,
+                        status=item_serializer.validated_data['status'],
+                        notes=item_serializer.validated_data.get('notes'),
+                        checkin_method=data['checkin_method'],
+                        recorded_by=request.user,
+                    )
+                    records.append(record)
+                    if student_id in already_recorded:
+                        results.append({"student": student_id, "result": "updated", "id": already_recorded[student_id]})
+                    else:
+                        results.append({"student": student_id, "result": "created", "id": record.id})
+
+                if upsert:
+                    AttendanceRecord.objects.upsert(records)
+                else:
+                    AttendanceRecord.objects.bulk_create(records, batch_size=500)
+        except IntegrityError:
+            # A concurrent request recorded one of these students between the check and the insert
+            return Response(
+                {"detail": "Attendance for this class and date was recorded by another request; retry to see it."},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        updated = sum(1 for result in results if result['result'] == 'updated')
+        return Response({
+            "class_obj": class_obj.id,
+            "attendance_date": attendance_date,
+            "created": len(records) - updated,
+            "updated": updated,
+            "invalid": len(results) - len(records),
+            "results": results,
+        }, status=status.HTTP_200_OK)
+
+class AnnouncementViewSet(SerializationTimingMixin, ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     API endpoint for announcements
     """
     queryset = Announcement.objects.all()
+    conditional_versions = ('users',)
     serializer_class = AnnouncementSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = AnnouncementPagination
+    filter_backends = [FullTextSearchFilter, filters.OrderingFilter]
     search_fields = ['title', 'message', 'type', 'audience']
+    search_documents = {'announcement': 'pk'}
     ordering_fields = ['title', 'type', 'audience', 'created_at']
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
             # Anyone authenticated can view announcements
             return [IsAuthenticated()]
+        elif self.action == 'cache_stats':
+            # Only administrators can view feed cache metrics
+            return [IsAdministrator()]
         else:
             # Only teachers or administrators can create, update, or delete announcements
             return [IsTeacherOrAdministrator()]
@@ -244,6 +637,35 @@ class AnnouncementViewSet(viewsets.ModelViewSet):
         # Set the created_by field to the current user
         serializer.save(created_by=self.request.user)
 
+    def list(self, request, *args, **kwargs):
+        """
+        Serve feed pages from the audience-partitioned cache; hits skip the ORM and serializer.
+        The bucket's generation doubles as the ETag validator, so 304s cost no query at all.
+        """
+        bucket = feed_cache.bucket_for(request.user)
+        if bucket is None:
+            return super().list(request, *args, **kwargs)
+
+        etag = make_etag(request, bucket, feed_cache.get_generation(bucket))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        data, generation = feed_cache.get_page(bucket, request)
+        if data is not None:
+            return set_validators(Response(data), make_etag(request, bucket, generation))
+
+        # A lagging replica's page would be served until the next invalidation
+        with primary_reads():
+            response = super(ConditionalGetMixin, self).list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            feed_cache.set_page(bucket, request, generation, response.data)
+            set_validators(response, make_etag(request, bucket, generation))
+        return response
+
+    @action(detail=False, methods=['get'])
+    def cache_stats(self, request):
+        return Response(feed_cache.get_stats())
+
     def get_queryset(self):
         """
         Filter announcements based on user role